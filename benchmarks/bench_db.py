@@ -0,0 +1,100 @@
+"""
+Vazão de gravação de pontos: conexão por chamada vs conexão persistente
+
+Compara o salvar_ponto antigo (connect/insert/commit/close, journal de
+rollback com synchronous=FULL) com a ConexaoBanco em WAL com commit em
+grupo. Os fsyncs são estimados pelo modo de journal: rollback com FULL
+faz ao menos 2 por commit (journal e banco); WAL com FULL faz 1 por
+commit; WAL com NORMAL só sincroniza no checkpoint (2 por checkpoint).
+
+Uso:
+    python -m benchmarks.bench_db [pontos] [diretorio]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from db import ConexaoBanco, GravadorBanco, SQL_INSERIR_PONTO, ts_agora
+
+
+def _linha(i, sessao=1):
+    return (sessao, ts_agora(), -15.78 + i * 1e-6, -47.93, 0.001, 8.0, 90.0, 0.9, 1)
+
+
+def medir_por_chamada(caminho, pontos):
+    ConexaoBanco(caminho).fechar()  # Só o esquema
+    inicio = time.perf_counter()
+    for i in range(pontos):
+        conn = sqlite3.connect(caminho)
+        conn.execute(SQL_INSERIR_PONTO, _linha(i))
+        conn.commit()
+        conn.close()
+    decorrido = time.perf_counter() - inicio
+    return decorrido, pontos, 2 * pontos
+
+
+def medir_persistente(caminho, pontos, **opcoes):
+    conexao = ConexaoBanco(caminho, **opcoes)
+    sessao = conexao.iniciar_sessao()
+    inicio = time.perf_counter()
+    for i in range(pontos):
+        conexao.inserir_ponto(_linha(i, sessao))
+    conexao.commit()
+    decorrido = time.perf_counter() - inicio
+    estatisticas = conexao.obter_estatisticas()
+    conexao.fechar()
+    return decorrido, estatisticas['commits'], estatisticas['fsyncs_estimados']
+
+
+def medir_gravador(caminho, pontos, **opcoes):
+    """Thread de gravação: mede também o pior tempo de salvar_ponto para o produtor"""
+    conexao = ConexaoBanco(caminho)
+    gravador = GravadorBanco(conexao, **opcoes)
+    sessao = conexao.iniciar_sessao()
+    pior = 0.0
+    inicio = time.perf_counter()
+    for i in range(pontos):
+        t = time.perf_counter()
+        gravador.enfileirar(_linha(i, sessao))
+        pior = max(pior, time.perf_counter() - t)
+    gravador.sincronizar()
+    decorrido = time.perf_counter() - inicio
+    print(f"    (produtor: pior enfileiramento {pior * 1000:.2f} ms, "
+          f"esperas por contrapressão {gravador.esperas}, lotes {gravador.lotes})")
+    gravador.fechar()
+    estatisticas = conexao.obter_estatisticas()
+    conexao.fechar()
+    return decorrido, estatisticas['commits'], estatisticas['fsyncs_estimados']
+
+
+def main():
+    pontos = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    # Rode sobre o cartão SD para números reais; /tmp costuma ser memória
+    diretorio = sys.argv[2] if len(sys.argv) > 2 else tempfile.mkdtemp(prefix='bench_db_')
+
+    cenarios = [
+        ('por chamada (antigo)', lambda c: medir_por_chamada(c, pontos)),
+        ('WAL FULL, 1 linha/commit', lambda c: medir_persistente(c, pontos, synchronous='FULL',
+                                                                 linhas_por_commit=1)),
+        ('WAL NORMAL, 1 linha/commit', lambda c: medir_persistente(c, pontos, linhas_por_commit=1)),
+        ('WAL NORMAL, 50 linhas/commit', lambda c: medir_persistente(c, pontos, linhas_por_commit=50,
+                                                                     intervalo_commit=60)),
+        ('WAL NORMAL, 500 linhas/commit', lambda c: medir_persistente(c, pontos, linhas_por_commit=500,
+                                                                      intervalo_commit=60)),
+        ('thread, lotes de 50 (executemany)', lambda c: medir_gravador(c, pontos, tamanho_lote=50,
+                                                                       max_pendentes=500)),
+    ]
+    os.makedirs(diretorio, exist_ok=True)
+    print(f"{pontos} pontos em {diretorio}")
+    for n, (nome, medir) in enumerate(cenarios):
+        caminho = os.path.join(diretorio, f'bench_{n}.db')
+        decorrido, commits, fsyncs = medir(caminho)
+        # A 10 Hz, quantos fsyncs por hora o mesmo padrão de commits faria
+        por_hora = fsyncs / pontos * 36000
+        print(f"{nome:34s} {pontos / decorrido:9.0f} inserções/s  {commits / decorrido:8.0f} commits/s  "
+              f"{fsyncs / decorrido:8.0f} fsyncs/s (~{por_hora:.0f} fsyncs/h a 10 Hz)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Consultas espaciais: índice R*Tree vs varredura
+
+Grava N pontos em passadas de um talhão por sessão (sessões lado a lado),
+e mede consultas de janela do mapa e de raio em posições aleatórias sobre
+a área trabalhada: pelo R*Tree (db.obter_pontos_na_area / obter_pontos_no_raio
+/ existe_ponto_no_raio) e pela varredura que o código fazia antes
+(obter_pontos inteiro e filtro em Python). Mede também o custo dos gatilhos
+na gravação.
+
+Uso:
+    python -m benchmarks.bench_espacial [pontos] [diretorio] [consultas]
+"""
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+import db
+
+PONTOS_POR_SESSAO = 72000
+LATITUDE = -15.78
+LONGITUDE = -47.93
+M_POR_GRAU = 111320.0
+
+
+def _passadas(pontos, espacamento=12.0, comprimento=600.0, passo=0.22):
+    """Posições em zigue-zague: passada de `comprimento` m, uma sessão em cada faixa de talhão"""
+    m_lon = M_POR_GRAU * math.cos(math.radians(LATITUDE))
+    por_passada = int(comprimento / passo)
+    for i in range(pontos):
+        sessao, j = divmod(i, PONTOS_POR_SESSAO)
+        passada, k = divmod(j, por_passada)
+        norte = (k if passada % 2 == 0 else por_passada - k) * passo
+        leste = sessao * 800.0 + passada * espacamento
+        yield sessao, LATITUDE + norte / M_POR_GRAU, LONGITUDE + leste / m_lon
+
+
+def preencher(pontos):
+    conexao = db.obter_conexao()
+    ts = 1704103200000
+    sessao_atual = None
+    lote = []
+    decorrido = 0.0
+    for sessao, lat, lon in _passadas(pontos):
+        if sessao != sessao_atual:
+            sessao_atual = sessao
+            id_sessao = conexao.iniciar_sessao(ts=ts)
+        ts += 100
+        lote.append((id_sessao, ts, lat, lon, 0.0003, 8.0, 0.0, 0.9, 1))
+        if len(lote) == 500:
+            inicio = time.perf_counter()
+            conexao.inserir_lote(lote)
+            decorrido += time.perf_counter() - inicio
+            lote = []
+    if lote:
+        conexao.inserir_lote(lote)
+    return decorrido
+
+
+def _percentis(tempos):
+    tempos = sorted(tempos)
+    return (tempos[len(tempos) // 2] * 1000, tempos[int(len(tempos) * 0.99)] * 1000)
+
+
+def medir(nome, funcao, posicoes):
+    tempos = []
+    encontrados = 0
+    for lat, lon in posicoes:
+        inicio = time.perf_counter()
+        resultado = funcao(lat, lon)
+        tempos.append(time.perf_counter() - inicio)
+        encontrados += len(resultado) if isinstance(resultado, list) else int(resultado)
+    p50, p99 = _percentis(tempos)
+    print(f"{nome:44s} p50 {p50:8.3f} ms  p99 {p99:8.3f} ms  ({encontrados / len(posicoes):.0f} por consulta)")
+
+
+def main():
+    pontos = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    diretorio = sys.argv[2] if len(sys.argv) > 2 else tempfile.mkdtemp(prefix='bench_espacial_')
+    consultas = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, 'espacial.db')
+    for sufixo in ('', '-wal', '-shm'):
+        if os.path.exists(caminho + sufixo):
+            os.remove(caminho + sufixo)
+    db.configurar_banco(caminho)
+
+    decorrido = preencher(pontos)
+    print(f"{pontos} pontos gravados com o R*Tree: {pontos / decorrido:.0f} linhas/s")
+
+    rng = random.Random(1)
+    sessoes = math.ceil(pontos / PONTOS_POR_SESSAO)
+    amostra = list(_passadas(pontos))[::max(1, pontos // 5000)]
+    posicoes = [(lat + rng.gauss(0, 2e-5), lon + rng.gauss(0, 2e-5)) for _, lat, lon in rng.choices(amostra, k=consultas)]
+
+    def janela(meia_largura_m, limite=None):
+        d = meia_largura_m / M_POR_GRAU
+        return lambda lat, lon: db.obter_pontos_na_area(lat - d, lat + d, lon - d, lon + d, limite=limite)
+
+    # O tempo das janelas cresce com os pontos devolvidos (0,2 m entre pontos); o mapa limita
+    medir('janela 50 x 50 m (R*Tree)', janela(25), posicoes)
+    medir('janela 200 x 200 m (R*Tree)', janela(100), posicoes)
+    medir('janela 50 x 50 m, até 200 pontos (R*Tree)', janela(25, 200), posicoes)
+    medir('janela 200 x 200 m, até 200 pontos (R*Tree)', janela(100, 200), posicoes)
+    medir('janela 200 x 200 m, uma sessão (R*Tree)',
+          lambda lat, lon: db.obter_pontos_na_area(lat - 1e-3, lat + 1e-3, lon - 1e-3, lon + 1e-3,
+                                                   sessao_id=rng.randint(1, sessoes)), posicoes)
+    medir('raio 6 m (R*Tree)', lambda lat, lon: db.obter_pontos_no_raio(lat, lon, 6.0), posicoes)
+    medir('já pulverizado? raio 6 m (R*Tree)', lambda lat, lon: db.existe_ponto_no_raio(lat, lon, 6.0), posicoes)
+
+    # Varredura: o que o mapa fazia, em poucas consultas porque cada uma lê tudo
+    d = 25 / M_POR_GRAU
+
+    def varredura(lat, lon):
+        return [p for p in db.obter_pontos() if lat - d <= p[0] <= lat + d and lon - d <= p[1] <= lon + d]
+
+    medir('janela 50 x 50 m (obter_pontos + Python)', varredura, posicoes[:5])
+    db.fechar_banco()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Esquema 1 (timestamp ISO em texto) vs esquema 2 (sessões, epoch-ms, índice de cobertura)
+
+Gera um banco no esquema antigo com N pontos em várias sessões de trabalho,
+mede as consultas típicas nele, migra no próprio arquivo (ConexaoBanco) e
+mede as mesmas consultas no esquema novo. As consultas incluem a conversão
+do tempo em Python, como o exportador faz (fromisoformat vs divisão).
+
+Uso:
+    python -m benchmarks.bench_esquema [pontos] [diretorio]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from db import ConexaoBanco
+
+# Sessões de 2 h a 10 Hz, separadas por 12 h
+PONTOS_POR_SESSAO = 72000
+
+
+def criar_banco_v1(caminho, pontos):
+    conn = sqlite3.connect(caminho)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE pontos (id INTEGER PRIMARY KEY, timestamp TEXT, '
+                 'latitude REAL, longitude REAL, hectares REAL)')
+    conn.execute('CREATE TABLE fazenda (id INTEGER PRIMARY KEY, nome TEXT NOT NULL, '
+                 'largura_implemento REAL NOT NULL)')
+    conn.execute("INSERT INTO fazenda(nome, largura_implemento) VALUES('Bench', 12)")
+    inicio = datetime(2024, 1, 1, 6)
+
+    def linhas():
+        for i in range(pontos):
+            sessao, j = divmod(i, PONTOS_POR_SESSAO)
+            instante = inicio + timedelta(hours=12 * sessao, milliseconds=100 * j)
+            yield instante.isoformat(), -15.78 + j * 1e-6, -47.93 + sessao * 1e-3, 0.0003
+
+    conn.executemany('INSERT INTO pontos(timestamp, latitude, longitude, hectares) VALUES(?,?,?,?)', linhas())
+    conn.commit()
+    conn.close()
+
+
+def _medir(conn, sql, parametros=(), converter=None, repeticoes=3):
+    melhor = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        linhas = conn.execute(sql, parametros).fetchall()
+        if converter:
+            for linha in linhas:
+                converter(linha[0])
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor, len(linhas)
+
+
+def consultas_v1(conn):
+    # Sem sessões: "uma sessão" é uma janela de tempo sobre o texto ISO
+    total = conn.execute('SELECT MAX(id) FROM pontos').fetchone()[0]
+    primeiro = (total - 1) // PONTOS_POR_SESSAO // 2 * PONTOS_POR_SESSAO + 1
+    meio = conn.execute('SELECT timestamp FROM pontos WHERE id = ?', (primeiro,)).fetchone()[0]
+    fim = (datetime.fromisoformat(meio) + timedelta(hours=2)).isoformat()
+    return [
+        ('trilha completa ordenada', 'SELECT timestamp, latitude, longitude, hectares FROM pontos ORDER BY timestamp',
+         (), datetime.fromisoformat),
+        ('uma sessão (janela de 2 h)', 'SELECT timestamp, latitude, longitude, hectares FROM pontos '
+         'WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp', (meio, fim), datetime.fromisoformat),
+        ('último ponto', 'SELECT timestamp FROM pontos ORDER BY timestamp DESC LIMIT 1', (), None),
+        ('hectares totais', 'SELECT SUM(hectares) FROM pontos', (), None),
+    ]
+
+
+def consultas_v2(conn):
+    # A mesma sessão do meio escolhida no esquema 1 (ids das sessões migradas começam em 1)
+    sessao = (conn.execute('SELECT MAX(id) FROM sessoes').fetchone()[0] - 1) // 2 + 1
+    return [
+        ('trilha completa ordenada', 'SELECT ts, latitude, longitude, hectares FROM pontos ORDER BY sessao_id, ts',
+         (), lambda ts: ts / 1000),
+        ('uma sessão (janela de 2 h)', 'SELECT ts, latitude, longitude, hectares FROM pontos '
+         'WHERE sessao_id = ? ORDER BY ts', (sessao,), lambda ts: ts / 1000),
+        ('último ponto', 'SELECT ts FROM pontos ORDER BY sessao_id DESC, ts DESC LIMIT 1', (), None),
+        ('hectares totais', 'SELECT SUM(hectares) FROM pontos', (), None),
+    ]
+
+
+def main():
+    pontos = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    diretorio = sys.argv[2] if len(sys.argv) > 2 else tempfile.mkdtemp(prefix='bench_esquema_')
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, 'esquema.db')
+    if os.path.exists(caminho):
+        os.remove(caminho)
+
+    inicio = time.perf_counter()
+    criar_banco_v1(caminho, pontos)
+    print(f"{pontos} pontos no esquema 1 em {time.perf_counter() - inicio:.1f} s "
+          f"({os.path.getsize(caminho) / 1e6:.0f} MB)")
+
+    resultados = {}
+    conn = sqlite3.connect(caminho)
+    for nome, sql, parametros, converter in consultas_v1(conn):
+        resultados[nome] = [_medir(conn, sql, parametros, converter)]
+    conn.close()
+
+    inicio = time.perf_counter()
+    conexao = ConexaoBanco(caminho)
+    sessoes = conexao.consultar('SELECT COUNT(*) FROM sessoes')[0][0]
+    conexao.fechar()
+    print(f"Migração para o esquema 2: {time.perf_counter() - inicio:.1f} s, {sessoes} sessões "
+          f"({os.path.getsize(caminho) / 1e6:.0f} MB)")
+
+    conn = sqlite3.connect(caminho)
+    for nome, sql, parametros, converter in consultas_v2(conn):
+        resultados[nome].append(_medir(conn, sql, parametros, converter))
+    conn.close()
+
+    print(f"{'consulta':28s} {'esquema 1':>12s} {'esquema 2':>12s} {'ganho':>7s}")
+    for nome, ((t1, n1), (t2, n2)) in resultados.items():
+        print(f"{nome:28s} {t1 * 1000:10.1f} ms {t2 * 1000:10.1f} ms {t1 / t2:6.1f}x  ({n1}/{n2} linhas)")
+
+
+if __name__ == '__main__':
+    main()
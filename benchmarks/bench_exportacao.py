@@ -0,0 +1,122 @@
+"""
+Vazão das exportações (pontos/s): uma passada com várias saídas vs uma leitura por arquivo
+
+Compara, sobre o mesmo banco, o laço ponto a ponto anterior (haversine e
+datetime por linha, uma leitura do banco para o CSV e outra para o
+relatório) com o motor em blocos de utils.exportacao, exportando CSV,
+relatório e GeoJSON separados e juntos na mesma leitura. O pico de
+memória das exportações fica em benchmarks.bench_memoria.
+
+Uso:
+    python -m benchmarks.bench_exportacao [pontos] [diretorio]
+"""
+import csv
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import db
+from utils.exportacao import COLUNAS_EXPORTACAO, ExportadorDados
+from utils.exportacao_geo import SaidaGeoJSON
+from utils.haversine import haversine
+
+PONTOS_POR_SESSAO = 72000
+
+
+def _preencher(caminho, pontos, inicio_ms=1704103200000):
+    conexao = db.ConexaoBanco(caminho)
+    sessao = None
+    for base in range(0, pontos, 10000):
+        lote = []
+        for i in range(base, min(pontos, base + 10000)):
+            if i % PONTOS_POR_SESSAO == 0:
+                if lote:
+                    conexao.inserir_lote(lote)
+                    lote = []
+                sessao = conexao.iniciar_sessao(ts=inicio_ms + i * 100)
+            j = i % PONTOS_POR_SESSAO
+            lote.append((sessao, inicio_ms + i * 100, -15.78 + (j % 3000) * 2e-6,
+                         -47.93 + (j // 3000) * 1e-4, 0.0003, 8.0, 90.0, 0.9, 1))
+        conexao.inserir_lote(lote)
+    conexao.fechar()
+
+
+def _csv_por_linha(caminho, saida):
+    """Laço anterior do exportar_csv: haversine e datetime a cada linha"""
+    conn = sqlite3.connect(caminho)
+    with open(saida, 'w', newline='', encoding='utf-8') as arquivo:
+        writer = csv.writer(arquivo)
+        anterior = None
+        for ts, lat, lon, hectares in db.iterar_pontos(COLUNAS_EXPORTACAO, conexao=conn):
+            distancia = velocidade = 0
+            if anterior is not None:
+                distancia = haversine(anterior[1], anterior[2], lat, lon)
+                delta = (ts - anterior[0]) / 1000
+                velocidade = distancia / delta * 3.6 if delta > 0 else 0
+            writer.writerow([db.ts_para_datetime(ts).isoformat(), lat, lon, hectares,
+                             round(distancia, 2), round(velocidade, 1)])
+            anterior = (ts, lat, lon)
+    conn.close()
+
+
+def _estatisticas_por_linha(caminho, saida):
+    """Segunda leitura do banco para o relatório, ponto a ponto"""
+    conn = sqlite3.connect(caminho)
+    anterior = None
+    total = area = distancia = 0
+    for ts, lat, lon, hectares in db.iterar_pontos(COLUNAS_EXPORTACAO, conexao=conn):
+        total += 1
+        area += hectares
+        if anterior is not None:
+            distancia += haversine(anterior[1], anterior[2], lat, lon)
+        anterior = (ts, lat, lon)
+    conn.close()
+
+
+def _cenarios(caminho, diretorio):
+    exportador = ExportadorDados(caminho)
+    csv_saida = os.path.join(diretorio, 'saida.csv')
+    txt_saida = os.path.join(diretorio, 'saida.txt')
+    geo_saida = os.path.join(diretorio, 'saida.geojson')
+    return {
+        'csv ponto a ponto (antes)': lambda: _csv_por_linha(caminho, csv_saida),
+        'csv + relatório, 2 leituras (antes)': lambda: (_csv_por_linha(caminho, csv_saida),
+                                                         _estatisticas_por_linha(caminho, txt_saida)),
+        'estatísticas (motor)': lambda: exportador.exportar([]),
+        'csv (motor)': lambda: exportador.exportar_csv(csv_saida),
+        'relatório (motor)': lambda: exportador.gerar_relatorio_resumo(txt_saida),
+        'csv + relatório, 2 leituras (motor)': lambda: (exportador.exportar_csv(csv_saida),
+                                                         exportador.gerar_relatorio_resumo(txt_saida)),
+        'csv + relatório, 1 leitura (motor)': lambda: exportador.exportar_tudo(csv_saida, txt_saida),
+        'geojson (motor)': lambda: exportador.exportar_geojson(geo_saida),
+        'geojson simplificado 0,5 m (motor)': lambda: exportador.exportar_geojson(geo_saida, tolerancia_m=0.5),
+        'csv + relatório + geojson, 1 leitura': lambda: exportador.exportar_tudo(
+            csv_saida, txt_saida, [SaidaGeoJSON(geo_saida)]),
+    }
+
+
+def main():
+    pontos = int(sys.argv[1]) if len(sys.argv) > 1 else 3_000_000
+    diretorio = sys.argv[2] if len(sys.argv) > 2 else tempfile.mkdtemp(prefix='bench_exportacao_')
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, 'exportacao.db')
+    for sufixo in ('', '-wal', '-shm'):
+        if os.path.exists(caminho + sufixo):
+            os.remove(caminho + sufixo)
+
+    inicio = time.perf_counter()
+    _preencher(caminho, pontos)
+    print(f"{pontos} pontos em {time.perf_counter() - inicio:.1f} s ({os.path.getsize(caminho) / 1e6:.0f} MB)")
+
+    print(f"{'cenário':38s} {'tempo':>9s} {'pontos/s':>12s}")
+    for nome, cenario in _cenarios(caminho, diretorio).items():
+        inicio = time.perf_counter()
+        cenario()
+        decorrido = time.perf_counter() - inicio
+        print(f"{nome:38s} {decorrido:7.2f} s {pontos / decorrido:12,.0f}")
+
+
+if __name__ == '__main__':
+    main()
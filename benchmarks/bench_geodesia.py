@@ -0,0 +1,94 @@
+"""
+utils.geodesia: colunas em NumPy vs caminho em Python puro
+
+Gera uma trilha sintética (10 Hz, zigue-zague de talhão) e mede as funções
+de coluna do módulo para 10k, 1M e 10M pontos: distâncias consecutivas,
+distância acumulada, rumos, velocidades a partir do tempo e limites. O
+caminho em Python puro (o mesmo que roda sem NumPy instalado) é medido até
+limite_python pontos, para não gastar gigabytes em listas.
+
+Uso:
+    python -m benchmarks.bench_geodesia [pontos_maximo] [limite_python]
+"""
+import sys
+import time
+
+from utils import geodesia
+
+TAMANHOS = (10_000, 1_000_000, 10_000_000)
+
+
+def _trilha(pontos, usar_numpy):
+    passadas = 3000
+    if usar_numpy:
+        np = geodesia.np
+        i = np.arange(pontos)
+        j = i % passadas
+        ts = 1704103200000 + i * 100
+        lats = -15.78 + np.where((i // passadas) % 2 == 0, j, passadas - 1 - j) * 2e-6
+        lons = -47.93 + (i // passadas) * 1e-4
+        return ts, lats, lons
+    ts, lats, lons = [], [], []
+    for i in range(pontos):
+        passada, j = divmod(i, passadas)
+        ts.append(1704103200000 + i * 100)
+        lats.append(-15.78 + (j if passada % 2 == 0 else passadas - 1 - j) * 2e-6)
+        lons.append(-47.93 + passada * 1e-4)
+    return ts, lats, lons
+
+
+def _operacoes(ts, lats, lons):
+    trechos = geodesia.distancias(lats, lons)
+    return {
+        'distâncias': lambda: geodesia.distancias(lats, lons),
+        'distância acumulada': lambda: geodesia.distancia_acumulada(lats, lons),
+        'rumos': lambda: geodesia.rumos(lats, lons),
+        'velocidades': lambda: geodesia.velocidades_kmh(trechos, geodesia.diferencas(ts[:-1], ts[1:]), 1000),
+        'limites': lambda: geodesia.limites(lats, lons),
+    }
+
+
+def _medir(funcao, repeticoes):
+    melhor = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor
+
+
+def _rodar(pontos, usar_numpy):
+    numpy = geodesia.np
+    if not usar_numpy:
+        geodesia.np = None  # Caminho em Python puro, como sem NumPy instalado
+    try:
+        ts, lats, lons = _trilha(pontos, usar_numpy)
+        repeticoes = 3 if pontos <= 1_000_000 else 1
+        return {nome: _medir(funcao, repeticoes) for nome, funcao in _operacoes(ts, lats, lons).items()}
+    finally:
+        geodesia.np = numpy
+
+
+def main():
+    maximo = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    limite_python = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+    tamanhos = [n for n in TAMANHOS if n < maximo] + [maximo]
+    if not geodesia.NUMPY_DISPONIVEL:
+        print("NumPy não instalado: só o caminho em Python puro")
+
+    print(f"{'pontos':>10s} {'operação':22s} {'python':>10s} {'numpy':>10s} {'ganho':>7s}")
+    for pontos in tamanhos:
+        python = _rodar(pontos, False) if pontos <= limite_python else {}
+        vetorizado = _rodar(pontos, True) if geodesia.NUMPY_DISPONIVEL else {}
+        for nome in (vetorizado or python):
+            t_py = python.get(nome)
+            t_np = vetorizado.get(nome)
+            coluna_py = f"{t_py * 1000:7.1f} ms" if t_py is not None else f"{'-':>10s}"
+            coluna_np = f"{t_np * 1000:7.1f} ms" if t_np is not None else f"{'-':>10s}"
+            ganho = f"{t_py / t_np:6.1f}x" if t_py and t_np else ''
+            print(f"{pontos:10d} {nome:22s} {coluna_py} {coluna_np} {ganho}")
+
+
+if __name__ == '__main__':
+    main()
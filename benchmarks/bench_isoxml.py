@@ -0,0 +1,70 @@
+"""
+Exportação ISOXML TaskData de sessões longas: tempo de exportação e da validação de ida e volta
+
+Grava no banco sessões de várias horas a 10 Hz, exporta com
+utils.isoxml.exportar_taskdata (TLG binário de registros fixos) e relê
+tudo com validar_taskdata, comparando registro a registro com o banco.
+
+Uso:
+    python -m benchmarks.bench_isoxml [horas_por_sessao] [sessoes] [diretorio]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import db
+from utils import isoxml
+
+PONTOS_POR_HORA = 36000
+
+
+def _preencher(caminho, horas, sessoes, inicio_ms=1704103200000):
+    conexao = db.ConexaoBanco(caminho)
+    pontos = int(horas * PONTOS_POR_HORA)
+    for s in range(sessoes):
+        base_ms = inicio_ms + s * 86_400_000
+        sessao = conexao.iniciar_sessao(f'Bench {s + 1}', 12.0, ts=base_ms)
+        for base in range(0, pontos, 10000):
+            conexao.inserir_lote([(sessao, base_ms + i * 100, -15.78 + (i % 3000) * 2e-6,
+                                   -47.93 + (i // 3000) * 1e-4, 0.0003 if (i // 3000) % 10 else 0.0,
+                                   8.0, 0.0, 0.9, 4)
+                                  for i in range(base, min(pontos, base + 10000))])
+        conexao.encerrar_sessao(base_ms + pontos * 100)
+    conexao.fechar()
+    return pontos * sessoes
+
+
+def main():
+    horas = float(sys.argv[1]) if len(sys.argv) > 1 else 8
+    sessoes = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    diretorio = sys.argv[3] if len(sys.argv) > 3 else tempfile.mkdtemp(prefix='bench_isoxml_')
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, 'isoxml.db')
+    for sufixo in ('', '-wal', '-shm'):
+        if os.path.exists(caminho + sufixo):
+            os.remove(caminho + sufixo)
+
+    inicio = time.perf_counter()
+    total = _preencher(caminho, horas, sessoes)
+    print(f"{sessoes} sessões de {horas:g} h ({total} pontos) em {time.perf_counter() - inicio:.1f} s")
+
+    inicio = time.perf_counter()
+    xml = isoxml.exportar_taskdata(diretorio, caminho_banco=caminho)
+    decorrido = time.perf_counter() - inicio
+    pasta = os.path.dirname(xml)
+    tamanho = sum(os.path.getsize(os.path.join(pasta, nome)) for nome in os.listdir(pasta))
+    print(f"exportação: {decorrido:.2f} s ({total / decorrido:,.0f} pontos/s), "
+          f"{tamanho / 1e6:.1f} MB ({isoxml.TAMANHO_REGISTRO} bytes por registro)")
+
+    inicio = time.perf_counter()
+    resultado = isoxml.validar_taskdata(pasta, caminho)
+    decorrido = time.perf_counter() - inicio
+    print(f"validação: {decorrido:.2f} s, {resultado['registros']} registros, "
+          f"erro de posição máx. {resultado['erro_posicao_max']:.1e} grau, {len(resultado['erros'])} erros")
+    for erro in resultado['erros'][:10]:
+        print(f"  {erro}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark do FiltroKalmanENU
+
+Gera uma trajetória de trator (passadas retas e curvas de cabeceira) a
+10 Hz com ruído de posição e mede:
+
+  - custo por atualização e por consulta (estimar)
+  - erro RMS dos fixes brutos contra o estimado pelo filtro
+  - erro ao cobrir uma falha de 2 s: extrapolação antiga (10% do último
+    deslocamento) contra a predição do filtro
+
+Uso:
+    python -m benchmarks.bench_kalman [num_fixes]
+"""
+import math
+import random
+import sys
+import time
+
+from utils.kalman import FiltroKalmanENU
+
+LAT0, LON0 = -15.7801, -47.9292
+M_POR_GRAU = math.radians(1) * 6371e3
+
+
+def trajetoria(num_fixes, taxa_hz=10.0, velocidade=3.0, comprimento=200.0, raio=6.0):
+    """Gera (t, leste, norte, velocidade, rumo) em vai-e-vem com curvas de 180 graus"""
+    dt = 1.0 / taxa_hz
+    e, n, rumo = 0.0, 0.0, 0.0
+    percorrido = 0.0
+    girando = 0.0
+    sentido = 1
+    for i in range(num_fixes):
+        yield i * dt, e, n, velocidade, rumo
+        passo = velocidade * dt
+        if girando > 0:
+            delta = math.degrees(passo / raio)
+            rumo = (rumo + sentido * delta) % 360.0
+            girando -= delta
+            if girando <= 0:
+                sentido = -sentido
+                percorrido = 0.0
+        else:
+            percorrido += passo
+            if percorrido >= comprimento:
+                girando = 180.0
+        e += passo * math.sin(math.radians(rumo))
+        n += passo * math.cos(math.radians(rumo))
+
+
+def para_geo(e, n):
+    return LAT0 + n / M_POR_GRAU, LON0 + e / (M_POR_GRAU * math.cos(math.radians(LAT0)))
+
+
+def erro_m(lat, lon, e, n):
+    lat_r, lon_r = para_geo(e, n)
+    dn = (lat - lat_r) * M_POR_GRAU
+    de = (lon - lon_r) * M_POR_GRAU * math.cos(math.radians(LAT0))
+    return math.hypot(de, dn)
+
+
+def main():
+    num_fixes = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    random.seed(1)
+    sigma = 1.5
+
+    amostras = []
+    for t, e, n, v, rumo in trajetoria(num_fixes):
+        lat, lon = para_geo(e + random.gauss(0, sigma), n + random.gauss(0, sigma))
+        amostras.append((t, e, n, lat, lon, v * 3.6 + random.gauss(0, 0.3),
+                         (rumo + random.gauss(0, 2.0)) % 360.0))
+
+    filtro = FiltroKalmanENU()
+    inicio = time.perf_counter()
+    for t, _, _, lat, lon, v, rumo in amostras:
+        filtro.atualizar(t, lat, lon, v, rumo, sigma_h=sigma * math.sqrt(2))
+    custo_atualizacao = (time.perf_counter() - inicio) / num_fixes * 1e6
+
+    inicio = time.perf_counter()
+    for i in range(num_fixes):
+        filtro.estimar(amostras[-1][0] + (i % 10) * 0.016)
+    custo_estimar = (time.perf_counter() - inicio) / num_fixes * 1e6
+
+    print(f"Atualização: {custo_atualizacao:.2f} us/fix, consulta: {custo_estimar:.2f} us")
+
+    # Erro de suavização (após convergência)
+    filtro = FiltroKalmanENU()
+    soma_bruto = soma_filtro = 0.0
+    contagem = 0
+    for i, (t, e, n, lat, lon, v, rumo) in enumerate(amostras):
+        lat_f, lon_f, _, _ = filtro.atualizar(t, lat, lon, v, rumo, sigma_h=sigma * math.sqrt(2))
+        if i >= 50:
+            soma_bruto += erro_m(lat, lon, e, n) ** 2
+            soma_filtro += erro_m(lat_f, lon_f, e, n) ** 2
+            contagem += 1
+    print(f"Erro RMS: fixes brutos {math.sqrt(soma_bruto / contagem):.2f} m, "
+          f"filtro {math.sqrt(soma_filtro / contagem):.2f} m")
+
+    # Ponte de falhas de 2 s a cada 10 s
+    filtro = FiltroKalmanENU()
+    anteriores = []
+    erros_antigo = []
+    erros_filtro = []
+    for i, (t, e, n, lat, lon, v, rumo) in enumerate(amostras):
+        if i > 100 and i % 100 < 20:
+            if len(anteriores) >= 2:
+                p1, p2 = anteriores[-2], anteriores[-1]
+                lat_a = p2[0] + (p2[0] - p1[0]) * 0.1
+                lon_a = p2[1] + (p2[1] - p1[1]) * 0.1
+                erros_antigo.append(erro_m(lat_a, lon_a, e, n))
+            lat_f, lon_f, _, _ = filtro.estimar(t)
+            erros_filtro.append(erro_m(lat_f, lon_f, e, n))
+            continue
+        filtro.atualizar(t, lat, lon, v, rumo, sigma_h=sigma * math.sqrt(2))
+        anteriores.append((lat, lon))
+    print(f"Falha de 2 s: extrapolação antiga {sum(erros_antigo) / len(erros_antigo):.2f} m "
+          f"(máx {max(erros_antigo):.2f}), filtro {sum(erros_filtro) / len(erros_filtro):.2f} m "
+          f"(máx {max(erros_filtro):.2f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Latência ponta a ponta do fix, do byte na porta até o "quadro"
+
+Roda o simulador em tempo real através do GNSSController e consome o
+barramento como a interface Kivy faz (drenando a cada tick), registrando a
+etapa 'tela' a cada tick. Mostra p50/p95/p99 por etapa para alguns
+intervalos de atualização da interface.
+
+Uso:
+    python -m benchmarks.bench_latencia [segundos_por_cenario] [taxa_hz]
+"""
+import sys
+import time
+
+from gnss_controller import GNSSController
+from utils.latencia import monitor, TELA
+from utils.simulador import PlanoTalhao, SimuladorTrajetoria, FonteSimulada
+
+
+def rodar(intervalo_tela, segundos, taxa_hz):
+    monitor.resetar()
+    controlador = GNSSController()
+    assinatura = controlador.subscribe('tela')
+    simulador = SimuladorTrajetoria(PlanoTalhao(-15.7801, -47.9292), taxa_hz=taxa_hz,
+                                    falhas_por_hora=0, semente=1)
+    controlador.start(FonteSimulada(simulador))
+
+    fim = time.monotonic() + segundos
+    while time.monotonic() < fim:
+        time.sleep(intervalo_tela)
+        agora = monitor.relogio()
+        for fix in assinatura.obter_pendentes():
+            monitor.registrar(TELA, fix.instante, agora)
+    controlador.stop()
+
+    print(f"Interface a cada {intervalo_tela * 1000:.0f} ms, receptor a {taxa_hz} Hz:")
+    print(monitor.formatar())
+    print(f"  orçamento de 150 ms no p95: {'ok' if monitor.verificar_orcamento(0.150) else 'estourado'}")
+
+
+def main():
+    segundos = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    taxa_hz = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    for intervalo in (1.0, 0.1, 1 / 30):
+        rodar(intervalo, segundos, taxa_hz)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark do leitor contínuo contra o laço antigo de polling
+
+Simula uma UART saturada de sentenças NMEA na taxa de bits informada, com
+buffer de driver limitado (bytes que não cabem são perdidos), e compara:
+
+  - polling: readline() de até 5 linhas e sleep de 0.5 s (laço antigo)
+  - stream:  LeitorStreamGNSS lendo em bloco tudo o que está disponível
+
+Uso:
+    python -m benchmarks.bench_leitor_stream [duracao_s]
+"""
+import sys
+import time
+
+from utils.leitor_stream import LeitorStreamGNSS
+
+
+def _checksum(corpo):
+    cs = 0
+    for c in corpo.encode('ascii'):
+        cs ^= c
+    return f"{cs:02X}"
+
+
+def _gerar_sentenca(n):
+    segundos = n // 10
+    hhmmss = f"{(segundos // 3600) % 24:02d}{(segundos // 60) % 60:02d}{segundos % 60:02d}.{n % 10}0"
+    if n % 2:
+        corpo = f"GNRMC,{hhmmss},A,1546.8060,S,04755.7520,W,5.40,87.20,160126,,,A"
+    else:
+        corpo = f"GNGGA,{hhmmss},1546.8060,S,04755.7520,W,1,12,0.8,1172.0,M,-12.3,M,,"
+    return f"${corpo}*{_checksum(corpo)}\r\n".encode('ascii')
+
+
+class UARTSimulada:
+    """Porta serial simulada que recebe bytes na velocidade da linha"""
+
+    def __init__(self, baudrate, tamanho_buffer_driver=4096):
+        self.bytes_por_segundo = baudrate / 10  # 8N1
+        self.tamanho_buffer_driver = tamanho_buffer_driver
+        self.is_open = True
+        self.timeout = 0.05
+        self._inicio = time.monotonic()
+        self._produzidos = 0
+        self._pendente = bytearray()
+        self._fila = bytearray()
+        self._n = 0
+        self.sentencas_enviadas = 0
+        self.bytes_perdidos = 0
+
+    def _receber(self):
+        alvo = int((time.monotonic() - self._inicio) * self.bytes_por_segundo)
+        while self._produzidos < alvo:
+            if not self._pendente:
+                self._pendente += _gerar_sentenca(self._n)
+                self._n += 1
+                self.sentencas_enviadas += 1
+            n = min(alvo - self._produzidos, len(self._pendente))
+            bloco = self._pendente[:n]
+            del self._pendente[:n]
+            self._produzidos += n
+            livre = self.tamanho_buffer_driver - len(self._fila)
+            if livre < len(bloco):
+                self.bytes_perdidos += len(bloco) - max(livre, 0)
+                bloco = bloco[:max(livre, 0)]
+            self._fila += bloco
+
+    @property
+    def in_waiting(self):
+        self._receber()
+        return len(self._fila)
+
+    def read(self, n=1):
+        self._receber()
+        if not self._fila:
+            time.sleep(min(self.timeout, n / self.bytes_por_segundo))
+            self._receber()
+        dados = bytes(self._fila[:n])
+        del self._fila[:n]
+        return dados
+
+    def readline(self):
+        limite = time.monotonic() + self.timeout
+        linha = bytearray()
+        while time.monotonic() < limite:
+            self._receber()
+            fim = self._fila.find(b'\n')
+            if fim >= 0:
+                linha += self._fila[:fim + 1]
+                del self._fila[:fim + 1]
+                return bytes(linha)
+            time.sleep(0.001)
+        return bytes(linha)
+
+
+def medir_polling(baudrate, duracao):
+    uart = UARTSimulada(baudrate)
+    recebidas = 0
+    fim = time.monotonic() + duracao
+    while time.monotonic() < fim:
+        for _ in range(5):
+            linha = uart.readline().strip()
+            if linha.startswith((b'$GNRMC', b'$GNGGA')):
+                recebidas += 1
+                break
+        time.sleep(0.5)
+    uart.in_waiting  # contabiliza perdas até o fim da medição
+    return uart, recebidas
+
+
+def medir_stream(baudrate, duracao):
+    uart = UARTSimulada(baudrate)
+    leitor = LeitorStreamGNSS(uart)
+    fim = time.monotonic() + duracao
+    for _ in leitor.sentencas(lambda: time.monotonic() < fim):
+        pass
+    # Drenar o que ainda estiver pendente no buffer do driver
+    while uart.in_waiting:
+        leitor.ler_disponivel()
+    completas = uart.sentencas_enviadas - (1 if uart._pendente else 0)
+    return uart, leitor.sentencas_lidas, leitor, completas
+
+
+def main():
+    duracao = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+
+    for baudrate in (115200, 460800):
+        uart, recebidas = medir_polling(baudrate, duracao)
+        print(f"[polling] {baudrate:>6} baud: enviadas={uart.sentencas_enviadas:>6} "
+              f"recebidas={recebidas:>6} perdidas={uart.sentencas_enviadas - recebidas:>6} "
+              f"bytes_perdidos_driver={uart.bytes_perdidos}")
+
+        uart, recebidas, leitor, completas = medir_stream(baudrate, duracao)
+        stats = leitor.obter_estatisticas()
+        print(f"[stream ] {baudrate:>6} baud: enviadas={completas:>6} "
+              f"recebidas={recebidas:>6} perdidas={completas - recebidas:>6} "
+              f"bytes_perdidos_driver={uart.bytes_perdidos} bytes_lidos={stats['bytes_lidos']} "
+              f"leituras={stats['leituras']} overruns={stats['overruns']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Pico de memória (RSS) das leituras completas: fetchall vs paginação por chave
+
+Cada cenário roda em um processo novo sobre o mesmo banco, e informa o
+pico de RSS (ru_maxrss) acima do RSS logo após os imports. Os cenários
+"antes" reproduzem o código anterior (fetchall de todos os pontos).
+
+Uso:
+    python -m benchmarks.bench_memoria [pontos] [diretorio]
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import db
+from utils.exportacao import ExportadorDados
+
+SQL_TODOS = 'SELECT ts, latitude, longitude, hectares FROM pontos ORDER BY sessao_id, ts'
+
+
+def _preencher(caminho, pontos):
+    conexao = db.configurar_banco(caminho)
+    sessao = None
+    for base in range(0, pontos, 1000):
+        if base % 72000 == 0:
+            sessao = conexao.iniciar_sessao(ts=1704103200000 + base * 100)
+        conexao.inserir_lote([(sessao, 1704103200000 + i * 100, -15.78 + (i % 3000) * 2e-6,
+                               -47.93 + (i // 3000) * 1e-4, 0.0003, 8.0, 90.0, 0.9, 1)
+                              for i in range(base, min(pontos, base + 1000))])
+    db.fechar_banco()
+
+
+def _antes_csv(caminho, saida):
+    import csv
+    import sqlite3
+    from utils.haversine import haversine
+    conn = sqlite3.connect(caminho)
+    pontos = conn.execute(SQL_TODOS).fetchall()
+    conn.close()
+    with open(saida, 'w', newline='') as arquivo:
+        writer = csv.writer(arquivo)
+        for i, (ts, lat, lon, hectares) in enumerate(pontos):
+            distancia = haversine(pontos[i - 1][1], pontos[i - 1][2], lat, lon) if i else 0
+            writer.writerow([db.ts_para_datetime(ts).isoformat(), lat, lon, hectares, round(distancia, 2)])
+
+
+def _antes_relatorio(caminho, saida):
+    import sqlite3
+    conn = sqlite3.connect(caminho)
+    pontos = conn.execute(SQL_TODOS).fetchall()
+    conn.close()
+    ExportadorDados(caminho)._calcular_estatisticas(pontos)
+    with open(saida, 'w') as arquivo:
+        for ponto in pontos[-20:]:
+            arquivo.write(f"{ponto}\n")
+
+
+def _antes_obter_pontos(caminho, saida):
+    db.configurar_banco(caminho)
+    sum(1 for _ in db.obter_conexao().consultar('SELECT latitude, longitude FROM pontos ORDER BY sessao_id, ts'))
+
+
+def _obter_pontos(caminho, saida):
+    db.configurar_banco(caminho)
+    sum(1 for _ in db.obter_pontos())
+
+
+CENARIOS = {
+    'obter_pontos (fetchall, antes)': _antes_obter_pontos,
+    'obter_pontos (paginado)': _obter_pontos,
+    'exportar_csv (fetchall, antes)': _antes_csv,
+    'exportar_csv (paginado)': lambda caminho, saida: ExportadorDados(caminho).exportar_csv(saida),
+    'relatório (fetchall, antes)': _antes_relatorio,
+    'relatório (paginado)': lambda caminho, saida: ExportadorDados(caminho).gerar_relatorio_resumo(saida),
+    'csv + relatório (uma passada)': lambda caminho, saida: ExportadorDados(caminho).exportar_tudo(saida, saida + '.txt'),
+}
+
+
+def _rss_atual_kb():
+    with open('/proc/self/statm') as arquivo:
+        return int(arquivo.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+def _filho(cenario, caminho, saida):
+    base = _rss_atual_kb()
+    inicio = time.perf_counter()
+    CENARIOS[cenario](caminho, saida)
+    decorrido = time.perf_counter() - inicio
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KB no Linux
+    print(f"{pico - base} {decorrido}")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--cenario':
+        _filho(*sys.argv[2:5])
+        return
+    pontos = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    diretorio = sys.argv[2] if len(sys.argv) > 2 else tempfile.mkdtemp(prefix='bench_memoria_')
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, 'memoria.db')
+    for sufixo in ('', '-wal', '-shm'):
+        if os.path.exists(caminho + sufixo):
+            os.remove(caminho + sufixo)
+    _preencher(caminho, pontos)
+    print(f"{pontos} pontos ({os.path.getsize(caminho) / 1e6:.0f} MB)")
+
+    saida = os.path.join(diretorio, 'saida')
+    for cenario in CENARIOS:
+        resultado = subprocess.run([sys.executable, '-m', 'benchmarks.bench_memoria', '--cenario', cenario,
+                                    caminho, saida], capture_output=True, text=True, check=True)
+        pico_kb, decorrido = resultado.stdout.split()[-2:]
+        print(f"{cenario:34s} pico +{int(pico_kb) / 1024:7.1f} MB  {float(decorrido):6.1f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark do ParserNMEA contra o pynmea2
+
+Processa um lote de sentenças RMC, GGA, VTG, GSA e GST com os dois parsers
+e mostra o custo médio por sentença. Se o pynmea2 não estiver instalado,
+mede apenas o parser interno. Também mede o custo de um fix completo via
+NAV-PVT (UBX) comparado a RMC + GGA + GSA + VTG.
+
+Uso:
+    python -m benchmarks.bench_nmea_parser [repeticoes]
+"""
+import struct
+import sys
+import time
+from functools import reduce
+from operator import xor
+
+from utils.nmea_parser import ParserNMEA
+from utils.ubx import DecodificadorUBX, montar_frame, CLASSE_NAV, ID_NAV_PVT
+
+
+def _sentenca(corpo):
+    cs = reduce(xor, corpo.encode('ascii'), 0)
+    return f"${corpo}*{cs:02X}".encode('ascii')
+
+
+SENTENCAS = [
+    _sentenca("GNRMC,123519.00,A,1546.8060,S,04755.7520,W,5.40,87.20,160126,,,A"),
+    _sentenca("GNGGA,123519.00,1546.8060,S,04755.7520,W,1,12,0.8,1172.0,M,-12.3,M,,"),
+    _sentenca("GNVTG,87.20,T,,M,5.40,N,10.00,K,A"),
+    _sentenca("GNGSA,A,3,02,05,12,15,18,24,25,29,,,,,1.4,0.8,1.1"),
+    _sentenca("GNGST,123519.00,1.2,0.9,0.7,45.0,0.8,0.6,1.5"),
+]
+
+NAV_PVT = montar_frame(CLASSE_NAV, ID_NAV_PVT, struct.pack(
+    '<IHBBBBBBIiBBBBiiiiIIiiiiiIIHH4xihH',
+    45319000, 2026, 1, 16, 12, 35, 19, 0x07, 10, 0, 3, 0x01, 0, 12,
+    -479292000, -157801000, 1160000, 1172000, 800, 1200,
+    100, 2778, 0, 2780, 8720000, 50, 100000, 140, 0, 0, 0, 0))
+
+
+def medir(funcao, entradas, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for linha in entradas:
+            funcao(linha)
+    decorrido = time.perf_counter() - inicio
+    return decorrido / (repeticoes * len(entradas)) * 1e6
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    parser = ParserNMEA(usar_fallback=False)
+    us_interno = medir(parser.parse, SENTENCAS, repeticoes)
+    print(f"ParserNMEA: {us_interno:.2f} us/sentença")
+
+    epoca_nmea = [SENTENCAS[0], SENTENCAS[1], SENTENCAS[2], SENTENCAS[3]]
+    us_epoca = medir(parser.parse, epoca_nmea, repeticoes) * len(epoca_nmea)
+    decodificador = DecodificadorUBX()
+    us_pvt = medir(decodificador.decodificar, [NAV_PVT], repeticoes)
+    print(f"Fix completo: RMC+GGA+VTG+GSA {us_epoca:.2f} us ({sum(len(s) + 2 for s in epoca_nmea)} bytes), "
+          f"NAV-PVT {us_pvt:.2f} us ({len(NAV_PVT)} bytes)")
+
+    try:
+        import pynmea2
+    except ImportError:
+        print("pynmea2 não instalado; comparação omitida")
+        return
+
+    textos = [s.decode('ascii') for s in SENTENCAS]
+    us_pynmea2 = medir(lambda t: pynmea2.parse(t, check=True), textos, repeticoes)
+    print(f"pynmea2:    {us_pynmea2:.2f} us/sentença ({us_pynmea2 / us_interno:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
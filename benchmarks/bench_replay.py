@@ -0,0 +1,66 @@
+"""
+Teste de carga do caminho de ingestão usando uma gravação bruta
+
+Reproduz uma gravação (utils.gravacao) o mais rápido possível através do
+GNSSManager (leitor contínuo, parser, montador de épocas, filtro) e mostra
+a vazão. Sem argumento, gera antes uma gravação sintética de 1 hora a 10 Hz.
+
+Uso:
+    python -m benchmarks.bench_replay [arquivo_ou_diretorio] [velocidade]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from gnss import GNSSManager
+from utils.gravacao import GravadorBruto, FonteReplay
+from benchmarks.bench_leitor_stream import _checksum
+
+
+def _gerar_epoca(i, taxa_hz):
+    segundos = i / taxa_hz
+    hora = f"{int(segundos // 3600) % 24:02d}{int(segundos // 60) % 60:02d}{segundos % 60:05.2f}"
+    bloco = b''
+    for corpo in (f"GNRMC,{hora},A,1546.8060,S,04755.7520,W,5.40,87.20,160126,,,A",
+                  f"GNGGA,{hora},1546.8060,S,04755.7520,W,1,12,0.8,1172.0,M,-12.3,M,,"):
+        bloco += f"${corpo}*{_checksum(corpo)}\r\n".encode('ascii')
+    return bloco
+
+
+def gerar_gravacao_sintetica(diretorio, segundos=3600, taxa_hz=10):
+    gravador = GravadorBruto(diretorio)
+    inicio = time.time()
+    for i in range(int(segundos * taxa_hz)):
+        gravador.gravar(_gerar_epoca(i, taxa_hz), inicio + i / taxa_hz)
+    gravador.fechar()
+    return diretorio
+
+
+def main():
+    velocidade = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    if len(sys.argv) > 1:
+        caminho = sys.argv[1]
+    else:
+        caminho = gerar_gravacao_sintetica(tempfile.mkdtemp(prefix='gnss_replay_'))
+        tamanho = sum(os.path.getsize(os.path.join(caminho, f)) for f in os.listdir(caminho))
+        print(f"Gravação sintética: {caminho} ({tamanho / 1024:.0f} KiB comprimido)")
+
+    fonte = FonteReplay(caminho, velocidade=velocidade)
+    manager = GNSSManager(porta='replay', fonte=fonte)
+
+    inicio = time.perf_counter()
+    fixes = 0
+    for _ in manager.iterar_pontos(lambda: not fonte.terminado):
+        fixes += 1
+    decorrido = time.perf_counter() - inicio
+
+    status = manager.obter_status()
+    print(f"{fixes} fixes em {decorrido:.2f} s ({fixes / decorrido:.0f} fixes/s, "
+          f"{fonte.bytes_entregues / decorrido / 1024:.0f} KiB/s)")
+    print(f"stream: {status['stream']}")
+    print(f"épocas: {status['epocas']}")
+
+
+if __name__ == '__main__':
+    main()
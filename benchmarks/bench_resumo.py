@@ -0,0 +1,90 @@
+"""
+Leituras do painel: agregação sobre pontos vs tabela resumo_sessoes
+
+Mede, para bancos de tamanhos crescentes, as consultas que o painel fazia
+(COUNT/SUM sobre pontos e último ponto) contra a leitura do resumo por
+sessão, e o custo de manter o resumo na gravação em lotes.
+
+Uso:
+    python -m benchmarks.bench_resumo [pontos_maximo] [diretorio]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from db import ConexaoBanco
+
+PONTOS_POR_SESSAO = 72000
+TAMANHO_LOTE = 50
+
+
+def _preencher(conexao, pontos, inicio_ms=1704103200000):
+    """Grava em lotes como o GravadorBanco; retorna o tempo gasto"""
+    sessao = None
+    decorrido = 0.0
+    for base in range(0, pontos, TAMANHO_LOTE):
+        lote = []
+        for i in range(base, min(pontos, base + TAMANHO_LOTE)):
+            if i % PONTOS_POR_SESSAO == 0:
+                sessao = conexao.iniciar_sessao(ts=inicio_ms + i * 100)
+            j = i % PONTOS_POR_SESSAO
+            lote.append((sessao, inicio_ms + i * 100, -15.78 + j * 2e-6, -47.93, 0.0003, 8.0, 0.0, 0.9, 1))
+        inicio = time.perf_counter()
+        conexao.inserir_lote(lote)
+        decorrido += time.perf_counter() - inicio
+    return decorrido
+
+
+def _medir(conexao, consultas, repeticoes=5):
+    melhor = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for sql in consultas:
+            conexao.consultar(sql)
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor
+
+
+CONSULTAS_PONTOS = (
+    'SELECT COUNT(*) FROM pontos',
+    'SELECT SUM(hectares) FROM pontos',
+    'SELECT ts FROM pontos ORDER BY sessao_id DESC, ts DESC LIMIT 1',
+)
+
+CONSULTAS_RESUMO = (
+    'SELECT SUM(pontos), SUM(hectares), SUM(distancia), MAX(velocidade_max) FROM resumo_sessoes',
+    'SELECT fim_ms FROM resumo_sessoes ORDER BY sessao_id DESC LIMIT 1',
+)
+
+
+def main():
+    maximo = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    diretorio = sys.argv[2] if len(sys.argv) > 2 else tempfile.mkdtemp(prefix='bench_resumo_')
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, 'resumo.db')
+    if os.path.exists(caminho):
+        os.remove(caminho)
+
+    conexao = ConexaoBanco(caminho)
+    total = 0
+    gravacao = 0.0
+    print(f"{'pontos':>10s} {'agregação':>12s} {'resumo':>10s} {'inserção em lotes':>20s}")
+    tamanhos = [n for n in (10_000, 100_000, 1_000_000, 10_000_000) if n < maximo] + [maximo]
+    for tamanho in tamanhos:
+        gravacao += _preencher(conexao, tamanho - total, 1704103200000 + total * 100)
+        total = tamanho
+        t_pontos = _medir(conexao, CONSULTAS_PONTOS)
+        t_resumo = _medir(conexao, CONSULTAS_RESUMO)
+        print(f"{total:10d} {t_pontos * 1000:9.2f} ms {t_resumo * 1000:7.3f} ms "
+              f"{total / gravacao:13.0f} linhas/s")
+
+    inicio = time.perf_counter()
+    divergentes = conexao.verificar_resumo()
+    print(f"Verificação completa: {time.perf_counter() - inicio:.2f} s, {len(divergentes)} sessões divergentes")
+    conexao.fechar()
+
+
+if __name__ == '__main__':
+    main()
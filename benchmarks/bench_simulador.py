@@ -0,0 +1,52 @@
+"""
+Teste de carga com o simulador de trajetória
+
+Roda o SimuladorTrajetoria a 25 Hz o mais rápido possível através do
+GNSSManager (modo simulação) e compara a trajetória filtrada com a
+verdadeira, para NMEA, UBX e os dois protocolos juntos.
+
+Uso:
+    python -m benchmarks.bench_simulador [minutos_simulados]
+"""
+import math
+import sys
+import time
+
+from gnss import GNSSManager
+from utils.simulador import PlanoTalhao
+
+
+def rodar(protocolo, minutos):
+    manager = GNSSManager(porta='simulador')
+    simulador = manager.ativar_modo_simulacao(
+        plano=PlanoTalhao(-15.7801, -47.9292, rumo=30.0, comprimento_passada=200.0, num_passadas=10),
+        tempo_real=False, taxa_hz=25, protocolo=protocolo, falhas_por_hora=30.0, semente=1)
+    epocas = int(minutos * 60 * 25)
+
+    m_por_grau = math.radians(1) * 6371e3
+    cos_lat = math.cos(math.radians(-15.7801))
+    fixes = 0
+    soma_erro = 0.0
+
+    inicio = time.perf_counter()
+    for instante, _ in manager.iterar_pontos(lambda: simulador.epocas_geradas < epocas):
+        lat, lon = simulador.posicao_real()
+        estimativa = manager.estimar_posicao(instante)
+        if estimativa:
+            soma_erro += ((estimativa[0] - lat) * m_por_grau) ** 2 + ((estimativa[1] - lon) * m_por_grau * cos_lat) ** 2
+        fixes += 1
+    decorrido = time.perf_counter() - inicio
+
+    print(f"{protocolo:6s}: {fixes} fixes de {epocas} épocas ({simulador.epocas_sem_fix} sem fix) "
+          f"em {decorrido:.2f} s = {fixes / decorrido:.0f} fixes/s, "
+          f"erro RMS filtrado {math.sqrt(soma_erro / max(fixes, 1)):.2f} m")
+
+
+def main():
+    minutos = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    for protocolo in ('nmea', 'ubx', 'ambos'):
+        rodar(protocolo, minutos)
+
+
+if __name__ == '__main__':
+    main()
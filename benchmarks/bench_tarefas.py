@@ -0,0 +1,114 @@
+"""
+Laço de desenho durante exportações: síncrona vs ExecutorTarefas
+
+Simula o laço da interface (um quadro a cada 1/30 s com alguns ms de
+trabalho em Python) e mede o tempo de cada quadro enquanto exporta o CSV
+do mesmo banco: parado, com a exportação chamada dentro do laço
+(como o botão Export fazia) e com 1 e 3 tarefas no ExecutorTarefas. O que
+importa é o pior quadro: na exportação síncrona ele dura a exportação
+inteira.
+
+Uso:
+    python -m benchmarks.bench_tarefas [pontos] [diretorio]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_exportacao import _preencher
+from utils.exportacao import ExportadorDados
+from utils.tarefas import ExecutorTarefas
+
+QUADROS_POR_SEGUNDO = 30
+TRABALHO_POR_QUADRO = 0.004  # s de Python puro por quadro (desenho do mapa e HUD)
+QUADROS_PARADO = 90
+
+
+def _trabalho_quadro():
+    fim = time.perf_counter() + TRABALHO_POR_QUADRO
+    while time.perf_counter() < fim:
+        pass
+
+
+def _laco(continuar, a_cada_quadro=None):
+    """Roda quadros até continuar() ser falso; retorna a duração de cada quadro"""
+    periodo = 1 / QUADROS_POR_SEGUNDO
+    quadros = []
+    while continuar():
+        inicio = time.perf_counter()
+        if a_cada_quadro is not None:
+            a_cada_quadro()
+        _trabalho_quadro()
+        decorrido = time.perf_counter() - inicio
+        quadros.append(decorrido)
+        if decorrido < periodo:
+            time.sleep(periodo - decorrido)
+    return quadros
+
+
+def _parado():
+    restantes = iter(range(QUADROS_PARADO))
+    return _laco(lambda: next(restantes, None) is not None)
+
+
+def _sincrono(exportador, diretorio):
+    pendente = [True]
+    depois = iter(range(10))
+
+    def quadro():
+        # O clique no Export chamava o exportador dentro do laço
+        if pendente:
+            pendente.pop()
+            exportador.exportar_csv(os.path.join(diretorio, 's.csv'))
+
+    inicio = time.perf_counter()
+    quadros = _laco(lambda: pendente or next(depois, None) is not None, quadro)
+    return quadros, time.perf_counter() - inicio
+
+
+def _em_tarefas(exportador, diretorio, quantidade):
+    executor = ExecutorTarefas(trabalhadores=quantidade)
+    inicio = time.perf_counter()
+    tarefas = [executor.exportar(exportador, 'csv', os.path.join(diretorio, f't{i}.csv'))
+               for i in range(quantidade)]
+    quadros = _laco(lambda: executor.tarefas, executor.processar_eventos)
+    duracao = time.perf_counter() - inicio
+    executor.encerrar()
+    falhas = [tarefa.erro for tarefa in tarefas if tarefa.erro]
+    if falhas:
+        raise falhas[0]
+    return quadros, duracao
+
+
+def _percentil(valores, fracao):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * fracao))]
+
+
+def main():
+    pontos = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    diretorio = sys.argv[2] if len(sys.argv) > 2 else tempfile.mkdtemp(prefix='bench_tarefas_')
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, 'tarefas.db')
+    for sufixo in ('', '-wal', '-shm'):
+        if os.path.exists(caminho + sufixo):
+            os.remove(caminho + sufixo)
+    _preencher(caminho, pontos)
+    exportador = ExportadorDados(caminho)
+
+    resultados = {'parado': (_parado(), None)}
+    resultados['exportação síncrona no laço'] = _sincrono(exportador, diretorio)
+    resultados['1 tarefa (ExecutorTarefas)'] = _em_tarefas(exportador, diretorio, 1)
+    resultados['3 tarefas simultâneas'] = _em_tarefas(exportador, diretorio, 3)
+
+    print(f"{pontos} pontos, {QUADROS_POR_SEGUNDO} quadros/s, {TRABALHO_POR_QUADRO * 1000:.0f} ms de trabalho por quadro")
+    print(f"{'cenário':30s} {'quadros':>8s} {'mediana':>10s} {'p99':>10s} {'pior':>10s} {'exportação':>11s}")
+    for nome, (quadros, duracao) in resultados.items():
+        exportacao = f"{duracao:9.2f} s" if duracao is not None else f"{'-':>11s}"
+        print(f"{nome:30s} {len(quadros):8d} {_percentil(quadros, 0.5) * 1000:7.1f} ms "
+              f"{_percentil(quadros, 0.99) * 1000:7.1f} ms {max(quadros) * 1000:7.1f} ms {exportacao}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Carga de uma sessão: linhas do SQLite vs arquivo de trilha colunar (.trk)
+
+Grava uma sessão de N pontos no banco, converte para .trk e compara o
+tempo de carga (abrir + ter as colunas à mão) e o tamanho: fetchall das
+linhas da sessão, abertura do .trk com as colunas como memoryview (sem
+cópia), cópia para arrays contíguos e decodificação ponto a ponto.
+
+Uso:
+    python -m benchmarks.bench_trilha [pontos] [diretorio]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import db
+from utils.trilha_binaria import TrilhaBinaria, converter_sessao
+
+
+def _melhor(funcao, repeticoes=3):
+    melhor = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor, resultado
+
+
+def main():
+    pontos = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    diretorio = sys.argv[2] if len(sys.argv) > 2 else tempfile.mkdtemp(prefix='bench_trilha_')
+    os.makedirs(diretorio, exist_ok=True)
+    caminho_banco = os.path.join(diretorio, 'trilha.db')
+    caminho_trilha = os.path.join(diretorio, 'trilha.trk')
+    for caminho in (caminho_banco, caminho_banco + '-wal', caminho_banco + '-shm', caminho_trilha):
+        if os.path.exists(caminho):
+            os.remove(caminho)
+
+    conexao = db.configurar_banco(caminho_banco)
+    sessao = conexao.iniciar_sessao(ts=1704103200000)
+    for base in range(0, pontos, 1000):
+        conexao.inserir_lote([(sessao, 1704103200000 + i * 100, -15.78 + (i % 3000) * 2e-6,
+                               -47.93 + (i // 3000) * 1e-4, 0.0003, 8.0 + (i % 7) * 0.1, 90.0, 0.9, 1)
+                              for i in range(base, min(pontos, base + 1000))])
+
+    inicio = time.perf_counter()
+    converter_sessao(sessao, caminho_trilha)
+    print(f"{pontos} pontos convertidos em {time.perf_counter() - inicio:.2f} s; "
+          f".trk {os.path.getsize(caminho_trilha) / 1e6:.1f} MB "
+          f"({os.path.getsize(caminho_trilha) / pontos:.0f} bytes/ponto)")
+
+    sql = 'SELECT ts, latitude, longitude, velocidade, rumo FROM pontos WHERE sessao_id = ? ORDER BY ts'
+    t, linhas = _melhor(lambda: conexao.consultar(sql, (sessao,)))
+    print(f"{'SQLite fetchall da sessão':38s} {t * 1000:9.1f} ms  ({len(linhas)} tuplas)")
+    del linhas
+
+    def abrir():
+        trilha = TrilhaBinaria(caminho_trilha)
+        blocos = list(trilha.blocos())
+        trilha.fechar()
+        return blocos
+
+    t, blocos = _melhor(abrir)
+    print(f"{'.trk: mmap + colunas (memoryview)':38s} {t * 1000:9.3f} ms  ({len(blocos)} blocos)")
+
+    def copiar():
+        with TrilhaBinaria(caminho_trilha) as trilha:
+            return trilha.colunas()
+
+    t, colunas = _melhor(copiar)
+    print(f"{'.trk: colunas em arrays contíguos':38s} {t * 1000:9.1f} ms  ({len(colunas['ts'])} pontos)")
+
+    def decodificar():
+        with TrilhaBinaria(caminho_trilha) as trilha:
+            return sum(1 for _ in trilha.pontos())
+
+    t, total = _melhor(decodificar, 1)
+    print(f"{'.trk: decodificação ponto a ponto':38s} {t * 1000:9.1f} ms  ({total} tuplas)")
+    db.fechar_banco()
+
+
+if __name__ == '__main__':
+    main()
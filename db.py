@@ -1,10 +1,113 @@
+import atexit
+import math
+import os
+import queue
 import sqlite3
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, timezone
+from utils.diario_trilha import DiarioTrilha, CheckpointerDiario
+from utils.geodesia import RAIO_TERRA
+from utils.haversine import haversine
+from utils.latencia import monitor as monitor_latencia, BANCO
 
-def criar_banco():
-    conn = sqlite3.connect('pulverizacao.db')
-    cur = conn.cursor()
-    cur.execute('''
+CAMINHO_BANCO = 'pulverizacao.db'
+CAMINHO_DIARIO = 'pulverizacao.diario'
+
+# PRAGMA user_version do esquema atual (0 = banco antigo, sem versão)
+VERSAO_ESQUEMA = 6
+
+# Sessões separadas por uma pausa maior que esta na migração do esquema 1
+INTERVALO_SESSAO_MIGRACAO_MS = 30 * 60 * 1000
+
+SQL_INSERIR_PONTO = ('INSERT INTO pontos(sessao_id, ts, latitude, longitude, hectares, velocidade, '
+                     'rumo, hdop, qualidade) VALUES(?,?,?,?,?,?,?,?,?)')
+
+# Soma um lote ao resumo da sessão (a linha é criada no primeiro lote)
+SQL_SOMAR_RESUMO = '''
+    INSERT INTO resumo_sessoes(sessao_id, pontos, hectares, distancia, inicio_ms, fim_ms,
+                               velocidade_max, ultima_lat, ultima_lon)
+    VALUES(?,?,?,?,?,?,?,?,?)
+    ON CONFLICT(sessao_id) DO UPDATE SET
+        pontos = pontos + excluded.pontos,
+        hectares = hectares + excluded.hectares,
+        distancia = distancia + excluded.distancia,
+        inicio_ms = MIN(inicio_ms, excluded.inicio_ms),
+        fim_ms = MAX(fim_ms, excluded.fim_ms),
+        velocidade_max = MAX(velocidade_max, excluded.velocidade_max),
+        ultima_lat = excluded.ultima_lat,
+        ultima_lon = excluded.ultima_lon
+'''
+
+SQL_GRAVAR_RESUMO = ('INSERT OR REPLACE INTO resumo_sessoes(sessao_id, pontos, hectares, distancia, inicio_ms, '
+                     'fim_ms, velocidade_max, ultima_lat, ultima_lon) VALUES(?,?,?,?,?,?,?,?,?)')
+
+# Campos do resumo, na ordem das listas de acumulação e de SQL_SOMAR_RESUMO (sem sessao_id)
+CAMPOS_RESUMO = ('pontos', 'hectares', 'distancia', 'inicio_ms', 'fim_ms', 'velocidade_max',
+                 'ultima_lat', 'ultima_lon')
+
+
+# Colunas de pontos aceitas por iterar_pontos, e linhas por página da paginação
+COLUNAS_PONTOS = ('id', 'sessao_id', 'ts', 'latitude', 'longitude', 'hectares', 'velocidade', 'rumo',
+                  'hdop', 'qualidade')
+TAMANHO_PAGINA_PADRAO = 1000
+
+# Velocidade implícita (distância/tempo entre pontos) acima disto é ruído, não entra no máximo
+VELOCIDADE_IMPLICITA_MAX_KMH = 50.0
+
+# Ids por "IN (...)": abaixo do limite de parâmetros de versões antigas do SQLite (999)
+IDS_POR_CONSULTA = 500
+
+# Folga relativa dos retângulos das buscas por raio (ver _retangulo_do_raio)
+MARGEM_RAIO = 1e-6
+
+
+def _novo_resumo(ultimo_ts=None, ultima_lat=None, ultima_lon=None):
+    # [pontos, hectares, distancia, inicio_ms, fim_ms, velocidade_max, ultima_lat, ultima_lon];
+    # fim_ms/ultima_* começam no último ponto já contado para a distância continuar dele
+    return [0, 0.0, 0.0, None, ultimo_ts, 0.0, ultima_lat, ultima_lon]
+
+
+def _somar_ponto(resumo, ts, lat, lon, hectares, velocidade):
+    """Acumula um ponto (em ordem de ts) no resumo; velocidade em km/h ou None"""
+    if resumo[6] is not None:
+        distancia = haversine(resumo[6], resumo[7], lat, lon)
+        resumo[2] += distancia
+        if velocidade is None and ts > resumo[4]:
+            velocidade = distancia / (ts - resumo[4]) * 3600  # m/ms -> km/h
+            if velocidade >= VELOCIDADE_IMPLICITA_MAX_KMH:
+                velocidade = None
+    resumo[0] += 1
+    resumo[1] += hectares or 0.0
+    if resumo[3] is None:
+        resumo[3] = ts
+    resumo[4] = ts
+    if velocidade is not None and velocidade > resumo[5]:
+        resumo[5] = velocidade
+    resumo[6] = lat
+    resumo[7] = lon
+
+
+def _calcular_resumos(cursor, sessoes=None):
+    """Recalcula o resumo a partir dos pontos (todas as sessões ou só as indicadas)"""
+    sql = 'SELECT sessao_id, ts, latitude, longitude, hectares, velocidade FROM pontos'
+    parametros = ()
+    if sessoes is not None:
+        sessoes = list(sessoes)
+        sql += f" WHERE sessao_id IN ({','.join('?' * len(sessoes))})"
+        parametros = sessoes
+    resumos = {}
+    for sessao, ts, lat, lon, hectares, velocidade in cursor.execute(sql + ' ORDER BY sessao_id, ts', parametros):
+        resumo = resumos.get(sessao)
+        if resumo is None:
+            resumo = resumos[sessao] = _novo_resumo()
+        _somar_ponto(resumo, ts, lat, lon, hectares, velocidade)
+    return resumos
+
+
+def _migrar_v0_para_v1(cursor):
+    # Esquema original; bancos antigos já têm estas tabelas com user_version 0
+    cursor.execute('''
         CREATE TABLE IF NOT EXISTS pontos (
             id INTEGER PRIMARY KEY,
             timestamp TEXT,
@@ -13,54 +116,1146 @@ def criar_banco():
             hectares REAL
         )
     ''')
-    cur.execute('''
+    cursor.execute('''
         CREATE TABLE IF NOT EXISTS fazenda (
             id INTEGER PRIMARY KEY,
             nome TEXT NOT NULL,
             largura_implemento REAL NOT NULL
         )
     ''')
-    conn.commit()
-    conn.close()
 
-def salvar_ponto(lat, lon, hectares):
-    conn = sqlite3.connect('pulverizacao.db')
-    cur = conn.cursor()
-    cur.execute('INSERT INTO pontos(timestamp, latitude, longitude, hectares) VALUES(?,?,?,?)',
-                (datetime.utcnow().isoformat(), lat, lon, hectares))
-    conn.commit()
-    conn.close()
+
+def _migrar_v1_para_v2(cursor):
+    # Sessões, tempo em epoch-ms inteiro, dados do fix e índice de cobertura por (sessao_id, ts)
+    cursor.execute('''
+        CREATE TABLE sessoes (
+            id INTEGER PRIMARY KEY,
+            nome TEXT,
+            largura_implemento REAL,
+            inicio_ms INTEGER NOT NULL,
+            fim_ms INTEGER
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE pontos_v2 (
+            id INTEGER PRIMARY KEY,
+            sessao_id INTEGER NOT NULL REFERENCES sessoes(id),
+            ts INTEGER NOT NULL,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL,
+            hectares REAL NOT NULL DEFAULT 0,
+            velocidade REAL,
+            rumo REAL,
+            hdop REAL,
+            qualidade INTEGER
+        )
+    ''')
+
+    # ISO -> epoch-ms no próprio SQLite; uma sessão nova a cada pausa longa
+    cursor.execute('''
+        CREATE TEMP TABLE migracao AS
+        SELECT id, ts, latitude, longitude, hectares,
+               SUM(nova) OVER (ORDER BY ts, id ROWS UNBOUNDED PRECEDING) AS sessao_id
+        FROM (
+            SELECT id, ts, latitude, longitude, hectares,
+                   CASE WHEN LAG(ts) OVER (ORDER BY ts, id) IS NULL
+                             OR ts - LAG(ts) OVER (ORDER BY ts, id) > ? THEN 1 ELSE 0 END AS nova
+            FROM (
+                SELECT id, CAST(ROUND((julianday(timestamp) - 2440587.5) * 86400000) AS INTEGER) AS ts,
+                       latitude, longitude, COALESCE(hectares, 0) AS hectares
+                FROM pontos
+                WHERE timestamp IS NOT NULL AND latitude IS NOT NULL AND longitude IS NOT NULL
+            )
+        )
+    ''', (INTERVALO_SESSAO_MIGRACAO_MS,))
+    cursor.execute('''
+        INSERT INTO sessoes(id, nome, largura_implemento, inicio_ms, fim_ms)
+        SELECT sessao_id, 'Migrada', (SELECT largura_implemento FROM fazenda LIMIT 1), MIN(ts), MAX(ts)
+        FROM migracao GROUP BY sessao_id
+    ''')
+    cursor.execute('''
+        INSERT INTO pontos_v2(id, sessao_id, ts, latitude, longitude, hectares)
+        SELECT id, sessao_id, ts, latitude, longitude, hectares FROM migracao ORDER BY sessao_id, ts
+    ''')
+    cursor.execute('DROP TABLE migracao')
+    cursor.execute('DROP TABLE pontos')
+    cursor.execute('ALTER TABLE pontos_v2 RENAME TO pontos')
+    # Cobre as leituras da trilha (sem ir à tabela) e ordena por sessão/tempo
+    cursor.execute('CREATE INDEX idx_pontos_sessao_ts ON pontos(sessao_id, ts, latitude, longitude, hectares)')
+
+
+def _migrar_v2_para_v3(cursor):
+    # Agregados por sessão, atualizados na mesma transação de cada lote de pontos
+    cursor.execute('''
+        CREATE TABLE resumo_sessoes (
+            sessao_id INTEGER PRIMARY KEY REFERENCES sessoes(id),
+            pontos INTEGER NOT NULL DEFAULT 0,
+            hectares REAL NOT NULL DEFAULT 0,
+            distancia REAL NOT NULL DEFAULT 0,
+            inicio_ms INTEGER,
+            fim_ms INTEGER,
+            velocidade_max REAL NOT NULL DEFAULT 0,
+            ultima_lat REAL,
+            ultima_lon REAL
+        )
+    ''')
+    resumos = _calcular_resumos(cursor)
+    cursor.executemany(SQL_GRAVAR_RESUMO, [(sessao, *resumo) for sessao, resumo in resumos.items()])
+
+
+def _migrar_v3_para_v4(cursor):
+    # Índice espacial R*Tree: sessão como terceira dimensão para filtrar por sessão no próprio índice.
+    # Guarda float32 arredondado para fora; a posição exata é conferida na tabela pontos
+    cursor.execute('''
+        CREATE VIRTUAL TABLE pontos_rtree USING rtree(
+            id, min_sessao, max_sessao, min_lat, max_lat, min_lon, max_lon
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO pontos_rtree
+        SELECT id, sessao_id, sessao_id, latitude, latitude, longitude, longitude FROM pontos
+    ''')
+    # Gatilhos mantêm o índice em sincronia com qualquer escrita, inclusive de outras conexões
+    cursor.execute('''
+        CREATE TRIGGER pontos_rtree_inserir AFTER INSERT ON pontos BEGIN
+            INSERT INTO pontos_rtree VALUES(new.id, new.sessao_id, new.sessao_id,
+                                            new.latitude, new.latitude, new.longitude, new.longitude);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER pontos_rtree_remover AFTER DELETE ON pontos BEGIN
+            DELETE FROM pontos_rtree WHERE id = old.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER pontos_rtree_atualizar AFTER UPDATE OF sessao_id, latitude, longitude ON pontos BEGIN
+            UPDATE pontos_rtree SET min_sessao = new.sessao_id, max_sessao = new.sessao_id,
+                                    min_lat = new.latitude, max_lat = new.latitude,
+                                    min_lon = new.longitude, max_lon = new.longitude
+            WHERE id = new.id;
+        END
+    ''')
+
+
+def _migrar_v4_para_v5(cursor):
+    # id logo após (sessao_id, ts): a paginação por chave de iterar_pontos segue a ordem
+    # do índice, sem ordenar os empates de ts em uma B-tree temporária a cada página
+    cursor.execute('DROP INDEX idx_pontos_sessao_ts')
+    cursor.execute('CREATE INDEX idx_pontos_sessao_ts ON pontos(sessao_id, ts, id, latitude, longitude, hectares)')
+
+
+def _migrar_v5_para_v6(cursor):
+    # Última seq do diário de pontos já aplicada (gravada na transação de cada lote)
+    cursor.execute('''
+        CREATE TABLE diario_estado (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            ultima_seq INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT INTO diario_estado(id, ultima_seq) VALUES(1, 0)')
+
+
+# Migração de cada versão para a seguinte
+_MIGRACOES = {
+    0: _migrar_v0_para_v1,
+    1: _migrar_v1_para_v2,
+    2: _migrar_v2_para_v3,
+    3: _migrar_v3_para_v4,
+    4: _migrar_v4_para_v5,
+    5: _migrar_v5_para_v6,
+}
+
+
+def ts_agora():
+    """Instante atual em epoch-ms (coluna ts)"""
+    return int(time.time() * 1000)
+
+
+def ts_para_datetime(ts):
+    """Converte epoch-ms em datetime UTC sem fuso (como os antigos timestamps ISO)"""
+    return datetime.fromtimestamp(ts / 1000, timezone.utc).replace(tzinfo=None)
+
+
+class ConexaoBanco:
+    def __init__(self, caminho=CAMINHO_BANCO, synchronous='NORMAL', linhas_por_commit=50,
+                 intervalo_commit=1.0, commits_por_checkpoint=20):
+        """
+        Conexão SQLite de longa duração com commit em grupo
+
+        Usa journal WAL: um commit só acrescenta páginas ao arquivo -wal, e
+        com synchronous=NORMAL o fsync acontece apenas no checkpoint. As
+        inserções ficam em uma transação aberta até juntar linhas_por_commit
+        linhas ou passar intervalo_commit segundos (verificado a cada
+        inserção). O banco nunca fica corrompido, mas uma queda de energia
+        perde tudo desde o último checkpoint: até commits_por_checkpoint
+        lotes com NORMAL, só o lote aberto com FULL (um fsync por commit).
+        O GravadorBanco passa a conexão para FULL (ver GravadorBanco).
+
+        Args:
+            caminho: Arquivo do banco
+            synchronous: 'NORMAL' (fsync por checkpoint) ou 'FULL' (fsync por commit)
+            linhas_por_commit: Linhas inseridas antes de um commit
+            intervalo_commit: Tempo máximo de uma transação aberta (s)
+            commits_por_checkpoint: Commits entre checkpoints (cópia do WAL para o banco)
+        """
+        self.caminho = caminho
+        self.synchronous = synchronous.upper()
+        self.linhas_por_commit = linhas_por_commit
+        self.intervalo_commit = intervalo_commit
+        self.commits_por_checkpoint = commits_por_checkpoint
+
+        self._trava = threading.RLock()
+        self._conn = sqlite3.connect(caminho, isolation_level=None, check_same_thread=False,
+                                     cached_statements=64)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        # Os checkpoints são feitos aqui a cada commits_por_checkpoint commits, para
+        # poderem ser contados; o automático do SQLite fica só como limite do WAL
+        self._conn.execute('PRAGMA busy_timeout=5000')
+        # Diário de instrução em memória: com o gatilho do R*Tree cada INSERT de uma
+        # transação grande copiava as páginas já alteradas para um arquivo temporário
+        self._conn.execute('PRAGMA temp_store=MEMORY')
+        self._cursor = self._conn.cursor()
+        self.migracao_executada = self._migrar()
+        # Conexão só das consultas: no WAL elas não esperam o commit (e o fsync) da
+        # escrita, que acontece sob self._trava. Um banco em memória não é compartilhável
+        self._trava_leitura = threading.Lock()
+        self._leitura = None
+        if caminho not in ('', ':memory:'):
+            self._leitura = sqlite3.connect(caminho, isolation_level=None, check_same_thread=False,
+                                            cached_statements=64)
+            self._leitura.execute('PRAGMA busy_timeout=5000')
+        self.sessao_atual = None
+
+        self._em_transacao = False
+        self._inicio_transacao = 0.0
+        self._pendentes = 0
+        self._instantes_pendentes = []
+        # Resumo por sessão dos pontos da transação aberta, e último ponto já confirmado
+        self._resumo_pendente = {}
+        self._ultimos = {}
+
+        # Estatísticas
+        self.linhas_inseridas = 0
+        self.commits = 0
+        self.checkpoints = 0
+
+    def _migrar(self):
+        """
+        Atualiza o esquema no próprio arquivo até VERSAO_ESQUEMA
+
+        Cada passo roda em uma transação junto com o novo user_version: uma
+        queda de energia no meio deixa o banco na versão anterior.
+
+        Returns:
+            bool: True se alguma migração foi executada
+        """
+        versao = self._cursor.execute('PRAGMA user_version').fetchone()[0]
+        if versao > VERSAO_ESQUEMA:
+            raise RuntimeError(f"Banco na versão {versao}, mais nova que a suportada ({VERSAO_ESQUEMA})")
+        inicial = versao
+        while versao < VERSAO_ESQUEMA:
+            self._cursor.execute('BEGIN IMMEDIATE')
+            try:
+                _MIGRACOES[versao](self._cursor)
+                versao += 1
+                self._cursor.execute(f'PRAGMA user_version={versao}')
+                self._cursor.execute('COMMIT')
+            except Exception:
+                self._cursor.execute('ROLLBACK')
+                raise
+        return versao != inicial
+
+    def _iniciar_transacao(self):
+        if not self._em_transacao:
+            self._cursor.execute('BEGIN')
+            self._em_transacao = True
+            self._inicio_transacao = time.monotonic()
+
+    def iniciar_sessao(self, nome=None, largura_implemento=None, ts=None):
+        """
+        Abre uma sessão de trabalho; os pontos seguintes pertencem a ela
+
+        Returns:
+            int: Id da sessão
+        """
+        with self._trava:
+            self.encerrar_sessao()
+            if largura_implemento is None:
+                fazenda = self._conn.execute('SELECT largura_implemento FROM fazenda LIMIT 1').fetchone()
+                largura_implemento = fazenda[0] if fazenda else None
+            self.executar('INSERT INTO sessoes(nome, largura_implemento, inicio_ms) VALUES(?,?,?)',
+                          (nome, largura_implemento, ts or ts_agora()))
+            self.sessao_atual = self._cursor.lastrowid
+            return self.sessao_atual
+
+    def encerrar_sessao(self, ts=None):
+        """Registra o fim da sessão atual"""
+        with self._trava:
+            if self.sessao_atual is None:
+                return
+            self.executar('UPDATE sessoes SET fim_ms = ? WHERE id = ?', (ts or ts_agora(), self.sessao_atual))
+            self.sessao_atual = None
+
+    def obter_sessao_atual(self):
+        """Id da sessão atual, abrindo uma nova se nenhuma estiver aberta"""
+        with self._trava:
+            if self.sessao_atual is None:
+                return self.iniciar_sessao()
+            return self.sessao_atual
+
+    def _na_sessao_atual(self, linhas):
+        # sessao_id None (salvar_ponto): a sessão atual na hora da gravação, aberta
+        # aqui se preciso, na thread que grava e não na do produtor
+        if all(linha[0] is not None for linha in linhas):
+            return linhas
+        sessao = self.obter_sessao_atual()
+        return [linha if linha[0] is not None else (sessao, *linha[1:]) for linha in linhas]
+
+    def descartar_sessao_atual(self):
+        """Esquece a sessão e o resumo em memória (sessões apagadas); o lote aberto é confirmado antes"""
+        with self._trava:
+            self.commit()
+            self.sessao_atual = None
+            self._ultimos.clear()
+            self._resumo_pendente.clear()
+
+    def _acumular_resumo(self, linhas):
+        for sessao, ts, lat, lon, hectares, velocidade, *_ in linhas:
+            resumo = self._resumo_pendente.get(sessao)
+            if resumo is None:
+                ultimo = self._ultimos.get(sessao)
+                if ultimo is None:
+                    ultimo = self._conn.execute('SELECT fim_ms, ultima_lat, ultima_lon FROM resumo_sessoes '
+                                                'WHERE sessao_id = ?', (sessao,)).fetchone() or ()
+                resumo = self._resumo_pendente[sessao] = _novo_resumo(*ultimo)
+            _somar_ponto(resumo, ts, lat, lon, hectares, velocidade)
+
+    def _desfazer_transacao(self):
+        self._cursor.execute('ROLLBACK')
+        self._em_transacao = False
+        self._pendentes = 0
+        self._instantes_pendentes.clear()
+        self._resumo_pendente.clear()
+
+    def inserir_ponto(self, linha, instante_fix=None):
+        """
+        Insere um ponto na transação em andamento (commit em grupo)
+
+        Args:
+            linha: Tupla na ordem de SQL_INSERIR_PONTO (ver montar_linha)
+            instante_fix: Chegada do fix na serial, para medir a latência até o commit
+        """
+        with self._trava:
+            linha, = self._na_sessao_atual((linha,))
+            self._iniciar_transacao()
+            self._cursor.execute(SQL_INSERIR_PONTO, linha)
+            self._acumular_resumo((linha,))
+            self._pendentes += 1
+            self.linhas_inseridas += 1
+            if instante_fix is not None:
+                self._instantes_pendentes.append(instante_fix)
+            if (self._pendentes >= self.linhas_por_commit
+                    or time.monotonic() - self._inicio_transacao >= self.intervalo_commit):
+                self.commit()
+
+    def inserir_lote(self, linhas, instantes_fix=()):
+        """
+        Insere várias linhas com executemany e confirma tudo em um commit
+
+        Args:
+            linhas: Tuplas na ordem de SQL_INSERIR_PONTO (ver montar_linha)
+            instantes_fix: Chegadas dos fixes na serial, para a latência até o commit
+        """
+        with self._trava:
+            linhas = self._na_sessao_atual(linhas)
+            self._iniciar_transacao()
+            try:
+                self._cursor.executemany(SQL_INSERIR_PONTO, linhas)
+                self._acumular_resumo(linhas)
+            except Exception:
+                self._desfazer_transacao()
+                raise
+            self.linhas_inseridas += len(linhas)
+            self._instantes_pendentes.extend(instantes_fix)
+            self.commit()
+
+    def commit(self):
+        """Confirma a transação em andamento (se houver) e faz checkpoint quando o WAL cresce"""
+        with self._trava:
+            if not self._em_transacao:
+                return
+            if self._resumo_pendente:
+                # Resumo na mesma transação dos pontos: nunca diverge após uma queda
+                try:
+                    self._cursor.executemany(SQL_SOMAR_RESUMO, [
+                        (sessao, *resumo) for sessao, resumo in self._resumo_pendente.items() if resumo[0]])
+                except Exception:
+                    self._desfazer_transacao()
+                    raise
+            self._cursor.execute('COMMIT')
+            self._em_transacao = False
+            for sessao, resumo in self._resumo_pendente.items():
+                self._ultimos[sessao] = (resumo[4], resumo[6], resumo[7])
+            self._resumo_pendente.clear()
+            self.commits += 1
+            self._pendentes = 0
+
+            agora = monitor_latencia.relogio()
+            for instante in self._instantes_pendentes:
+                monitor_latencia.registrar(BANCO, instante, agora)
+            self._instantes_pendentes.clear()
+
+            if self.commits % self.commits_por_checkpoint == 0:
+                # PASSIVE não espera leitores; o que faltar vai no próximo
+                self._cursor.execute('PRAGMA wal_checkpoint(PASSIVE)')
+                self.checkpoints += 1
+
+    def executar(self, sql, parametros=(), confirmar=True):
+        """Executa um comando de escrita avulso, confirmando junto com o lote pendente"""
+        with self._trava:
+            self._iniciar_transacao()
+            self._cursor.execute(sql, parametros)
+            if confirmar:
+                self.commit()
+
+    def executar_varios(self, sql, sequencia, confirmar=True):
+        """executemany de um comando de escrita avulso, confirmando junto com o lote pendente"""
+        with self._trava:
+            self._iniciar_transacao()
+            self._cursor.executemany(sql, sequencia)
+            if confirmar:
+                self.commit()
+
+    def consultar(self, sql, parametros=(), pendentes=False):
+        """
+        Executa uma consulta
+
+        Por padrão pela conexão de leitura, sem a trava da escrita: enxerga só
+        o que já foi confirmado (o GravadorBanco confirma cada lote), e a
+        interface não espera o fsync de um commit. Com pendentes, pela conexão
+        de escrita sob a trava, incluindo as linhas da transação aberta.
+        """
+        if pendentes or self._leitura is None:
+            with self._trava:
+                return self._conn.execute(sql, parametros).fetchall()
+        with self._trava_leitura:
+            return self._leitura.execute(sql, parametros).fetchall()
+
+    def verificar_resumo(self, reconstruir=False):
+        """
+        Compara resumo_sessoes com o recálculo a partir dos pontos
+
+        Percorre a tabela pontos inteira: é a ferramenta de manutenção, não
+        de consulta.
+
+        Args:
+            reconstruir: Regrava o resumo das sessões divergentes
+
+        Returns:
+            dict: {sessao_id: (gravado, recalculado)} das sessões divergentes,
+                  com os campos de CAMPOS_RESUMO (None se a linha não existe)
+        """
+        with self._trava:
+            self.commit()
+            recalculados = _calcular_resumos(self._conn)
+            gravados = {linha[0]: list(linha[1:]) for linha in self._conn.execute(
+                f"SELECT sessao_id, {', '.join(CAMPOS_RESUMO)} FROM resumo_sessoes")}
+            divergentes = {}
+            for sessao in recalculados.keys() | gravados.keys():
+                gravado = gravados.get(sessao)
+                recalculado = recalculados.get(sessao)
+                if not _resumos_iguais(gravado, recalculado):
+                    divergentes[sessao] = (gravado, recalculado)
+            if reconstruir and divergentes:
+                self._reconstruir(divergentes, recalculados)
+            return divergentes
+
+    def reconstruir_resumo(self, sessoes=None):
+        """Recalcula o resumo das sessões indicadas (default: todas) a partir dos pontos"""
+        with self._trava:
+            self.commit()
+            if sessoes is None:
+                sessoes = [linha[0] for linha in self._conn.execute(
+                    'SELECT sessao_id FROM resumo_sessoes UNION SELECT DISTINCT sessao_id FROM pontos')]
+            sessoes = list(sessoes)
+            self._reconstruir(sessoes, _calcular_resumos(self._conn, sessoes))
+
+    def _reconstruir(self, sessoes, recalculados):
+        self._iniciar_transacao()
+        try:
+            for sessao in sessoes:
+                resumo = recalculados.get(sessao)
+                if resumo is None:
+                    self._cursor.execute('DELETE FROM resumo_sessoes WHERE sessao_id = ?', (sessao,))
+                else:
+                    self._cursor.execute(SQL_GRAVAR_RESUMO, (sessao, *resumo))
+                self._ultimos.pop(sessao, None)
+        except Exception:
+            self._desfazer_transacao()
+            raise
+        self.commit()
+
+    def fechar(self):
+        """Confirma o lote pendente, faz checkpoint e fecha a conexão"""
+        with self._trava:
+            if self._conn is None:
+                return
+            self.encerrar_sessao()
+            self.commit()
+            if self._leitura is not None:
+                with self._trava_leitura:
+                    self._leitura.close()
+            self._cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            self._conn.close()
+            self._conn = None
+
+    def definir_synchronous(self, synchronous):
+        """Troca o modo de fsync ('NORMAL' ou 'FULL'); confirma antes o lote aberto"""
+        with self._trava:
+            self.commit()
+            self.synchronous = synchronous.upper()
+            self._conn.execute(f'PRAGMA synchronous={self.synchronous}')
+
+    def obter_estatisticas(self):
+        fsyncs = self.checkpoints * 2
+        if self.synchronous in ('FULL', 'EXTRA'):
+            fsyncs += self.commits
+        return {
+            'linhas_inseridas': self.linhas_inseridas,
+            'commits': self.commits,
+            'checkpoints': self.checkpoints,
+            'fsyncs_estimados': fsyncs,
+            'pendentes': self._pendentes
+        }
+
+
+def _resumos_iguais(a, b, tolerancia=1e-6):
+    if a is None or b is None:
+        return a is b
+    for x, y in zip(a, b):
+        if isinstance(x, float) or isinstance(y, float):
+            if x is None or y is None or abs(x - y) > tolerancia * max(1.0, abs(x), abs(y)):
+                return False
+        elif x != y:
+            return False
+    return True
+
+
+_FECHAR = object()
+
+
+class GravadorBanco:
+    def __init__(self, conexao, tamanho_lote=50, intervalo_lote=1.0, max_pendentes=None,
+                 timeout_fila=0.5, synchronous='FULL'):
+        """
+        Thread dedicada que grava os pontos no banco em lotes
+
+        Quem tem o fix só enfileira a linha; a escrita no cartão SD (que
+        pode travar por centenas de ms) acontece nesta thread, com um
+        executemany e um commit por lote. Um lote é gravado ao juntar
+        tamanho_lote linhas ou intervalo_lote segundos após a primeira.
+
+        O número de linhas aceitas e ainda não confirmadas no banco nunca
+        passa de max_pendentes. Com synchronous='FULL' (default; a conexão
+        é trocada para FULL) cada lote tem o seu fsync, e esse é o máximo
+        perdido em uma queda de energia. Com 'NORMAL' o fsync só vem no
+        checkpoint da ConexaoBanco e a perda chega a commits_por_checkpoint
+        lotes. Com a fila cheia o produtor espera até timeout_fila e, se o
+        banco continuar travado, a linha é descartada e contada.
+
+        Args:
+            conexao: ConexaoBanco usada pela thread
+            tamanho_lote: Linhas por executemany/commit
+            intervalo_lote: Tempo máximo de uma linha na fila (s)
+            max_pendentes: Limite de linhas não confirmadas (default: tamanho_lote)
+            timeout_fila: Espera máxima do produtor com a fila cheia (s; None = sem limite)
+            synchronous: Modo de fsync aplicado à conexão ('FULL' ou 'NORMAL')
+        """
+        self.conexao = conexao
+        if conexao.synchronous != synchronous.upper():
+            conexao.definir_synchronous(synchronous)
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_lote = intervalo_lote
+        self.max_pendentes = max_pendentes or tamanho_lote
+        self.timeout_fila = timeout_fila
+
+        self._fila = queue.SimpleQueue()
+        self._vagas = threading.Semaphore(self.max_pendentes)
+        self._trava = threading.Lock()
+        self._pendentes = 0
+        self.fechado = False
+        self._thread = threading.Thread(target=self._laco, name='gravador-banco', daemon=True)
+        self._thread.start()
+
+        # Estatísticas
+        self.enfileirados = 0
+        self.gravados = 0
+        self.lotes = 0
+        self.descartados = 0
+        self.esperas = 0
+        self.tempo_espera_total = 0.0
+        self.fila_maxima = 0
+        self.duracao_maxima_lote = 0.0
+        self.erros = 0
+        self.ultimo_erro = None
+
+    def enfileirar(self, linha, instante_fix=None):
+        """
+        Entrega uma linha (ver montar_linha) à thread
+
+        Returns:
+            bool: False se a linha foi descartada (fila cheia além do timeout ou gravador fechado)
+        """
+        if self.fechado:
+            self.descartados += 1
+            return False
+        if not self._vagas.acquire(blocking=False):
+            # Contrapressão: o banco está atrás do produtor
+            inicio = time.monotonic()
+            obteve = self._vagas.acquire(timeout=self.timeout_fila)
+            with self._trava:
+                self.esperas += 1
+                self.tempo_espera_total += time.monotonic() - inicio
+                if not obteve:
+                    self.descartados += 1
+                    return False
+        with self._trava:
+            self._pendentes += 1
+            self.enfileirados += 1
+            self.fila_maxima = max(self.fila_maxima, self._pendentes)
+        self._fila.put((linha, instante_fix))
+        return True
+
+    def sincronizar(self, timeout=None):
+        """
+        Barreira: retorna depois que tudo o que foi enfileirado antes está no banco
+
+        Returns:
+            bool: False em timeout
+        """
+        if not self._thread.is_alive():
+            return True
+        evento = threading.Event()
+        self._fila.put(evento)
+        return evento.wait(timeout)
+
+    def fechar(self, timeout=None):
+        """Grava o que estiver na fila e encerra a thread"""
+        if self.fechado:
+            return
+        self.fechado = True
+        self._fila.put(_FECHAR)
+        self._thread.join(timeout)
+
+    def _laco(self):
+        lote = []
+        instantes = []
+        prazo = None
+        while True:
+            espera = None if prazo is None else max(0.0, prazo - time.monotonic())
+            try:
+                item = self._fila.get(timeout=espera)
+            except queue.Empty:
+                item = None
+
+            if item is _FECHAR:
+                self._gravar(lote, instantes)
+                return
+            if isinstance(item, threading.Event):
+                self._gravar(lote, instantes)
+                prazo = None
+                item.set()
+                continue
+            if item is not None:
+                linha, instante = item
+                lote.append(linha)
+                if instante is not None:
+                    instantes.append(instante)
+                if prazo is None:
+                    prazo = time.monotonic() + self.intervalo_lote
+            if item is None or len(lote) >= self.tamanho_lote:
+                self._gravar(lote, instantes)
+                prazo = None
+
+    def _gravar(self, lote, instantes):
+        if not lote:
+            return
+        inicio = time.monotonic()
+        try:
+            self.conexao.inserir_lote(lote, instantes)
+            self.gravados += len(lote)
+            self.lotes += 1
+        except Exception as e:
+            self.erros += 1
+            self.descartados += len(lote)
+            self.ultimo_erro = f"Erro ao gravar lote: {str(e)}"
+        self.duracao_maxima_lote = max(self.duracao_maxima_lote, time.monotonic() - inicio)
+        with self._trava:
+            self._pendentes -= len(lote)
+        self._vagas.release(len(lote))
+        lote.clear()
+        instantes.clear()
+
+    def obter_estatisticas(self):
+        return {
+            'enfileirados': self.enfileirados,
+            'gravados': self.gravados,
+            'lotes': self.lotes,
+            'linhas_por_lote': self.gravados / self.lotes if self.lotes else 0.0,
+            'pendentes': self._pendentes,
+            'fila_maxima': self.fila_maxima,
+            'esperas_produtor': self.esperas,
+            'tempo_espera_total': self.tempo_espera_total,
+            'descartados': self.descartados,
+            'duracao_maxima_lote': self.duracao_maxima_lote,
+            'erros': self.erros,
+            'ultimo_erro': self.ultimo_erro
+        }
+
+
+_conexao = None
+_gravador = None
+_checkpointer = None
+_trava_conexao = threading.Lock()
+
+
+def obter_conexao():
+    """Retorna a conexão compartilhada do processo, abrindo-a na primeira chamada"""
+    global _conexao
+    if _conexao is None:
+        with _trava_conexao:
+            if _conexao is None:
+                _conexao = ConexaoBanco()
+    return _conexao
+
+
+def obter_gravador():
+    """Retorna a thread de gravação em lotes da conexão compartilhada"""
+    global _gravador
+    if _gravador is None:
+        conexao = obter_conexao()
+        with _trava_conexao:
+            if _gravador is None:
+                _gravador = GravadorBanco(conexao)
+    return _gravador
+
+
+def obter_checkpointer():
+    """CheckpointerDiario da conexão compartilhada, ou None se o diário não estiver ativo"""
+    return _checkpointer
+
+
+def configurar_banco(caminho=CAMINHO_BANCO, gravador=None, diario=None, **opcoes):
+    """
+    Reabre a conexão compartilhada com outro arquivo ou outras opções
+
+    Args:
+        caminho: Arquivo do banco
+        gravador: Opções do GravadorBanco (tamanho_lote, intervalo_lote, max_pendentes...)
+        diario: Ativa o diário de pontos (True ou opções: caminho, intervalo_fsync,
+                intervalo, linhas_por_transacao, tamanho_max_diario). salvar_ponto passa
+                a gravar no diário, e o que ficou nele é aplicado ao banco aqui
+        **opcoes: Opções repassadas à ConexaoBanco (synchronous, linhas_por_commit...)
+    """
+    global _conexao, _gravador, _checkpointer
+    fechar_banco()
+    with _trava_conexao:
+        _conexao = ConexaoBanco(caminho, **opcoes)
+        _gravador = GravadorBanco(_conexao, **(gravador or {}))
+        if diario:
+            opcoes_diario = dict(diario) if isinstance(diario, dict) else {}
+            arquivo = DiarioTrilha(opcoes_diario.pop('caminho', CAMINHO_DIARIO),
+                                   opcoes_diario.pop('intervalo_fsync', 1.0))
+            _checkpointer = CheckpointerDiario(arquivo, _conexao, **opcoes_diario)
+            _checkpointer.iniciar()
+    return _conexao
+
+
+def migrar(caminho=CAMINHO_BANCO):
+    """
+    Cria ou atualiza o esquema de um arquivo até VERSAO_ESQUEMA
+
+    As migrações só rodam ao abrir uma ConexaoBanco; quem lê o arquivo por
+    uma conexão sqlite3 própria (exportação, ISOXML) chama isto antes. O
+    banco da conexão compartilhada já foi migrado ao abri-la.
+
+    Returns:
+        bool: True se alguma migração foi executada
+    """
+    if _conexao is not None and os.path.abspath(caminho) == os.path.abspath(_conexao.caminho):
+        return False
+    leitura = sqlite3.connect(caminho)
+    try:
+        versao = leitura.execute('PRAGMA user_version').fetchone()[0]
+    finally:
+        leitura.close()
+    if versao == VERSAO_ESQUEMA:
+        return False
+    conexao = ConexaoBanco(caminho)
+    conexao.fechar()
+    return conexao.migracao_executada
+
+
+def fechar_banco():
+    """Grava a fila, confirma as linhas pendentes e fecha a conexão compartilhada"""
+    global _conexao, _gravador, _checkpointer
+    with _trava_conexao:
+        if _checkpointer is not None:
+            _checkpointer.parar()
+            _checkpointer.diario.fechar()
+            _checkpointer = None
+        if _gravador is not None:
+            _gravador.fechar()
+            _gravador = None
+        if _conexao is not None:
+            _conexao.fechar()
+            _conexao = None
+
+
+def sincronizar(timeout=None):
+    """Barreira: grava a fila e confirma agora as linhas pendentes"""
+    if _checkpointer is not None:
+        _checkpointer.sincronizar()
+    if _gravador is not None:
+        _gravador.sincronizar(timeout)
+    if _conexao is not None:
+        _conexao.commit()
+
+
+# Não perder a fila nem o lote pendente em um encerramento normal
+atexit.register(fechar_banco)
+
+
+def criar_banco():
+    obter_conexao()
+
+def montar_linha(lat, lon, hectares, velocidade=None, rumo=None, hdop=None, qualidade=None,
+                 sessao_id=None, ts=None):
+    """
+    Linha da tabela pontos na ordem de SQL_INSERIR_PONTO (agora por padrão)
+
+    Sem sessao_id a linha vai para a sessão atual no momento em que é
+    gravada: a ConexaoBanco a resolve (e abre, se preciso) sob a sua trava.
+    """
+    return (sessao_id, ts or ts_agora(), lat, lon, hectares, velocidade, rumo, hdop, qualidade)
+
+def salvar_ponto(lat, lon, hectares, instante_fix=None, velocidade=None, rumo=None, hdop=None,
+                 qualidade=None):
+    # Não bloqueia: a gravação é feita em lotes pela thread do GravadorBanco, ou vai
+    # para o diário de pontos se ele estiver ativo (configurar_banco(diario=...)).
+    # instante_fix: chegada do fix na serial (FixGNSS.instante), para medir a latência até o commit
+    linha = montar_linha(lat, lon, hectares, velocidade, rumo, hdop, qualidade)
+    checkpointer = _checkpointer
+    if checkpointer is not None:
+        # Com o diário, o ponto está salvo quando chega ao arquivo (durável no próximo fsync)
+        checkpointer.diario.acrescentar(linha)
+        monitor_latencia.registrar(BANCO, instante_fix)
+        return True
+    return obter_gravador().enfileirar(linha, instante_fix)
+
+def iniciar_sessao(nome=None, largura_implemento=None):
+    sincronizar()  # Pontos já enfileirados ficam na sessão anterior
+    return obter_conexao().iniciar_sessao(nome, largura_implemento)
+
+def encerrar_sessao():
+    sincronizar()
+    obter_conexao().encerrar_sessao()
+
+def descartar_sessao_atual():
+    # Após apagar as sessões por fora (limpeza dos dados)
+    if _conexao is not None:
+        _conexao.descartar_sessao_atual()
+
+def limpar_dados(caminho=None):
+    """
+    Apaga todas as sessões, pontos e resumos
+
+    No banco da conexão compartilhada (default) o DELETE passa por ela, sob
+    a sua trava. A sessão atual é descartada antes e a fila do gravador e o
+    diário são gravados: nenhuma linha de uma sessão apagada chega depois do
+    DELETE, e o que for salvo a partir daí abre uma sessão nova, que fica.
+    Outro caminho é apagado por uma conexão própria.
+    """
+    conexao = _conexao
+    if conexao is None and caminho is None:
+        conexao = obter_conexao()
+    if conexao is None or (caminho is not None and
+                           os.path.abspath(caminho) != os.path.abspath(conexao.caminho)):
+        externa = sqlite3.connect(caminho)
+        try:
+            with externa:
+                for tabela in ('resumo_sessoes', 'pontos', 'sessoes'):
+                    externa.execute(f'DELETE FROM {tabela}')
+        finally:
+            externa.close()
+        return
+
+    with conexao._trava:
+        conexao.descartar_sessao_atual()
+        ultima = conexao.consultar('SELECT MAX(id) FROM sessoes', pendentes=True)[0][0]
+    sincronizar()  # Fora da trava: a thread do gravador precisa dela para esvaziar a fila
+    if ultima is None:
+        return
+    with conexao._trava:
+        conexao.executar('DELETE FROM resumo_sessoes WHERE sessao_id <= ?', (ultima,), confirmar=False)
+        conexao.executar('DELETE FROM pontos WHERE sessao_id <= ?', (ultima,), confirmar=False)
+        conexao.executar('DELETE FROM sessoes WHERE id <= ?', (ultima,))
+        conexao.descartar_sessao_atual()
+
+def obter_sessoes(conexao=None):
+    """Sessões em ordem de id; conexao: ConexaoBanco ou sqlite3.Connection (default: a compartilhada)"""
+    sql = 'SELECT id, nome, largura_implemento, inicio_ms, fim_ms FROM sessoes ORDER BY id'
+    if conexao is None:
+        conexao = obter_conexao()
+    rows = conexao.consultar(sql) if isinstance(conexao, ConexaoBanco) else conexao.execute(sql).fetchall()
+    return [{'id': r[0], 'nome': r[1], 'largura_implemento': r[2], 'inicio_ms': r[3], 'fim_ms': r[4]}
+            for r in rows]
 
 def salvar_fazenda(nome, largura_implemento):
-    conn = sqlite3.connect('pulverizacao.db')
-    cur = conn.cursor()
-    cur.execute('DELETE FROM fazenda')  # Apenas um registro de fazenda
-    cur.execute('INSERT INTO fazenda(nome, largura_implemento) VALUES(?, ?)', (nome, largura_implemento))
-    conn.commit()
-    conn.close()
+    conexao = obter_conexao()
+    with conexao._trava:
+        conexao.executar('DELETE FROM fazenda', confirmar=False)  # Apenas um registro de fazenda
+        conexao.executar('INSERT INTO fazenda(nome, largura_implemento) VALUES(?, ?)', (nome, largura_implemento))
 
 def obter_fazenda():
-    conn = sqlite3.connect('pulverizacao.db')
-    cur = conn.cursor()
-    cur.execute('SELECT nome, largura_implemento FROM fazenda LIMIT 1')
-    row = cur.fetchone()
-    conn.close()
-    if row:
-        return {'nome': row[0], 'largura_implemento': row[1]}
+    rows = obter_conexao().consultar('SELECT nome, largura_implemento FROM fazenda LIMIT 1')
+    if rows:
+        return {'nome': rows[0][0], 'largura_implemento': rows[0][1]}
     return None
 
-def obter_pontos():
-    conn = sqlite3.connect('pulverizacao.db')
-    cur = conn.cursor()
-    cur.execute('SELECT latitude, longitude FROM pontos ORDER BY timestamp ASC')
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-def obter_hectares_totais():
-    conn = sqlite3.connect('pulverizacao.db')
-    cur = conn.cursor()
-    cur.execute('SELECT SUM(hectares) FROM pontos')
-    total = cur.fetchone()[0]
-    conn.close()
-    return total if total else 0.0
+def iterar_pontos(colunas=('latitude', 'longitude'), sessao_id=None, ts_inicio=None, ts_fim=None,
+                  tamanho_pagina=TAMANHO_PAGINA_PADRAO, conexao=None):
+    """
+    Percorre os pontos em ordem (sessao_id, ts) em páginas de tamanho fixo
+
+    Paginação por chave: cada página continua depois da última chave
+    (sessao_id, ts, id) lida, pelo índice de cobertura. A memória fica
+    limitada a uma página, e a conexão compartilhada só fica presa durante a
+    consulta de cada página, não entre elas, então o GravadorBanco continua
+    gravando durante uma exportação longa.
+
+    Args:
+        colunas: Colunas de cada tupla (ver COLUNAS_PONTOS)
+        sessao_id: Restringe a uma sessão (default: todas)
+        ts_inicio, ts_fim: Intervalo em epoch-ms, inclusive (None = aberto)
+        tamanho_pagina: Linhas por consulta
+        conexao: ConexaoBanco ou sqlite3.Connection (default: a conexão compartilhada)
+
+    Yields:
+        tuple: Valores das colunas pedidas
+    """
+    invalidas = set(colunas) - set(COLUNAS_PONTOS)
+    if invalidas:
+        raise ValueError(f"Colunas desconhecidas: {', '.join(sorted(invalidas))}")
+    if conexao is None:
+        conexao = obter_conexao()
+    if isinstance(conexao, ConexaoBanco):
+        consultar = conexao.consultar
+    else:
+        def consultar(sql, parametros):
+            return conexao.execute(sql, parametros).fetchall()
+
+    filtros = []
+    parametros = []
+    if sessao_id is not None:
+        filtros.append('sessao_id = ?')
+        parametros.append(sessao_id)
+    if ts_fim is not None:
+        filtros.append('ts <= ?')
+        parametros.append(ts_fim)
+    selecao = f"SELECT sessao_id, ts, id, {', '.join(colunas)} FROM pontos WHERE "
+    ordem = f' ORDER BY sessao_id, ts, id LIMIT {int(tamanho_pagina)}'
+    # ts_inicio só na primeira página: nas seguintes a chave já está depois dele (na mesma
+    # sessão), e as duas condições juntas fazem o SQLite partir de ts_inicio a cada página
+    if ts_inicio is None:
+        sql_primeira = selecao + (' AND '.join(filtros) or '1') + ordem
+        parametros_primeira = parametros
+    else:
+        sql_primeira = selecao + ' AND '.join(filtros + ['ts >= ?']) + ordem
+        parametros_primeira = parametros + [ts_inicio]
+    if sessao_id is not None:
+        sql_seguinte = selecao + ' AND '.join(filtros + ['(ts, id) > (?, ?)']) + ordem
+    else:
+        if ts_inicio is not None:
+            filtros.append('ts >= ?')
+            parametros.append(ts_inicio)
+        sql_seguinte = selecao + ' AND '.join(filtros + ['(sessao_id, ts, id) > (?, ?, ?)']) + ordem
+
+    pagina = consultar(sql_primeira, parametros_primeira)
+    while pagina:
+        for linha in pagina:
+            yield linha[3:]
+        if len(pagina) < tamanho_pagina:
+            return
+        chave = pagina[-1][1:3] if sessao_id is not None else pagina[-1][:3]
+        pagina = consultar(sql_seguinte, parametros + list(chave))
+
+def obter_pontos(sessao_id=None, ts_inicio=None, ts_fim=None):
+    # Gerador de (latitude, longitude) em ordem cronológica (sessões são criadas em ordem)
+    return iterar_pontos(('latitude', 'longitude'), sessao_id, ts_inicio, ts_fim)
+
+def obter_resumo(sessao_id=None):
+    """
+    Totais de uma sessão ou de todas, lidos de resumo_sessoes (não percorre os pontos)
+
+    Returns:
+        dict: pontos, hectares, distancia (m), inicio_ms, fim_ms, velocidade_max (km/h)
+    """
+    if sessao_id is None:
+        linha = obter_conexao().consultar(
+            'SELECT SUM(pontos), SUM(hectares), SUM(distancia), MIN(inicio_ms), MAX(fim_ms), '
+            'MAX(velocidade_max) FROM resumo_sessoes')[0]
+    else:
+        linhas = obter_conexao().consultar(
+            'SELECT pontos, hectares, distancia, inicio_ms, fim_ms, velocidade_max '
+            'FROM resumo_sessoes WHERE sessao_id = ?', (sessao_id,))
+        linha = linhas[0] if linhas else (None,) * 6
+    return {
+        'pontos': linha[0] or 0,
+        'hectares': linha[1] or 0.0,
+        'distancia': linha[2] or 0.0,
+        'inicio_ms': linha[3],
+        'fim_ms': linha[4],
+        'velocidade_max': linha[5] or 0.0
+    }
+
+def contar_pontos(sessao_id=None, conexao=None):
+    """Pontos de uma sessão ou de todas, por resumo_sessoes; conexao como em obter_sessoes"""
+    sql = 'SELECT COALESCE(SUM(pontos), 0) FROM resumo_sessoes'
+    parametros = ()
+    if sessao_id is not None:
+        sql += ' WHERE sessao_id = ?'
+        parametros = (sessao_id,)
+    if conexao is None:
+        conexao = obter_conexao()
+    if isinstance(conexao, ConexaoBanco):
+        return conexao.consultar(sql, parametros)[0][0]
+    return conexao.execute(sql, parametros).fetchone()[0]
+
+def obter_hectares_totais(sessao_id=None):
+    return obter_resumo(sessao_id)['hectares']
+
+def verificar_resumo(reconstruir=False):
+    sincronizar()
+    return obter_conexao().verificar_resumo(reconstruir)
+
+def reconstruir_resumo(sessoes=None):
+    sincronizar()
+    obter_conexao().reconstruir_resumo(sessoes)
+
+def _consultar_area(lat_min, lat_max, lon_min, lon_max, sessao_id=None, limite=None):
+    sql = '''
+        SELECT p.id, p.sessao_id, p.ts, p.latitude, p.longitude
+        FROM pontos_rtree r JOIN pontos p ON p.id = r.id
+        WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?
+          AND p.latitude BETWEEN ? AND ? AND p.longitude BETWEEN ? AND ?
+    '''
+    parametros = [lat_min, lat_max, lon_min, lon_max, lat_min, lat_max, lon_min, lon_max]
+    if sessao_id is not None:
+        sql += ' AND r.min_sessao <= ? AND r.max_sessao >= ?'
+        parametros += [sessao_id, sessao_id]
+    if limite is not None:
+        sql += ' LIMIT ?'
+        parametros.append(limite)
+    return obter_conexao().consultar(sql, parametros)
+
+def obter_pontos_na_area(lat_min, lat_max, lon_min, lon_max, sessao_id=None, limite=None):
+    """
+    Pontos dentro de um retângulo (ex.: a área visível do mapa), pelo índice R*Tree
+
+    Args:
+        lat_min, lat_max, lon_min, lon_max: Limites em graus decimais
+        sessao_id: Restringe a uma sessão (default: todas)
+        limite: Número máximo de pontos
+
+    Returns:
+        list: Tuplas (id, sessao_id, ts, latitude, longitude), sem ordem definida
+    """
+    return _consultar_area(lat_min, lat_max, lon_min, lon_max, sessao_id, limite)
+
+def _retangulo_do_raio(lat, lon, raio, inscrito=False):
+    """
+    (lat_min, lat_max, lon_min, lon_max) em torno do círculo de raio metros
+
+    Na mesma esfera do haversine (geodesia.RAIO_TERRA): sem inscrito o
+    retângulo contém o círculo inteiro; com inscrito é o quadrado dentro dele.
+    A folga MARGEM_RAIO cobre o arredondamento nos dois sentidos.
+    """
+    if inscrito:
+        # Lado medido na latitude mais próxima do equador, onde o grau de longitude é maior
+        angulo = raio / math.sqrt(2) / RAIO_TERRA * (1 - MARGEM_RAIO)
+        dlat = math.degrees(angulo)
+        cos_lat = math.cos(math.radians(max(0.0, abs(lat) - dlat)))
+        dlon = math.degrees(angulo / cos_lat)
+        return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+    angulo = raio / RAIO_TERRA * (1 + MARGEM_RAIO)
+    dlat = math.degrees(angulo)
+    seno = math.sin(angulo) / max(math.cos(math.radians(lat)), 1e-12)
+    if seno >= 1:
+        return lat - dlat, lat + dlat, -180.0, 180.0  # Círculo passa sobre o polo
+    # Maior diferença de longitude de um ponto do círculo (não é a do mesmo paralelo)
+    dlon = math.degrees(math.asin(seno))
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+def obter_pontos_no_raio(lat, lon, raio, sessao_id=None):
+    """
+    Pontos a até raio metros de (lat, lon): retângulo no R*Tree e distância exata depois
+
+    Returns:
+        list: Tuplas (distancia_m, id, sessao_id, ts, latitude, longitude), da mais próxima
+    """
+    resultado = []
+    for ponto in _consultar_area(*_retangulo_do_raio(lat, lon, raio), sessao_id):
+        distancia = haversine(lat, lon, ponto[3], ponto[4])
+        if distancia <= raio:
+            resultado.append((distancia, *ponto))
+    resultado.sort()
+    return resultado
+
+def existe_ponto_no_raio(lat, lon, raio, sessao_id=None):
+    """Se já há ponto gravado a até raio metros (ex.: local já pulverizado); para no primeiro"""
+    # O quadrado inscrito no círculo dispensa o cálculo de distância
+    if _consultar_area(*_retangulo_do_raio(lat, lon, raio, inscrito=True), sessao_id, limite=1):
+        return True
+    return any(haversine(lat, lon, p[3], p[4]) <= raio
+               for p in _consultar_area(*_retangulo_do_raio(lat, lon, raio), sessao_id))
+
+def remover_pontos(ids):
+    ids = list(ids)
+    conexao = obter_conexao()
+    with conexao._trava:
+        sessoes = set()
+        for inicio in range(0, len(ids), IDS_POR_CONSULTA):
+            parte = ids[inicio:inicio + IDS_POR_CONSULTA]
+            sessoes.update(linha[0] for linha in conexao.consultar(
+                f"SELECT DISTINCT sessao_id FROM pontos WHERE id IN ({','.join('?' * len(parte))})", parte,
+                pendentes=True))
+        conexao.executar_varios('DELETE FROM pontos WHERE id = ?', [(i,) for i in ids], confirmar=False)
+        conexao.commit()
+        conexao.reconstruir_resumo(sessoes)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Verifica o resumo por sessão contra os pontos gravados")
+    parser.add_argument('--banco', default=CAMINHO_BANCO)
+    parser.add_argument('--reconstruir', action='store_true', help="Regrava o resumo das sessões divergentes")
+    args = parser.parse_args()
+
+    configurar_banco(args.banco)
+    divergentes = verificar_resumo(args.reconstruir)
+    for sessao, (gravado, recalculado) in sorted(divergentes.items()):
+        print(f"Sessão {sessao}:")
+        for n, campo in enumerate(CAMPOS_RESUMO):
+            valor_gravado = gravado[n] if gravado else None
+            valor_recalculado = recalculado[n] if recalculado else None
+            if valor_gravado != valor_recalculado:
+                print(f"  {campo}: gravado {valor_gravado}  recalculado {valor_recalculado}")
+    if not divergentes:
+        print("Resumo consistente")
+    elif args.reconstruir:
+        print(f"{len(divergentes)} sessões reconstruídas")
+    else:
+        print(f"{len(divergentes)} sessões divergentes (use --reconstruir)")
@@ -1,17 +1,50 @@
 import serial
-import pynmea2
 import time
 from collections import deque
+from utils.leitor_stream import LeitorStreamGNSS
+from utils.nmea_parser import ParserNMEA
+from utils.ubx import DecodificadorUBX, SYNC_UBX, UBXNavDOP, UBXNavStatus, montar_configuracao_navegacao
+from utils.montador_epoca import MontadorEpoca
+from utils.kalman import FiltroKalmanENU
+from utils.gravacao import GravadorBruto
+from utils.simulador import PlanoTalhao, SimuladorTrajetoria, FonteSimulada
+from utils.rejeicao_outliers import FiltroOutliers
+from utils.latencia import monitor as monitor_latencia, LEITURA, PARSE, FILTRO
 
 class GNSSManager:
-    def __init__(self, porta='/dev/serial0', baudrate=115200):
+    def __init__(self, porta='/dev/serial0', baudrate=115200, fonte=None):
         self.porta = porta
         self.baudrate = baudrate
+        self.fonte = fonte  # Substitui a porta serial (ex.: FonteReplay)
         self.serial_connection = None
+        self.leitor_stream = None
+        self.gravador = None
+        # Só os tipos tratados pelo parser interno interessam aqui; repassar
+        # GSV/GLL etc. ao pynmea2 custaria CPU sem nenhum uso
+        self.parser = ParserNMEA(usar_fallback=False)
+        self.decodificador_ubx = DecodificadorUBX()
+        self.ultimo_dop_ubx = None
+        self.ultimo_status_ubx = None
+        self.montador_epoca = MontadorEpoca()
+        self.ultimo_fix = None  # FixGNSS completo (qualidade, satélites, HDOP, altitude)
+        self.max_linhas_por_leitura = 12
+        # Se ligado, pede NAV-PVT a um u-blox M10 ao conectar na serial (o NMEA
+        # continua; o MontadorEpoca descarta a época repetida). Desligado por
+        # padrão: o receptor só é reconfigurado quando pedido
+        self.configurar_ubx_ao_conectar = False
+        self.taxa_ubx_hz = 10
+        
+        # Estimador de posição/velocidade (suavização e ponte de falhas)
+        self.filtro = FiltroKalmanENU()
+        self.max_tempo_predicao = 3.0  # segundos sem fix antes de desistir
+        # Rejeição de saltos (multipath) por cinemática e qualidade do fix
+        self.filtro_outliers = FiltroOutliers()
         self.ultimo_ponto_valido = None
         self.historico_pontos = deque(maxlen=10)
         self.tentativas_conexao = 0
         self.max_tentativas = 5
+        # Com um SupervisorConexao a leitura não reconecta por conta própria
+        self.supervisor = None
         self.timeout_conexao = 2.0
         
         # Estatísticas
@@ -23,18 +56,30 @@ class GNSSManager:
         # Modo simulação para desenvolvimento
         self.modo_simulacao = False
         self.posicao_simulada = (-15.7801, -47.9292)  # Brasília
+        self.simulador = None
+        self._fonte_real = None
         
     def conectar(self):
         """Estabelece conexão com o módulo GNSS"""
         try:
-            if self.serial_connection and self.serial_connection.is_open:
-                self.serial_connection.close()
-                
-            self.serial_connection = serial.Serial(
-                self.porta, 
-                self.baudrate, 
-                timeout=self.timeout_conexao
-            )
+            if self.fonte is not None:
+                if not self.fonte.is_open:
+                    self.fonte.open()
+                self.serial_connection = self.fonte
+            else:
+                if self.serial_connection and self.serial_connection.is_open:
+                    self.serial_connection.close()
+                    
+                self.serial_connection = serial.Serial(
+                    self.porta, 
+                    self.baudrate, 
+                    timeout=self.timeout_conexao
+                )
+                if self.configurar_ubx_ao_conectar:
+                    self.configurar_ubx(self.taxa_ubx_hz)
+            self.leitor_stream = LeitorStreamGNSS(self.serial_connection, gravador=self.gravador)
+            # Latência medida no mesmo relógio dos instantes de chegada
+            monitor_latencia.relogio = self.relogio
             
             self.tentativas_conexao = 0
             self.ultimo_erro = None
@@ -45,6 +90,41 @@ class GNSSManager:
             self.ultimo_erro = f"Erro de conexão: {str(e)}"
             return False
     
+    def relogio(self):
+        """
+        Instante atual na base dos instantes de chegada dos fixes
+        
+        time.monotonic(), ou o relógio da fonte (FonteReplay, FonteSimulada):
+        num replay a N vezes a velocidade ele anda N vezes mais rápido.
+        """
+        relogio = getattr(self.fonte, 'relogio', None)
+        return relogio() if relogio is not None else time.monotonic()
+    
+    def iniciar_gravacao(self, diretorio='gravacoes', **opcoes):
+        """
+        Passa a gravar o stream bruto do receptor (ver utils.gravacao)
+        
+        Args:
+            diretorio: Pasta dos arquivos de gravação
+            **opcoes: Opções repassadas ao GravadorBruto
+            
+        Returns:
+            GravadorBruto: Gravador ativo
+        """
+        self.parar_gravacao()
+        self.gravador = GravadorBruto(diretorio, **opcoes)
+        if self.leitor_stream:
+            self.leitor_stream.gravador = self.gravador
+        return self.gravador
+    
+    def parar_gravacao(self):
+        """Encerra a gravação do stream bruto"""
+        if self.gravador:
+            if self.leitor_stream:
+                self.leitor_stream.gravador = None
+            self.gravador.fechar()
+            self.gravador = None
+    
     def desconectar(self):
         """Fecha conexão com o módulo GNSS"""
         try:
@@ -61,122 +141,169 @@ class GNSSManager:
         Returns:
             tuple: (latitude, longitude) ou None se não conseguir ler
         """
-        self.total_leituras += 1
-        
-        # Modo simulação
-        if self.modo_simulacao:
-            return self._simular_ponto()
-        
         try:
-            # Conectar se necessário
+            # Conectar se necessário (com supervisor, a reconexão é feita por ele)
             if not self.serial_connection or not self.serial_connection.is_open:
-                if not self.conectar():
-                    return self._fallback_ponto()
+                if self.supervisor or not self.conectar():
+                    return self._fallback_leitura()
             
-            # Tentar ler várias linhas para encontrar uma válida
-            for tentativa in range(5):
+            # Ler até completar uma época (RMC, GGA, GSA, VTG... ou NAV-PVT); o
+            # leitor contínuo separa sentenças NMEA e frames UBX do mesmo stream
+            lidas = 0
+            tentativa = 0
+            prazo = time.monotonic() + self.timeout_conexao
+            while lidas < self.max_linhas_por_leitura and time.monotonic() < prazo:
+                tentativa += 1
                 try:
-                    if self.serial_connection and self.serial_connection.is_open:
-                        linha = self.serial_connection.readline().decode('ascii', errors='replace').strip()
-                        
-                        if not linha:
-                            continue
-                            
-                        # Processar diferentes tipos de mensagens NMEA
-                        if linha.startswith('$GPRMC') or linha.startswith('$GNRMC'):
-                            return self._processar_rmc(linha)
-                        elif linha.startswith('$GPGGA') or linha.startswith('$GNGGA'):
-                            return self._processar_gga(linha)
-                    else:
+                    if not self.serial_connection or not self.serial_connection.is_open:
                         break
+                    ponto = None
+                    for instante, sentenca in self.leitor_stream.ler_disponivel():
+                        lidas += 1
+                        ponto = self.processar_sentenca(sentenca, instante) or ponto
+                    if ponto:
+                        return ponto
                         
                 except Exception as e:
-                    self.ultimo_erro = f"Erro na leitura {tentativa + 1}: {str(e)}"
-                    continue
+                    self.ultimo_erro = f"Erro na leitura {tentativa}: {str(e)}"
+                    if self.supervisor:
+                        self.supervisor.notificar_queda()
+                        break
+                    lidas += 1
             
             # Se chegou aqui, não conseguiu ler
-            return self._fallback_ponto()
+            return self._fallback_leitura()
             
         except Exception as e:
             self.ultimo_erro = f"Erro geral: {str(e)}"
-            return self._fallback_ponto()
+            return self._fallback_leitura()
     
-    def _processar_rmc(self, linha):
-        """Processa mensagem RMC"""
-        try:
-            msg = pynmea2.parse(linha)
-            
-            # Verificar se o fix é válido
-            if msg.status != 'A':  # 'A' = ativo, 'V' = inválido
-                return None
-                
-            if msg.latitude is None or msg.longitude is None:
-                return None
-            
-            # Extrair velocidade da mensagem NMEA (em nós)
-            velocidade_nos = 0
-            if hasattr(msg, 'spd_over_grnd') and msg.spd_over_grnd is not None:
-                try:
-                    velocidade_nos = float(msg.spd_over_grnd)
-                except (ValueError, TypeError):
-                    velocidade_nos = 0
-            
-            velocidade_kmh = velocidade_nos * 1.852  # Converter nós para km/h
-            
-            # Extrair direção (course over ground)
-            direcao = 0
-            if hasattr(msg, 'true_course') and msg.true_course is not None:
-                try:
-                    direcao = float(msg.true_course)
-                except (ValueError, TypeError):
-                    direcao = 0
-                
-            ponto = (float(msg.latitude), float(msg.longitude), velocidade_kmh, direcao)
-            return self._validar_ponto(ponto)
+    def iterar_pontos(self, continuar=None):
+        """
+        Lê continuamente a porta serial e gera cada ponto recebido
+        
+        Diferente de ler_ponto_gnss, que devolve só o último fix de cada
+        leitura, cada fix é entregue, com o instante de chegada dos bytes.
+        
+        Args:
+            continuar: Função opcional; a leitura para quando retornar False
             
+        Yields:
+            tuple: (instante_chegada, (latitude, longitude, velocidade, direcao))
+        """
+        if not self.serial_connection or not self.serial_connection.is_open:
+            if self.supervisor or not self.conectar():
+                return
+        
+        try:
+            for instante, sentenca in self.leitor_stream.sentencas(continuar):
+                ponto = self.processar_sentenca(sentenca, instante)
+                if ponto:
+                    yield self.ultimo_fix.instante, ponto
         except Exception as e:
-            self.ultimo_erro = f"Erro RMC: {str(e)}"
-            return None
+            self.ultimo_erro = f"Erro na leitura contínua: {str(e)}"
+            if self.supervisor:
+                self.supervisor.notificar_queda()
+            else:
+                self.desconectar()
     
-    def _processar_gga(self, linha):
-        """Processa mensagem GGA"""
-        try:
-            msg = pynmea2.parse(linha)
+    def processar_sentenca(self, sentenca, instante=None):
+        """
+        Processa uma sentença NMEA ou um frame UBX completo
+        
+        As sentenças são agrupadas por época pelo MontadorEpoca; um ponto só
+        é retornado quando a época fica completa.
+        
+        Args:
+            sentenca: Sentença em bytes ou str, sem terminador de linha
+            instante: Instante de chegada (default: agora)
             
-            # Verificar qualidade do fix
-            if msg.gps_qual == 0:  # 0 = sem fix
-                return None
-                
-            if msg.latitude is None or msg.longitude is None:
+        Returns:
+            tuple: (latitude, longitude, velocidade, direcao) ou None
+        """
+        if instante is None:
+            instante = self.relogio()
+        monitor_latencia.registrar(LEITURA, instante)
+        
+        if sentenca[:2] == SYNC_UBX:
+            # O leitor contínuo já verificou o checksum do frame
+            msg = self.decodificador_ubx.decodificar(sentenca, verificar=False)
+            if isinstance(msg, UBXNavStatus):
+                self.ultimo_status_ubx = msg
                 return None
-                
-            # GGA não tem velocidade, então usar valores padrão
-            ponto = (float(msg.latitude), float(msg.longitude), 0, 0)
-            return self._validar_ponto(ponto)
+            if isinstance(msg, UBXNavDOP):
+                self.ultimo_dop_ubx = msg
+        else:
+            msg = self.parser.parse(sentenca)
+        
+        return self._processar_mensagem(msg, instante)
+    
+    def _processar_mensagem(self, msg, instante):
+        """Entrega a mensagem ao montador de épocas e valida os fixes emitidos"""
+        if msg is None:
+            return None
+        
+        ponto = None
+        for fix in self.montador_epoca.adicionar(msg, instante):
+            ponto = self._processar_fix(fix) or ponto
+        return ponto
+    
+    def _processar_fix(self, fix):
+        """Processa um fix completo (uma época)"""
+        self.total_leituras += 1
+        monitor_latencia.registrar(PARSE, fix.instante)
+        ponto = self._validar_ponto(fix.como_ponto(), fix)
+        if ponto:
+            self.ultimo_fix = fix
+            self.filtro.atualizar(fix.instante, fix.latitude, fix.longitude,
+                                  fix.velocidade_kmh, fix.curso, fix.sigma_h, fix.hdop)
+            monitor_latencia.registrar(FILTRO, fix.instante)
+        return ponto
+    
+    def configurar_ubx(self, taxa_hz=10, nmea=True):
+        """
+        Configura o módulo u-blox M10 para enviar NAV-PVT na taxa desejada
+        
+        Chamado por conectar() se configurar_ubx_ao_conectar estiver ligado.
+        A configuração vai só para a RAM: volta ao religar o receptor.
+        
+        Args:
+            taxa_hz: Taxa de navegação em Hz (até 25 Hz no M10)
+            nmea: Manter a saída NMEA na UART1 (desligá-la economiza banda)
             
+        Returns:
+            bool: True se a configuração foi enviada
+        """
+        if not self.serial_connection or not self.serial_connection.is_open:
+            return False
+        try:
+            self.serial_connection.write(montar_configuracao_navegacao(taxa_hz, nmea=nmea))
+            return True
         except Exception as e:
-            self.ultimo_erro = f"Erro GGA: {str(e)}"
-            return None
+            self.ultimo_erro = f"Erro ao configurar UBX: {str(e)}"
+            return False
     
-    def _validar_ponto(self, ponto):
-        """Valida se o ponto é razoável"""
+    def _validar_ponto(self, ponto, fix=None):
+        """
+        Valida se o ponto é razoável (ver utils.rejeicao_outliers)
+        
+        Args:
+            ponto: (latitude, longitude, velocidade, direcao)
+            fix: FixGNSS de origem, com instante e qualidade (opcional)
+        """
         if len(ponto) >= 2:
             lat, lon = ponto[0], ponto[1]
         else:
             return None
         
-        # Verificar se está dentro de limites razoáveis
-        if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+        if fix is not None:
+            motivo = self.filtro_outliers.avaliar(
+                fix.instante, lat, lon, fix.velocidade_kmh, fix.hdop,
+                fix.satelites, fix.tipo_fix, fix.qualidade)
+        else:
+            motivo = self.filtro_outliers.avaliar(self.relogio(), lat, lon)
+        if motivo:
             return None
-            
-        # Verificar se não é muito diferente do último ponto
-        if self.ultimo_ponto_valido:
-            from utils.haversine import haversine
-            dist = haversine(self.ultimo_ponto_valido[0], self.ultimo_ponto_valido[1], lat, lon)
-            
-            # Se a distância for muito grande, provavelmente é erro
-            if dist > 1000:  # 1km
-                return None
         
         # Ponto válido
         self.ultimo_ponto_valido = ponto
@@ -186,63 +313,36 @@ class GNSSManager:
         
         return ponto
     
+    def _fallback_leitura(self):
+        """Contabiliza leitura sem fix e retorna ponto de fallback"""
+        self.total_leituras += 1
+        return self._fallback_ponto()
+    
     def _fallback_ponto(self):
         """Retorna ponto de fallback em caso de erro"""
-        # Se temos pontos recentes, pode usar extrapolação simples
-        if len(self.historico_pontos) >= 2:
-            return self._extrapolar_posicao()
-            
-        # Usar último ponto válido se foi recente
-        if (self.ultimo_ponto_valido and self.tempo_ultimo_ponto and 
-            time.time() - self.tempo_ultimo_ponto < 10):
-            return self.ultimo_ponto_valido
-            
-        return None
-    
-    def _extrapolar_posicao(self):
-        """Extrapola posição baseada nos últimos pontos"""
-        if len(self.historico_pontos) < 2:
-            return None
-            
-        # Usar os dois últimos pontos para calcular direção
-        p1 = self.historico_pontos[-2]
-        p2 = self.historico_pontos[-1]
-        
-        # Calcular deslocamento
-        delta_lat = p2[0] - p1[0]
-        delta_lon = p2[1] - p1[1]
-        
-        # Extrapolar (movimento muito pequeno)
-        nova_lat = p2[0] + delta_lat * 0.1
-        nova_lon = p2[1] + delta_lon * 0.1
-        
-        # Estimar velocidade e direção baseado no movimento
-        velocidade_estimada = 0
-        direcao_estimada = 0
-        
-        return (nova_lat, nova_lon, velocidade_estimada, direcao_estimada)
+        # Ponte curta de falhas usando a predição do filtro de Kalman
+        return self.estimar_posicao()
     
-    def _simular_ponto(self):
-        """Simula ponto GPS para desenvolvimento"""
-        import random
-        
-        # Adicionar pequeno ruído à posição
-        ruido_lat = random.uniform(-0.0001, 0.0001)
-        ruido_lon = random.uniform(-0.0001, 0.0001)
-        
-        lat = self.posicao_simulada[0] + ruido_lat
-        lon = self.posicao_simulada[1] + ruido_lon
-        
-        # Simular velocidade (0-20 km/h)
-        velocidade_simulada = random.uniform(0, 20)
-        
-        # Simular direção (0-360 graus)
-        direcao_simulada = random.uniform(0, 360)
+    def estimar_posicao(self, instante=None):
+        """
+        Estima a posição em qualquer instante usando o filtro de Kalman
         
-        # Simular movimento lento
-        self.posicao_simulada = (lat, lon)
+        Permite à interface desenhar a posição entre fixes (30-60 fps com
+        receptor a 10 Hz) e cobre falhas curtas com uma predição real.
         
-        return (lat, lon, velocidade_simulada, direcao_simulada)
+        Args:
+            instante: Instante na base de relogio() (default: agora)
+            
+        Returns:
+            tuple: (latitude, longitude, velocidade, direcao) ou None se não
+                   houver fix recente o suficiente
+        """
+        if instante is None:
+            instante = self.relogio()
+        decorrido = self.filtro.tempo_desde_atualizacao(instante)
+        if decorrido is None or decorrido > self.max_tempo_predicao:
+            return None
+        return self.filtro.estimar(instante)
     
     def obter_status(self):
         """Retorna status detalhado do GNSS"""
@@ -257,23 +357,75 @@ class GNSSManager:
         return {
             'conectado': self.serial_connection and self.serial_connection.is_open,
             'modo_simulacao': self.modo_simulacao,
+            'simulador': {
+                'epocas_geradas': self.simulador.epocas_geradas,
+                'epocas_sem_fix': self.simulador.epocas_sem_fix,
+                'passada': self.simulador.passada
+            } if self.simulador else None,
             'total_leituras': self.total_leituras,
             'leituras_validas': self.leituras_validas,
             'taxa_sucesso': taxa_sucesso,
             'ultimo_erro': self.ultimo_erro,
             'tempo_desde_ultimo': tempo_desde_ultimo,
             'tentativas_conexao': self.tentativas_conexao,
-            'pontos_historico': len(self.historico_pontos)
+            'conexao': self.supervisor.obter_estatisticas() if self.supervisor else None,
+            'pontos_historico': len(self.historico_pontos),
+            'stream': self.leitor_stream.obter_estatisticas() if self.leitor_stream else None,
+            'parser': self.parser.obter_estatisticas(),
+            'ubx': self.decodificador_ubx.obter_estatisticas(),
+            'epocas': self.montador_epoca.obter_estatisticas(),
+            'outliers': self.filtro_outliers.obter_estatisticas(),
+            'gravacao': self.gravador.obter_estatisticas() if self.gravador else None
         }
     
-    def ativar_modo_simulacao(self, posicao_inicial=None):
-        """Ativa modo simulação para desenvolvimento"""
-        self.modo_simulacao = True
+    def ativar_modo_simulacao(self, posicao_inicial=None, plano=None, tempo_real=True, **opcoes):
+        """
+        Ativa modo simulação para desenvolvimento
+        
+        O simulador gera bytes NMEA/UBX reais que passam por todo o caminho
+        de leitura (stream, parser, épocas, filtro), no lugar da porta serial.
+        
+        Args:
+            posicao_inicial: (lat, lon) do início do talhão simulado
+            plano: PlanoTalhao (default: talhão padrão na posição inicial)
+            tempo_real: Entregar no ritmo do receptor; False = o mais rápido possível
+            **opcoes: Opções repassadas ao SimuladorTrajetoria (velocidade_kmh,
+                      taxa_hz, sigma_ruido, falhas_por_hora, protocolo...)
+                      
+        Returns:
+            SimuladorTrajetoria: Simulador ativo
+        """
         if posicao_inicial:
-            self.posicao_simulada = posicao_inicial
+            self.posicao_simulada = tuple(posicao_inicial)
+        if plano is None:
+            plano = PlanoTalhao(*self.posicao_simulada)
+        
+        if not self.modo_simulacao:
+            self._fonte_real = self.fonte
+        self.desconectar()
+        self.simulador = SimuladorTrajetoria(plano, **opcoes)
+        self.fonte = FonteSimulada(self.simulador, tempo_real=tempo_real)
+        self.montador_epoca = MontadorEpoca()
+        self.filtro.resetar()
+        self.ultimo_ponto_valido = None
+        self.historico_pontos.clear()
+        self.filtro_outliers.resetar()
+        self.modo_simulacao = True
+        return self.simulador
     
     def desativar_modo_simulacao(self):
         """Desativa modo simulação"""
+        if not self.modo_simulacao:
+            return
+        self.desconectar()
+        self.fonte = self._fonte_real
+        self._fonte_real = None
+        self.simulador = None
+        self.montador_epoca = MontadorEpoca()
+        self.filtro.resetar()
+        self.ultimo_ponto_valido = None
+        self.historico_pontos.clear()
+        self.filtro_outliers.resetar()
         self.modo_simulacao = False
     
     def resetar_estatisticas(self):
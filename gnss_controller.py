@@ -1,54 +1,131 @@
 import threading
-import time
 from gnss import GNSSManager
-from utils.detect_gps_port import detectar_porta_gps
+from utils.barramento import BarramentoFix, DESCARTAR_ANTIGOS
+from utils.detect_gps_port import detectar_gps
+from utils.supervisor_conexao import SupervisorConexao, PARADO
+from utils.latencia import monitor as latency_monitor
 
 class GNSSController:
     def __init__(self):
         self.gnss_manager = None
+        self.supervisor = None
         self.position = None  # (lat, lon, speed, direction)
-        self.connected = False
+        self.position_time = None  # arrival time of the bytes carrying the fix
         self.running = False
         self.thread = None
+        self.detection = None  # last detectar_gps result (port, baud, detection time)
+        # Every fix is published here; each consumer subscribes with its own drop policy
+        self.bus = BarramentoFix()
+        # Link health changes (utils.supervisor_conexao.EventoConexao); survives restarts
+        self.health_bus = BarramentoFix(capacidade=64)
 
-    def start(self):
-        port = detectar_porta_gps()
-        if port is None:
-            print("GNSSController: GPS port not detected.")
-            self.connected = False
+    def start(self, source=None):
+        # source: serial-like object replacing the port (e.g. utils.gravacao.FonteReplay)
+        # Never blocks: detection and (re)connection run in the supervisor thread
+        if self.running:
             return
+        port = 'replay' if source is not None else None
+        self.gnss_manager = GNSSManager(porta=port, fonte=source)
+        self.supervisor = SupervisorConexao(self.gnss_manager, detectar=self._detect,
+                                            eventos=self.health_bus)
+        self.gnss_manager.supervisor = self.supervisor
 
-        self.gnss_manager = GNSSManager(porta=port)
-        if not self.gnss_manager.conectar():
-            print("GNSSController: Failed to connect to GPS.")
-            self.connected = False
-            return
-
-        self.connected = True
         self.running = True
+        self.supervisor.iniciar()
         self.thread = threading.Thread(target=self._read_loop, daemon=True)
         self.thread.start()
-        print(f"GNSSController: Connected to GPS on port {port}.")
+
+    def _detect(self):
+        # Last known good port/baud first, then every port in parallel
+        self.detection = detectar_gps()
+        if self.detection is None:
+            print("GNSSController: GPS port not detected, retrying.")
+        else:
+            print(f"GNSSController: GPS detected on {self.detection['porta']} in "
+                  f"{self.detection['tempo_deteccao']:.2f} s "
+                  f"({self.detection['protocolo'].upper()} at {self.detection['baudrate']} baud).")
+        return self.detection
 
     def stop(self):
         self.running = False
+        if self.supervisor:
+            # Closing the port also releases a read in progress
+            self.supervisor.parar()
         if self.thread:
             self.thread.join()
         if self.gnss_manager:
-            self.gnss_manager.desconectar()
-        self.connected = False
+            self.gnss_manager.parar_gravacao()
+
+    def start_recording(self, directory='gravacoes'):
+        # Tee the raw receiver byte stream to rotating compressed logs
+        if self.gnss_manager:
+            return self.gnss_manager.iniciar_gravacao(directory)
+        return None
+
+    def stop_recording(self):
+        if self.gnss_manager:
+            self.gnss_manager.parar_gravacao()
 
     def _read_loop(self):
         while self.running:
-            ponto = self.gnss_manager.ler_ponto_gnss()
-            if ponto:
+            if not self.supervisor.aguardar_conexao(0.5):
+                continue
+            for instante, ponto in self.gnss_manager.iterar_pontos(
+                    lambda: self.running and self.supervisor.conectado):
                 self.position = ponto
-            else:
+                self.position_time = instante
+                self.bus.publicar(self.gnss_manager.ultimo_fix)
+            if self.running:
+                # Link dropped; the supervisor reconnects in the background
                 self.position = None
-            time.sleep(0.5)
+
+    def subscribe(self, name, policy=DESCARTAR_ANTIGOS):
+        # Returns an Assinatura delivering every FixGNSS (see utils.barramento)
+        return self.bus.assinar(name, policy)
+
+    def subscribe_health(self, name, policy=DESCARTAR_ANTIGOS):
+        # Returns an Assinatura delivering every EventoConexao (state changes)
+        return self.health_bus.assinar(name, policy)
+
+    def get_health(self):
+        # 'parado', 'detectando', 'conectando', 'conectado', 'sem_dados' or 'desconectado'
+        return self.supervisor.estado if self.supervisor else PARADO
+
+    def get_connection_stats(self):
+        # Attempts, drops, reconnect latency and total downtime
+        return self.supervisor.obter_estatisticas() if self.supervisor else None
+
+    def get_bus_stats(self):
+        return self.bus.obter_estatisticas()
 
     def get_position(self):
         return self.position
 
+    def get_estimated_position(self, t=None):
+        # Kalman estimate at t (gnss_manager.relogio(): the replay clock when
+        # replaying, else time.monotonic()); smooth between fixes
+        if self.gnss_manager:
+            return self.gnss_manager.estimar_posicao(t)
+        return None
+
+    def get_fix(self):
+        # Full epoch record (fix quality, satellites, HDOP, altitude)
+        if self.gnss_manager:
+            return self.gnss_manager.ultimo_fix
+        return None
+
+    def get_detection(self):
+        # Port, baud rate, protocol and time taken by the last detection
+        return self.detection
+
+    def get_latency_stats(self):
+        # Rolling p50/p95/p99 (seconds) from serial arrival to each stage (see utils.latencia)
+        return latency_monitor.obter_percentis()
+
+    def get_stream_stats(self):
+        if self.gnss_manager and self.gnss_manager.leitor_stream:
+            return self.gnss_manager.leitor_stream.obter_estatisticas()
+        return None
+
     def is_connected(self):
-        return self.connected
+        return self.supervisor is not None and self.supervisor.conectado
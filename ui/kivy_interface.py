@@ -12,6 +12,21 @@ from kivy.graphics import Color, Rectangle, Triangle
 from kivy.clock import Clock
 
 from gnss_controller import GNSSController
+import db
+from utils.barramento import MANTER_ULTIMO
+from utils.exportacao import ExportadorDados
+from utils.tarefas import ExecutorTarefas, CONCLUIDA, CANCELADA
+from utils.latencia import monitor as latency_monitor, TELA
+
+# Status bar text for each link health state (utils.supervisor_conexao)
+HEALTH_LABELS = {
+    'parado': "Parado",
+    'detectando': "Procurando...",
+    'conectando': "Conectando...",
+    'conectado': "Conectado",
+    'sem_dados': "Sem dados",
+    'desconectado': "Reconectando...",
+}
 
 class MapArea(Widget):
     path_points = ListProperty([])  # List of (x, y) points where the triangle has passed
@@ -109,20 +124,33 @@ class GPSInterface(BoxLayout):
         btn_zoom_out = Button(text='-', size_hint_y=None, height=50)
         btn_3d = ToggleButton(text='3D', size_hint_y=None, height=50)
         btn_location = Button(text='Loc', size_hint_y=None, height=50)
+        btn_latency = ToggleButton(text='Lat', size_hint_y=None, height=50)
         left_controls.add_widget(btn_zoom_in)
         left_controls.add_widget(btn_zoom_out)
         left_controls.add_widget(btn_3d)
         left_controls.add_widget(btn_location)
+        left_controls.add_widget(btn_latency)
 
         # Map area
         self.map_area = MapArea(size_hint_x=0.8)
 
+        # Debug overlay with per-stage fix latency, drawn over the map
+        self.latency_overlay = Label(text="", halign='left', valign='top', font_size='12sp',
+                                     color=(1, 1, 1, 0.9), opacity=0)
+        self.latency_overlay.bind(texture_size=self.latency_overlay.setter('size'))
+        self.map_area.add_widget(self.latency_overlay)
+        self.map_area.bind(pos=self.place_latency_overlay, size=self.place_latency_overlay)
+
         # Right controls vertical box
         right_controls = BoxLayout(orientation='vertical', size_hint_x=0.1, padding=10)
         btn_start = Button(text='Iniciar', size_hint_y=None, height=50)
         btn_pause = ToggleButton(text='Pause', size_hint_y=None, height=50)
+        self.btn_export = Button(text='Export', size_hint_y=None, height=50)
+        self.btn_backup = Button(text='Backup', size_hint_y=None, height=50)
         right_controls.add_widget(btn_start)
         right_controls.add_widget(btn_pause)
+        right_controls.add_widget(self.btn_export)
+        right_controls.add_widget(self.btn_backup)
 
         main_area.add_widget(left_controls)
         main_area.add_widget(self.map_area)
@@ -136,18 +164,20 @@ class GPSInterface(BoxLayout):
         bottom_controls.add_widget(self.input_width)
 
         # Bottom status bar
-        status_bar = GridLayout(cols=5, size_hint_y=0.15, padding=10, spacing=10)
+        status_bar = GridLayout(cols=6, size_hint_y=0.15, padding=10, spacing=10)
         self.status_area = StatusLabel(text="Area: -- ha")
         self.status_speed = StatusLabel(text="Speed: -- km/h")
         self.status_time = StatusLabel(text="Time: 00:00:00")
         self.status_gps = StatusLabel(text="GPS: --")
         self.status_pattern = StatusLabel(text="Pattern: --")
+        self.status_job = StatusLabel(text="")
 
         status_bar.add_widget(self.status_area)
         status_bar.add_widget(self.status_speed)
         status_bar.add_widget(self.status_time)
         status_bar.add_widget(self.status_gps)
         status_bar.add_widget(self.status_pattern)
+        status_bar.add_widget(self.status_job)
 
         self.add_widget(main_area)
         self.add_widget(bottom_controls)
@@ -155,16 +185,32 @@ class GPSInterface(BoxLayout):
 
         # Initialize GNSS controller
         self.gnss_controller = GNSSController()
+        # The map consumes every fix published since the last UI tick
+        self.map_subscription = self.gnss_controller.subscribe('mapa')
+        # Only the current link state matters for the status bar
+        self.health_subscription = self.gnss_controller.subscribe_health('status', MANTER_ULTIMO)
+
+        # Exports and backups run in a worker pool; callbacks arrive on the Kivy thread
+        self.exporter = ExportadorDados(db.CAMINHO_BANCO)
+        self.jobs = ExecutorTarefas()
+        self.job_buttons = {}  # Job -> button that started it (pressing it again cancels)
 
         # Bind button events
         btn_start.bind(on_press=self.start_tracking)
         btn_pause.bind(on_press=self.toggle_pause)
         btn_zoom_in.bind(on_press=self.zoom_in)
         btn_zoom_out.bind(on_press=self.zoom_out)
+        btn_latency.bind(state=self.toggle_latency_overlay)
+        self.btn_export.bind(on_press=self.export_data)
+        self.btn_backup.bind(on_press=self.backup_data)
         self.input_width.bind(text=self.on_width_change)
 
-        # Schedule periodic UI updates
-        Clock.schedule_interval(self.update_ui, 1.0)
+        # Schedule periodic UI updates; at 1 s a fix could wait up to a second
+        # in the bus before being drawn, at 10 Hz it waits at most 100 ms
+        Clock.schedule_interval(self.update_ui, 0.1)
+        Clock.schedule_interval(self.update_latency_overlay, 0.5)
+        # Delivering job callbacks never waits for a job
+        Clock.schedule_interval(self.update_jobs, 0.1)
 
     def start_tracking(self, instance):
         if not self.running:
@@ -188,6 +234,61 @@ class GPSInterface(BoxLayout):
         self.zoom_level = max(self.zoom_level - 0.1, 0.5)
         self.map_area.zoom_level = self.zoom_level
 
+    def toggle_latency_overlay(self, instance, state):
+        self.latency_overlay.opacity = 1 if state == 'down' else 0
+
+    def place_latency_overlay(self, *args):
+        self.latency_overlay.pos = (self.map_area.x + 10,
+                                    self.map_area.top - self.latency_overlay.height - 10)
+
+    def update_latency_overlay(self, dt):
+        if self.latency_overlay.opacity:
+            self.latency_overlay.text = latency_monitor.formatar() or "latency: no fixes"
+            self.place_latency_overlay()
+
+    def export_data(self, instance):
+        self.run_job(instance, 'Export', lambda: self.jobs.exportar(
+            self.exporter, 'tudo', ao_progresso=self.on_job_progress, ao_terminar=self.on_job_done))
+
+    def backup_data(self, instance):
+        self.run_job(instance, 'Backup', lambda: self.jobs.backup(
+            self.exporter, ao_progresso=self.on_job_progress, ao_terminar=self.on_job_done))
+
+    def run_job(self, button, label, submit):
+        # Pressing the button of a running job cancels it
+        for job, job_button in self.job_buttons.items():
+            if job_button is button:
+                job.cancelar()
+                self.status_job.text = f"{label}: cancelling..."
+                return
+        job = submit()
+        self.job_buttons[job] = button
+        button.text = 'Cancel'
+        self.status_job.text = f"{label}: queued"
+
+    def update_jobs(self, dt):
+        self.jobs.processar_eventos()
+
+    def on_job_progress(self, job):
+        if job.progresso is not None:
+            self.status_job.text = f"{job.nome}: {job.progresso * 100:.0f}%"
+
+    def on_job_done(self, job):
+        button = self.job_buttons.pop(job, None)
+        if button is not None:
+            button.text = 'Export' if button is self.btn_export else 'Backup'
+        if job.estado == CONCLUIDA:
+            self.status_job.text = f"{job.nome}: done ({job.duracao:.1f} s)"
+        elif job.estado == CANCELADA:
+            self.status_job.text = f"{job.nome}: cancelled"
+        else:
+            self.status_job.text = f"{job.nome}: failed"
+            print(f"{job.nome} failed: {job.erro}")
+
+    def shutdown(self):
+        # Cancels running jobs; partial files are removed by the jobs themselves
+        self.jobs.encerrar()
+
     def on_width_change(self, instance, value):
         try:
             width = float(value)
@@ -198,35 +299,42 @@ class GPSInterface(BoxLayout):
             pass
 
     def update_ui(self, dt):
-        # Update connection status
-        connected = self.gnss_controller.is_connected()
-        self.connected = connected
-        self.status_gps.text = "GPS: " + ("Conectado" if connected else "Desconectado")
-
-        # Update triangle position and path if connected and position available
-        pos = self.gnss_controller.get_position()
-        if pos and self.running:
-            lat, lon = pos[0], pos[1]
-            # Convert lat/lon to widget coordinates constrained to green terrain area (right half)
-            terrain_x_start = self.map_area.x + self.map_area.width * 0.5
-            terrain_width = self.map_area.width * 0.5
-            x = terrain_x_start + (lon + 180) / 360 * terrain_width
-            y = self.map_area.y + (lat + 90) / 180 * self.map_area.height
-
-            # Clamp x and y to stay within terrain rectangle
-            x = max(terrain_x_start, min(x, terrain_x_start + terrain_width))
-            y = max(self.map_area.y, min(y, self.map_area.y + self.map_area.height))
-
-            # Update triangle position
+        # Update connection status from the latest link health event
+        events = self.health_subscription.obter_pendentes()
+        if events:
+            self.connected = events[-1].estado == 'conectado'
+            self.status_gps.text = "GPS: " + HEALTH_LABELS.get(events[-1].estado, events[-1].estado)
+
+        # Update triangle position and path with every fix received since the last tick
+        fixes = self.map_subscription.obter_pendentes()
+        if fixes and self.running:
+            for fix in fixes:
+                x, y = self.add_fix_to_map(fix.latitude, fix.longitude)
+            # Update triangle position once per tick (each assignment redraws the canvas)
             self.map_area.triangle_pos = [x, y]
-
-            # Add to path points if not already close
-            if not self.map_area.path_points or self.distance(self.map_area.path_points[-1], (x, y)) > 10:
-                self.map_area.path_points.append((x, y))
-        else:
+            drawn = latency_monitor.relogio()
+            for fix in fixes:
+                latency_monitor.registrar(TELA, fix.instante, drawn)
+        elif not self.running or self.gnss_controller.get_position() is None:
             # No position or not running, keep triangle in center
             self.map_area.triangle_pos = [self.map_area.center_x, self.map_area.center_y]
 
+    def add_fix_to_map(self, lat, lon):
+        # Convert lat/lon to widget coordinates constrained to green terrain area (right half)
+        terrain_x_start = self.map_area.x + self.map_area.width * 0.5
+        terrain_width = self.map_area.width * 0.5
+        x = terrain_x_start + (lon + 180) / 360 * terrain_width
+        y = self.map_area.y + (lat + 90) / 180 * self.map_area.height
+
+        # Clamp x and y to stay within terrain rectangle
+        x = max(terrain_x_start, min(x, terrain_x_start + terrain_width))
+        y = max(self.map_area.y, min(y, self.map_area.y + self.map_area.height))
+
+        # Add to path points if not already close
+        if not self.map_area.path_points or self.distance(self.map_area.path_points[-1], (x, y)) > 10:
+            self.map_area.path_points.append((x, y))
+        return x, y
+
     def distance(self, p1, p2):
         return ((p1[0]-p2[0])**2 + (p1[1]-p2[1])**2)**0.5
 
@@ -236,6 +344,9 @@ class GPSApp(App):
         Window.clearcolor = (0.15, 0.15, 0.15, 1)
         return GPSInterface()
 
+    def on_stop(self):
+        self.root.shutdown()
+
 if __name__ == '__main__':
     GPSApp().run()
 
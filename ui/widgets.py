@@ -1,6 +1,10 @@
 import pygame
 import time
-from ui.components import Panel, Button, ToggleButton, MetricDisplay, Colors
+from ui.components import Panel, Button, ToggleButton, MetricDisplay, ProgressBar, Colors
+from utils.tarefas import CONCLUIDA, CANCELADA
+
+# Situação exibida quando a tarefa em segundo plano termina
+TEXTOS_FIM_TAREFA = {CONCLUIDA: "Concluído", CANCELADA: "Cancelado"}
 
 class HUD:
     def __init__(self, screen):
@@ -24,6 +28,12 @@ class HUD:
         self.btn_exportar = Button((610, 370, 75, 40), "Export", Colors.PRIMARY)
         self.btn_limpar = Button((695, 370, 75, 40), "Limpar", Colors.DANGER)
         
+        # Tarefa em segundo plano (utils.tarefas): barra de progresso e situação
+        self.barra_tarefa = ProgressBar((610, 418, 160, 8), max_value=1.0)
+        self.fonte_tarefa = pygame.font.Font(None, 18)
+        self.tarefa = None
+        self.texto_tarefa = ""
+        
         # Controle de tempo
         self.tempo_inicio = None
         self.tempo_pausado = 0
@@ -47,7 +57,12 @@ class HUD:
                     self.tempo_pausado = time.time() - self.tempo_inicio
                     
         if self.btn_exportar.handle_event(event):
-            resultados['exportar'] = True
+            # Com uma tarefa em andamento o botão vira "Parar"
+            if self.tarefa is not None:
+                self.tarefa.cancelar()
+                resultados['cancelar_tarefa'] = True
+            else:
+                resultados['exportar'] = True
             
         if self.btn_limpar.handle_event(event):
             resultados['limpar'] = True
@@ -74,6 +89,30 @@ class HUD:
         
         # Sincronizar estado do botão
         self.btn_iniciar.set_active(ativo)
+        self.atualizar_tarefa()
+        
+    def acompanhar_tarefa(self, tarefa):
+        """Mostra o progresso de uma Tarefa (ExecutorTarefas) até ela terminar"""
+        self.tarefa = tarefa
+        self.texto_tarefa = tarefa.nome
+        self.barra_tarefa.set_value(0)
+        self.btn_exportar.text = "Parar"
+        self.btn_limpar.enabled = False
+        
+    def atualizar_tarefa(self):
+        """Lê o estado da tarefa acompanhada (não bloqueia; chamado a cada quadro)"""
+        tarefa = self.tarefa
+        if tarefa is None:
+            return
+        if not tarefa.terminada:
+            if tarefa.progresso is not None:
+                self.barra_tarefa.set_value(tarefa.progresso)
+                self.texto_tarefa = f"{tarefa.nome} {tarefa.progresso * 100:.0f}%"
+            return
+        self.texto_tarefa = TEXTOS_FIM_TAREFA.get(tarefa.estado, "Erro")
+        self.tarefa = None
+        self.btn_exportar.text = "Export"
+        self.btn_limpar.enabled = True
         
     def draw(self):
         """Desenha o HUD"""
@@ -104,6 +143,13 @@ class HUD:
         self.metric_velocidade.draw(self.screen)
         self.metric_tempo.draw(self.screen)
         
+        # Tarefa em segundo plano
+        if self.tarefa is not None:
+            self.barra_tarefa.draw(self.screen)
+        if self.texto_tarefa:
+            texto = self.fonte_tarefa.render(self.texto_tarefa, True, Colors.TEXT_SECONDARY)
+            self.screen.blit(texto, texto.get_rect(centerx=self.painel_lateral.rect.centerx, y=432))
+        
         # Desenhar botões com efeitos de hover e pressed
         for btn in [self.btn_iniciar, self.btn_exportar, self.btn_limpar]:
             # Ajustar cor para hover e pressed
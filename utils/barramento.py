@@ -0,0 +1,246 @@
+import asyncio
+import threading
+
+# Políticas de descarte por assinante
+DESCARTAR_ANTIGOS = 'descartar_antigos'  # atrasou mais que a capacidade: pula os mais antigos
+MANTER_ULTIMO = 'manter_ultimo'          # só interessa o fix mais recente (ex.: desenho do mapa)
+BLOQUEAR = 'bloquear'                    # o publicador espera espaço (ex.: gravação no banco)
+
+POLITICAS = (DESCARTAR_ANTIGOS, MANTER_ULTIMO, BLOQUEAR)
+
+_VAZIO = object()
+
+
+class Assinatura:
+    def __init__(self, barramento, nome, politica, cursor):
+        """Assinatura de um consumidor no BarramentoFix (criada por BarramentoFix.assinar)"""
+        self._barramento = barramento
+        self.nome = nome
+        self.politica = politica
+        self.cursor = cursor
+        self.ativa = True
+
+        # Estatísticas
+        self.entregues = 0
+        self.descartados = 0
+
+    @property
+    def atraso(self):
+        """Número de fixes publicados ainda não consumidos"""
+        return self._barramento.sequencia - self.cursor
+
+    def proximo(self, timeout=None):
+        """
+        Aguarda e retorna o próximo fix (bloqueante)
+
+        Args:
+            timeout: Tempo máximo de espera em segundos (None = indefinido)
+
+        Returns:
+            Próximo item publicado ou None em timeout/fechamento
+        """
+        item = self._barramento._proximo(self, timeout)
+        return None if item is _VAZIO else item
+
+    def obter_pendentes(self, maximo=None):
+        """
+        Retorna sem bloquear todos os fixes pendentes
+
+        Args:
+            maximo: Limite de itens retornados
+
+        Returns:
+            list: Itens em ordem de publicação
+        """
+        return self._barramento._drenar(self, maximo)
+
+    async def proximo_async(self):
+        """
+        Aguarda o próximo fix sem bloquear o loop asyncio
+
+        Returns:
+            Próximo item publicado ou None se o barramento for fechado
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            futuro = loop.create_future()
+            item = self._barramento._proximo_ou_registrar(self, loop, futuro)
+            if item is not _VAZIO:
+                return item
+            if not await futuro:
+                return None
+
+    def cancelar(self):
+        """Remove a assinatura do barramento"""
+        self._barramento.cancelar(self)
+
+    def obter_estatisticas(self):
+        return {
+            'politica': self.politica,
+            'atraso': self.atraso,
+            'entregues': self.entregues,
+            'descartados': self.descartados
+        }
+
+
+class BarramentoFix:
+    def __init__(self, capacidade=256, timeout_bloqueio=1.0):
+        """
+        Barramento publish/subscribe de fixes sobre um buffer circular
+
+        Cada assinante tem seu próprio cursor e consome todos os fixes no
+        seu ritmo; o publicador nunca copia itens por assinante.
+
+        Args:
+            capacidade: Número de fixes mantidos no buffer circular
+            timeout_bloqueio: Espera máxima do publicador por assinantes BLOQUEAR
+        """
+        self.capacidade = capacidade
+        self.timeout_bloqueio = timeout_bloqueio
+        self._buffer = [None] * capacidade
+        self.sequencia = 0  # Próxima posição a ser escrita
+        self._assinaturas = []
+        self._futuros = []
+        self._condicao = threading.Condition()
+        self.fechado = False
+
+        # Estatísticas
+        self.publicados = 0
+        self.esperas_publicador = 0
+
+    def assinar(self, nome, politica=DESCARTAR_ANTIGOS):
+        """
+        Cria uma assinatura que recebe os fixes publicados a partir de agora
+
+        Args:
+            nome: Identificação do consumidor (ex.: 'mapa', 'banco')
+            politica: DESCARTAR_ANTIGOS, MANTER_ULTIMO ou BLOQUEAR
+
+        Returns:
+            Assinatura
+        """
+        if politica not in POLITICAS:
+            raise ValueError(f"Política de descarte inválida: {politica}")
+        with self._condicao:
+            assinatura = Assinatura(self, nome, politica, self.sequencia)
+            self._assinaturas.append(assinatura)
+            return assinatura
+
+    def cancelar(self, assinatura):
+        with self._condicao:
+            if assinatura in self._assinaturas:
+                self._assinaturas.remove(assinatura)
+            assinatura.ativa = False
+            self._condicao.notify_all()
+
+    def publicar(self, item):
+        """
+        Publica um fix para todos os assinantes
+
+        Args:
+            item: Fix a ser publicado
+
+        Returns:
+            bool: False se precisou sobrescrever um item ainda não lido por
+                  um assinante BLOQUEAR (timeout de espera)
+        """
+        with self._condicao:
+            entregue = True
+            bloqueantes = [a for a in self._assinaturas if a.politica == BLOQUEAR]
+            if bloqueantes:
+                cheio = lambda: any(self.sequencia - a.cursor >= self.capacidade
+                                    for a in bloqueantes if a.ativa)
+                if cheio():
+                    self.esperas_publicador += 1
+                    entregue = self._condicao.wait_for(lambda: not cheio() or self.fechado,
+                                                       self.timeout_bloqueio)
+
+            self._buffer[self.sequencia % self.capacidade] = item
+            self.sequencia += 1
+            self.publicados += 1
+            self._condicao.notify_all()
+            futuros, self._futuros = self._futuros, []
+
+        for loop, futuro in futuros:
+            loop.call_soon_threadsafe(_resolver, futuro, True)
+        return entregue
+
+    def fechar(self):
+        """Fecha o barramento e acorda todos os consumidores em espera"""
+        with self._condicao:
+            self.fechado = True
+            self._condicao.notify_all()
+            futuros, self._futuros = self._futuros, []
+        for loop, futuro in futuros:
+            loop.call_soon_threadsafe(_resolver, futuro, False)
+
+    def _ajustar_cursor(self, assinatura):
+        """Aplica a política de descarte; deve ser chamado com o lock"""
+        atraso = self.sequencia - assinatura.cursor
+        if assinatura.politica == MANTER_ULTIMO:
+            if atraso > 1:
+                assinatura.descartados += atraso - 1
+                assinatura.cursor = self.sequencia - 1
+        elif atraso > self.capacidade:
+            assinatura.descartados += atraso - self.capacidade
+            assinatura.cursor = self.sequencia - self.capacidade
+
+    def _retirar(self, assinatura):
+        item = self._buffer[assinatura.cursor % self.capacidade]
+        assinatura.cursor += 1
+        assinatura.entregues += 1
+        if assinatura.politica == BLOQUEAR:
+            self._condicao.notify_all()
+        return item
+
+    def _proximo(self, assinatura, timeout):
+        with self._condicao:
+            disponivel = self._condicao.wait_for(
+                lambda: assinatura.cursor < self.sequencia or self.fechado or not assinatura.ativa,
+                timeout)
+            if not disponivel or assinatura.cursor >= self.sequencia:
+                return _VAZIO
+            self._ajustar_cursor(assinatura)
+            return self._retirar(assinatura)
+
+    def _proximo_ou_registrar(self, assinatura, loop, futuro):
+        with self._condicao:
+            if assinatura.cursor < self.sequencia:
+                self._ajustar_cursor(assinatura)
+                return self._retirar(assinatura)
+            if self.fechado or not assinatura.ativa:
+                futuro.set_result(False)
+            else:
+                self._futuros.append((loop, futuro))
+            return _VAZIO
+
+    def _drenar(self, assinatura, maximo):
+        with self._condicao:
+            self._ajustar_cursor(assinatura)
+            disponiveis = self.sequencia - assinatura.cursor
+            if maximo is not None:
+                disponiveis = min(disponiveis, maximo)
+            return [self._retirar(assinatura) for _ in range(disponiveis)]
+
+    def obter_estatisticas(self):
+        """
+        Retorna contadores do barramento e de cada assinante
+
+        Returns:
+            dict: Estatísticas gerais e por assinante (atraso, descartes)
+        """
+        with self._condicao:
+            for assinatura in self._assinaturas:
+                # Contabiliza descartes pendentes sem consumir nada
+                if assinatura.politica != MANTER_ULTIMO:
+                    self._ajustar_cursor(assinatura)
+            return {
+                'publicados': self.publicados,
+                'esperas_publicador': self.esperas_publicador,
+                'assinantes': {a.nome: a.obter_estatisticas() for a in self._assinaturas}
+            }
+
+
+def _resolver(futuro, valor):
+    if not futuro.done():
+        futuro.set_result(valor)
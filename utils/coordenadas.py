@@ -1,5 +1,6 @@
 import math
 from utils.haversine import haversine
+from utils import geodesia
 
 class SistemaCoordenadasGPS:
     def __init__(self, largura_tela=800, altura_tela=480):
@@ -47,20 +48,15 @@ class SistemaCoordenadasGPS:
         Ajusta automaticamente o zoom e centro para mostrar todos os pontos
         
         Args:
-            pontos: Lista de tuplas (latitude, longitude)
+            pontos: Tuplas (latitude, longitude) em lista, array Nx2 ou gerador
             margem_percentual: Margem extra ao redor dos pontos (0.1 = 10%)
         """
-        if not pontos:
+        # Encontrar limites dos pontos (uma passada; vetorizado com NumPy)
+        limites = geodesia.limites_pontos(pontos)
+        if limites is None:
             return
             
-        # Encontrar limites dos pontos
-        lats = [p[0] for p in pontos]
-        lons = [p[1] for p in pontos]
-        
-        self.lat_min = min(lats)
-        self.lat_max = max(lats)
-        self.lon_min = min(lons)
-        self.lon_max = max(lons)
+        self.lat_min, self.lat_max, self.lon_min, self.lon_max = limites
         
         # Calcular centro
         self.lat_centro = (self.lat_min + self.lat_max) / 2
@@ -1,42 +1,184 @@
+import json
+import os
+import threading
+import time
+
 import serial
 import serial.tools.list_ports
-import time
 
-def detectar_porta_gps(timeout=2.0):
+from utils.leitor_stream import LeitorStreamGNSS
+from utils.nmea_parser import checksum_valido
+from utils.ubx import SYNC_UBX
+
+# 115200 é o que o sistema configura; 9600 é o padrão de fábrica dos módulos u-blox
+BAUDRATES_PADRAO = (115200, 9600, 38400)
+
+# Última porta/baudrate em que o GPS respondeu
+ARQUIVO_CACHE = 'gps_porta.json'
+
+
+def _carregar_cache(arquivo_cache):
+    try:
+        with open(arquivo_cache, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        return cache['porta'], int(cache['baudrate'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _salvar_cache(arquivo_cache, porta, baudrate):
+    try:
+        with open(arquivo_cache, 'w', encoding='utf-8') as f:
+            json.dump({'porta': porta, 'baudrate': baudrate}, f)
+    except OSError:
+        pass
+
+
+def _frame_valido(sentenca):
+    """Sentença NMEA com checksum correto ou frame UBX (o leitor já verificou o checksum)"""
+    if sentenca[:2] == SYNC_UBX:
+        return 'ubx'
+    if checksum_valido(sentenca):
+        return 'nmea'
+    return None
+
+
+def _sondar(porta, baudrate, janela, encontrado):
+    """
+    Escuta uma porta em um baudrate até receber um frame válido
+
+    Returns:
+        str: 'nmea', 'ubx' ou None
+    """
+    try:
+        with serial.Serial(porta, baudrate, timeout=0.1) as ser:
+            leitor = LeitorStreamGNSS(ser)
+            limite = time.monotonic() + janela
+            while time.monotonic() < limite and not encontrado.is_set():
+                for _, sentenca in leitor.ler_disponivel():
+                    protocolo = _frame_valido(sentenca)
+                    if protocolo:
+                        return protocolo
+    except (serial.SerialException, OSError, ValueError):
+        pass
+    return None
+
+
+def listar_portas_candidatas(portas_extras=()):
+    """
+    Lista as portas seriais onde pode haver um receptor
+
+    Args:
+        portas_extras: Portas a incluir mesmo que não apareçam na enumeração
+                       (ex.: o alias /dev/serial0 do Raspberry Pi)
+
+    Returns:
+        list: Nomes das portas, sem repetição
+    """
+    portas = [porta.device for porta in serial.tools.list_ports.comports()]
+    for porta in portas_extras:
+        if porta and porta not in portas and os.path.exists(porta):
+            portas.append(porta)
+    return portas
+
+
+def detectar_gps(timeout=5.0, baudrates=BAUDRATES_PADRAO, janela_baud=1.2, usar_cache=True,
+                 arquivo_cache=ARQUIVO_CACHE, portas=None):
+    """
+    Detecta porta e baudrate do GPS
+
+    A última combinação que funcionou é testada primeiro. Se falhar, todas
+    as portas são sondadas em paralelo (uma thread por porta, percorrendo
+    os baudrates, já que a mesma tty não pode ser lida em dois baudrates ao
+    mesmo tempo). Retorna no primeiro frame NMEA/UBX válido.
+
+    Args:
+        timeout: Tempo máximo total da detecção (s)
+        baudrates: Baudrates a testar, em ordem de preferência
+        janela_baud: Tempo de escuta em cada baudrate (s); os receptores
+                     enviam ao menos uma época por segundo
+        usar_cache: Testar primeiro a última porta/baudrate encontrada
+        arquivo_cache: Arquivo JSON da última detecção
+        portas: Portas a sondar (default: enumeração do sistema)
+
+    Returns:
+        dict: {'porta', 'baudrate', 'protocolo', 'tempo_deteccao', 'cache'}
+              ou None se nenhum receptor responder
+    """
+    inicio = time.monotonic()
+    cache = _carregar_cache(arquivo_cache) if usar_cache else None
+
+    def resultado(porta, baudrate, protocolo, do_cache):
+        if not do_cache:
+            _salvar_cache(arquivo_cache, porta, baudrate)
+        return {
+            'porta': porta,
+            'baudrate': baudrate,
+            'protocolo': protocolo,
+            'tempo_deteccao': time.monotonic() - inicio,
+            'cache': do_cache
+        }
+
+    if cache:
+        protocolo = _sondar(cache[0], cache[1], janela_baud, threading.Event())
+        if protocolo:
+            return resultado(cache[0], cache[1], protocolo, True)
+
+    if portas is None:
+        portas = listar_portas_candidatas([cache[0]] if cache else ['/dev/serial0'])
+    if not portas:
+        return None
+
+    encontrado = threading.Event()
+    vencedor = []
+    trava = threading.Lock()
+
+    def sondar_porta(porta):
+        ordem = list(baudrates)
+        if cache and cache[0] == porta and cache[1] in ordem:
+            # O baudrate do cache acabou de falhar nesta porta
+            ordem.remove(cache[1])
+            ordem.append(cache[1])
+        for baudrate in ordem:
+            restante = timeout - (time.monotonic() - inicio)
+            if restante <= 0 or encontrado.is_set():
+                return
+            protocolo = _sondar(porta, baudrate, min(janela_baud, restante), encontrado)
+            if protocolo:
+                with trava:
+                    if not vencedor:
+                        vencedor.append((porta, baudrate, protocolo))
+                encontrado.set()
+                return
+
+    threads = [threading.Thread(target=sondar_porta, args=(porta,), daemon=True) for porta in portas]
+    for thread in threads:
+        thread.start()
+    encontrado.wait(max(0.0, timeout - (time.monotonic() - inicio)))
+    encontrado.set()  # Encerra as sondagens restantes
+    for thread in threads:
+        thread.join(0.5)  # Libera as portas antes de o chamador abrir a vencedora
+
+    if not vencedor:
+        return None
+    return resultado(*vencedor[0], False)
+
+
+def detectar_porta_gps(timeout=5.0, **opcoes):
     """
     Detecta a porta serial onde o GPS está conectado.
-    Tenta abrir cada porta serial disponível e verifica se recebe mensagens NMEA válidas
-    ou dados UBX (protocolo binário da u-blox).
     Retorna o nome da porta se encontrada, ou None caso contrário.
+    (ver detectar_gps para o baudrate e o tempo de detecção)
     """
-    portas = serial.tools.list_ports.comports()
-    portas_possiveis = [porta.device for porta in portas]
-
-    for porta in portas_possiveis:
-        try:
-            with serial.Serial(porta, 115200, timeout=timeout) as ser:
-                start_time = time.time()
-                while time.time() - start_time < timeout:
-                    linha = ser.readline()
-                    if not linha:
-                        continue
-                    try:
-                        linha_decoded = linha.decode('ascii', errors='ignore').strip()
-                    except Exception:
-                        linha_decoded = ''
-                    # Verifica mensagens NMEA
-                    if linha_decoded.startswith(('$GPRMC', '$GPGGA', '$GNRMC', '$GNGGA')):
-                        return porta
-                    # Verifica dados UBX (binário começa com 0xB5 0x62)
-                    if len(linha) >= 2 and linha[0] == 0xB5 and linha[1] == 0x62:
-                        return porta
-        except (serial.SerialException, OSError):
-            continue
-    return None
+    deteccao = detectar_gps(timeout, **opcoes)
+    return deteccao['porta'] if deteccao else None
+
 
 if __name__ == "__main__":
-    porta_encontrada = detectar_porta_gps()
-    if porta_encontrada:
-        print(f"GPS detectado na porta: {porta_encontrada}")
+    deteccao = detectar_gps()
+    if deteccao:
+        print(f"GPS detectado na porta: {deteccao['porta']} a {deteccao['baudrate']} baud "
+              f"({deteccao['protocolo'].upper()}, {deteccao['tempo_deteccao']:.2f} s"
+              f"{', cache' if deteccao['cache'] else ''})")
     else:
         print("GPS não detectado em nenhuma porta serial.")
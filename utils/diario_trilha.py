@@ -0,0 +1,325 @@
+import os
+import struct
+import threading
+import time
+import zlib
+
+# Diário de pontos (write-ahead) à frente do SQLite
+#
+# Arquivo: cabeçalho MAGICO seguido de registros de tamanho fixo
+#   seq (U8) | sessao_id (U4, 0 = sessão atual na aplicação) | ts (I8, epoch-ms) | latitude, longitude, hectares (double)
+#   | velocidade, rumo, hdop (float, NaN = ausente) | qualidade (I1, -1 = ausente) | 3 bytes
+#   | CRC32 dos 60 bytes anteriores (U4)
+#
+# Cada ponto custa um write() de 64 bytes; o fsync acontece no máximo a cada
+# intervalo_fsync segundos. Uma queda de energia perde só o que não passou
+# pelo fsync, e o registro cortado no meio é descartado pelo CRC na abertura.
+# O CheckpointerDiario leva os registros para o SQLite em transações grandes
+# e grava a última seq aplicada na mesma transação (aplicação exatamente uma
+# vez, inclusive na recuperação).
+
+MAGICO = b'DIARIO01'
+_REGISTRO = struct.Struct('<QIqdddfffb3x')
+_CRC = struct.Struct('<I')
+TAMANHO_REGISTRO = _REGISTRO.size + _CRC.size
+_NAN = float('nan')
+
+# Registros lidos por pread na recuperação e no checkpoint
+_REGISTROS_POR_LEITURA = 1024
+
+
+def _empacotar(seq, linha):
+    sessao_id, ts, lat, lon, hectares, velocidade, rumo, hdop, qualidade = linha
+    corpo = _REGISTRO.pack(seq, sessao_id or 0, ts, lat, lon, hectares or 0.0,
+                           _NAN if velocidade is None else velocidade,
+                           _NAN if rumo is None else rumo,
+                           _NAN if hdop is None else hdop,
+                           -1 if qualidade is None else qualidade)
+    return corpo + _CRC.pack(zlib.crc32(corpo))
+
+
+def _desempacotar(registro):
+    """(seq, linha na ordem de db.SQL_INSERIR_PONTO), ou None se o CRC não confere"""
+    corpo = registro[:_REGISTRO.size]
+    if _CRC.unpack_from(registro, _REGISTRO.size)[0] != zlib.crc32(corpo):
+        return None
+    seq, sessao_id, ts, lat, lon, hectares, velocidade, rumo, hdop, qualidade = _REGISTRO.unpack(corpo)
+    return seq, (sessao_id or None, ts, lat, lon, hectares,
+                 None if velocidade != velocidade else velocidade,
+                 None if rumo != rumo else rumo,
+                 None if hdop != hdop else hdop,
+                 None if qualidade < 0 else qualidade)
+
+
+class DiarioTrilha:
+    def __init__(self, caminho='pulverizacao.diario', intervalo_fsync=1.0):
+        """
+        Arquivo de registros de tamanho fixo, só de acréscimo
+
+        Na abertura valida os registros existentes e corta o arquivo no
+        primeiro registro incompleto ou com CRC errado (cauda de uma queda).
+
+        Args:
+            caminho: Arquivo do diário
+            intervalo_fsync: Segundos entre fsyncs (0 = fsync a cada ponto)
+        """
+        self.caminho = caminho
+        self.intervalo_fsync = intervalo_fsync
+        self._trava = threading.Lock()
+        self._fd = os.open(caminho, os.O_RDWR | os.O_CREAT, 0o644)
+        self._ultimo_fsync = time.monotonic()
+        self._sujo = False
+
+        # Estatísticas
+        self.registros_gravados = 0
+        self.bytes_gravados = 0
+        self.fsyncs = 0
+        self.bytes_descartados = 0
+
+        tamanho = os.fstat(self._fd).st_size
+        if tamanho < len(MAGICO):
+            os.ftruncate(self._fd, 0)
+            os.pwrite(self._fd, MAGICO, 0)
+            os.fsync(self._fd)
+            tamanho = len(MAGICO)
+        elif os.pread(self._fd, len(MAGICO), 0) != MAGICO:
+            os.close(self._fd)
+            raise ValueError(f"{caminho} não é um diário de pontos")
+
+        # Recuperação: tudo depois do último registro válido é descartado
+        self.proxima_seq = 1
+        self._fim = len(MAGICO)
+        for seq, _, fim in self.ler(len(MAGICO), tamanho):
+            self.proxima_seq = seq + 1
+            self._fim = fim
+        if self._fim < tamanho:
+            self.bytes_descartados = tamanho - self._fim
+            os.ftruncate(self._fd, self._fim)
+            os.fsync(self._fd)
+
+    @property
+    def fim(self):
+        """Offset logo após o último registro gravado"""
+        return self._fim
+
+    def acrescentar(self, linha):
+        """
+        Grava um ponto no diário
+
+        Args:
+            linha: Tupla na ordem de db.SQL_INSERIR_PONTO
+
+        Returns:
+            int: seq do registro
+        """
+        with self._trava:
+            seq = self.proxima_seq
+            os.pwrite(self._fd, _empacotar(seq, linha), self._fim)
+            self.proxima_seq += 1
+            self._fim += TAMANHO_REGISTRO
+            self.registros_gravados += 1
+            self.bytes_gravados += TAMANHO_REGISTRO
+            self._sujo = True
+            if time.monotonic() - self._ultimo_fsync >= self.intervalo_fsync:
+                self._fsync()
+            return seq
+
+    def _fsync(self):
+        os.fsync(self._fd)
+        self.fsyncs += 1
+        self._ultimo_fsync = time.monotonic()
+        self._sujo = False
+
+    def sincronizar_disco(self, forcar=False):
+        """fsync pendente se o intervalo já passou (ou sempre, com forcar); chamado periodicamente"""
+        with self._trava:
+            if self._sujo and (forcar or time.monotonic() - self._ultimo_fsync >= self.intervalo_fsync):
+                self._fsync()
+
+    def ler(self, inicio, fim=None):
+        """
+        Lê registros válidos a partir de um offset, parando no primeiro inválido
+
+        Yields:
+            tuple: (seq, linha, offset logo após o registro)
+        """
+        if fim is None:
+            fim = self._fim
+        offset = inicio
+        while offset + TAMANHO_REGISTRO <= fim:
+            quantidade = min(_REGISTROS_POR_LEITURA, (fim - offset) // TAMANHO_REGISTRO)
+            dados = os.pread(self._fd, quantidade * TAMANHO_REGISTRO, offset)
+            for i in range(0, len(dados) - TAMANHO_REGISTRO + 1, TAMANHO_REGISTRO):
+                registro = _desempacotar(dados[i:i + TAMANHO_REGISTRO])
+                if registro is None:
+                    return
+                offset += TAMANHO_REGISTRO
+                yield registro[0], registro[1], offset
+            if len(dados) < quantidade * TAMANHO_REGISTRO:
+                return
+
+    def truncar(self):
+        """Apaga todos os registros (chamar com a trava e tudo aplicado e durável no banco)"""
+        os.ftruncate(self._fd, len(MAGICO))
+        os.fsync(self._fd)
+        self._fim = len(MAGICO)
+        self._sujo = False
+
+    def fechar(self):
+        with self._trava:
+            if self._fd is None:
+                return
+            if self._sujo:
+                self._fsync()
+            os.close(self._fd)
+            self._fd = None
+
+    def obter_estatisticas(self):
+        return {
+            'registros_gravados': self.registros_gravados,
+            'bytes_gravados': self.bytes_gravados,
+            'fsyncs': self.fsyncs,
+            'tamanho': self._fim,
+            'bytes_descartados': self.bytes_descartados
+        }
+
+
+class CheckpointerDiario:
+    def __init__(self, diario, conexao, intervalo=5.0, linhas_por_transacao=5000,
+                 tamanho_max_diario=4 * 1024 * 1024):
+        """
+        Leva os registros do diário para o SQLite em transações grandes
+
+        A criação já aplica o que o diário tiver além da última seq
+        gravada no banco (recuperação após queda). Quando o diário passa de
+        tamanho_max_diario e está todo aplicado, um checkpoint FULL do WAL
+        torna o banco durável e o diário é zerado.
+
+        Args:
+            diario: DiarioTrilha
+            conexao: db.ConexaoBanco (esquema com a tabela diario_estado)
+            intervalo: Segundos entre checkpoints
+            linhas_por_transacao: Linhas por transação no SQLite
+            tamanho_max_diario: Bytes do diário antes de zerá-lo
+        """
+        self.diario = diario
+        self.conexao = conexao
+        self.intervalo = intervalo
+        self.linhas_por_transacao = linhas_por_transacao
+        self.tamanho_max_diario = tamanho_max_diario
+
+        self._trava = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+        self._offset = len(MAGICO)
+        self.ultima_seq = conexao.consultar('SELECT ultima_seq FROM diario_estado WHERE id = 1',
+                                            pendentes=True)[0][0]
+        self.diario.proxima_seq = max(self.diario.proxima_seq, self.ultima_seq + 1)
+
+        # Estatísticas
+        self.checkpoints = 0
+        self.linhas_aplicadas = 0
+        self.rotacoes = 0
+        self.ultimo_erro = None
+
+        inicio = time.perf_counter()
+        self.recuperados = self.aplicar()
+        self.tempo_recuperacao = time.perf_counter() - inicio
+
+    def iniciar(self):
+        if self._thread is None:
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._laco, name='checkpoint-diario', daemon=True)
+            self._thread.start()
+
+    def parar(self):
+        """Para a thread e aplica o que faltar"""
+        if self._thread is not None:
+            self._parar.set()
+            self._thread.join()
+            self._thread = None
+        self.diario.sincronizar_disco(forcar=True)
+        self.aplicar()
+
+    def _laco(self):
+        passo = min(self.intervalo, self.diario.intervalo_fsync or self.intervalo)
+        proximo = time.monotonic() + self.intervalo
+        while not self._parar.wait(passo):
+            try:
+                # O fsync por intervalo também vale quando os pontos param de chegar
+                self.diario.sincronizar_disco()
+                pendentes = (self.diario.fim - self._offset) // TAMANHO_REGISTRO
+                if time.monotonic() >= proximo or pendentes >= self.linhas_por_transacao:
+                    self.aplicar()
+                    proximo = time.monotonic() + self.intervalo
+                if self.diario.fim >= self.tamanho_max_diario:
+                    self._rotacionar()
+            except Exception as e:
+                self.ultimo_erro = f"Erro no checkpoint do diário: {str(e)}"
+
+    def aplicar(self):
+        """
+        Grava no SQLite os registros ainda não aplicados
+
+        Returns:
+            int: Linhas aplicadas
+        """
+        with self._trava:
+            aplicadas = 0
+            lote = []
+            ultima = self.ultima_seq
+            offset = self._offset
+            for seq, linha, fim in self.diario.ler(self._offset):
+                offset = fim
+                if seq <= self.ultima_seq:
+                    continue  # Já aplicado antes de uma queda
+                lote.append(linha)
+                ultima = seq
+                if len(lote) >= self.linhas_por_transacao:
+                    aplicadas += self._gravar(lote, ultima)
+                    lote = []
+            if lote:
+                aplicadas += self._gravar(lote, ultima)
+            self._offset = offset
+            return aplicadas
+
+    def _gravar(self, lote, ultima_seq):
+        # Pontos e última seq aplicada na mesma transação
+        with self.conexao._trava:
+            self.conexao.executar('UPDATE diario_estado SET ultima_seq = ? WHERE id = 1', (ultima_seq,),
+                                  confirmar=False)
+            self.conexao.inserir_lote(lote)
+        self.ultima_seq = ultima_seq
+        self.checkpoints += 1
+        self.linhas_aplicadas += len(lote)
+        return len(lote)
+
+    def _rotacionar(self):
+        # Os produtores esperam só enquanto a cauda é aplicada e o WAL vai para o banco
+        with self.diario._trava:
+            self.aplicar()
+            ocupado, paginas_wal, copiadas = self.conexao.consultar(
+                'PRAGMA wal_checkpoint(FULL)', pendentes=True)[0]
+            if ocupado or paginas_wal != copiadas:
+                return False  # Leitor segurando o WAL: tenta no próximo ciclo
+            self.diario.truncar()
+            self._offset = len(MAGICO)
+            self.rotacoes += 1
+            return True
+
+    def sincronizar(self):
+        """Barreira: aplica agora tudo o que já está no diário"""
+        return self.aplicar()
+
+    def obter_estatisticas(self):
+        return {
+            'ultima_seq': self.ultima_seq,
+            'checkpoints': self.checkpoints,
+            'linhas_aplicadas': self.linhas_aplicadas,
+            'rotacoes': self.rotacoes,
+            'recuperados': self.recuperados,
+            'tempo_recuperacao': self.tempo_recuperacao,
+            'pendentes': (self.diario.fim - self._offset) // TAMANHO_REGISTRO,
+            'ultimo_erro': self.ultimo_erro,
+            **self.diario.obter_estatisticas()
+        }
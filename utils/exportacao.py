@@ -1,224 +1,165 @@
 import csv
 import sqlite3
-from datetime import datetime
+from collections import deque
+from datetime import datetime, timedelta
+from itertools import chain, islice
 import os
-from utils.haversine import haversine
+from utils import geodesia
+import db
 
-class ExportadorDados:
-    def __init__(self, db_path='pulverizacao.db'):
-        self.db_path = db_path
-        
-    def exportar_csv(self, nome_arquivo=None):
-        """
-        Exporta dados da sessão atual para CSV
-        
-        Args:
-            nome_arquivo: Nome do arquivo (default: auto-gerado)
-            
-        Returns:
-            str: Caminho do arquivo gerado
-        """
-        if not nome_arquivo:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            nome_arquivo = f"pulverizacao_{timestamp}.csv"
-            
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Buscar todos os pontos
-            cursor.execute("""
-                SELECT timestamp, latitude, longitude, hectares 
-                FROM pontos 
-                ORDER BY timestamp
-            """)
-            
-            pontos = cursor.fetchall()
-            conn.close()
-            
-            if not pontos:
-                raise ValueError("Nenhum dado encontrado para exportar")
-            
-            # Criar arquivo CSV
-            with open(nome_arquivo, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                
-                # Cabeçalho
-                writer.writerow(['Timestamp', 'Latitude', 'Longitude', 'Hectares', 'Distancia_m', 'Velocidade_kmh'])
-                
-                # Dados
-                for i, (timestamp, lat, lon, hectares) in enumerate(pontos):
-                    if i == 0:
-                        distancia = 0
-                        velocidade = 0
-                    else:
-                        # Calcular distância e velocidade
-                        ponto_anterior = pontos[i-1]
-                        distancia = haversine(ponto_anterior[1], ponto_anterior[2], lat, lon)
-                        
-                        # Calcular velocidade baseada no tempo
-                        tempo_atual = datetime.fromisoformat(timestamp)
-                        tempo_anterior = datetime.fromisoformat(ponto_anterior[0])
-                        delta_tempo = (tempo_atual - tempo_anterior).total_seconds()
-                        
-                        if delta_tempo > 0:
-                            velocidade = (distancia / delta_tempo) * 3.6  # km/h
-                        else:
-                            velocidade = 0
-                    
-                    writer.writerow([timestamp, lat, lon, hectares, round(distancia, 2), round(velocidade, 1)])
-            
-            return nome_arquivo
-            
-        except Exception as e:
-            raise Exception(f"Erro ao exportar CSV: {str(e)}")
-    
-    def gerar_relatorio_resumo(self, nome_arquivo=None):
+# Colunas lidas pelas exportações, na ordem das tuplas
+COLUNAS_EXPORTACAO = ('ts', 'latitude', 'longitude', 'hectares')
+
+# Velocidades implícitas acima disso são saltos do GPS e ficam fora das estatísticas
+VELOCIDADE_ESTATISTICA_MAX_KMH = 50
+
+# Pontos do relatório detalhado
+PONTOS_HISTORICO = 20
+
+# Páginas copiadas por passo do backup (uma chamada de progresso por passo)
+PAGINAS_POR_PASSO_BACKUP = 1024
+
+
+class BlocoPontos:
+    """
+    Bloco de pontos consecutivos em colunas, com distância e velocidade já calculadas
+
+    Cada par de pontos passa pelo haversine uma única vez; todas as saídas
+    recebem o mesmo bloco. O primeiro ponto do bloco é ligado ao último do
+    bloco anterior (o primeiro da exportação tem distância e velocidade 0).
+    As colunas derivadas vêm de utils.geodesia: ndarray com NumPy, listas
+    sem ele (use geodesia.para_lista para valores Python).
+    """
+    __slots__ = ('linhas', 'ts', 'latitude', 'longitude', 'hectares',
+                 'intervalos_ms', 'distancias', 'velocidades')
+
+    def __init__(self, linhas, anterior=None):
+        self.linhas = linhas
+        self.ts, self.latitude, self.longitude, self.hectares = zip(*linhas)
+        primeiro = anterior is None
+        if primeiro:
+            anterior = linhas[0]
+        ts_ant = (anterior[0],) + self.ts[:-1]
+        lat_ant = (anterior[1],) + self.latitude[:-1]
+        lon_ant = (anterior[2],) + self.longitude[:-1]
+        self.intervalos_ms = geodesia.diferencas(ts_ant, self.ts)
+        self.distancias = geodesia.haversine_pares(lat_ant, lon_ant, self.latitude, self.longitude)
+        if primeiro:
+            self.distancias[0] = 0
+        self.velocidades = geodesia.velocidades_kmh(self.distancias, self.intervalos_ms, 1000)
+
+    def __len__(self):
+        return len(self.linhas)
+
+
+class SaidaExportacao:
+    """
+    Destino de uma exportação (CSV, relatório, ...)
+
+    O motor chama iniciar() antes do primeiro bloco, nova_sessao(sessao)
+    quando a leitura passa a uma sessão (um bloco nunca mistura sessões),
+    receber(bloco) a cada BlocoPontos, finalizar(estatisticas) ao fim da
+    leitura e fechar() sempre, mesmo depois de um erro. Uma saída nova só
+    precisa sobrescrever o que usa.
+    """
+
+    def iniciar(self):
+        pass
+
+    def nova_sessao(self, sessao):
+        """sessao: dict como os de db.obter_sessoes()"""
+        pass
+
+    def receber(self, bloco):
+        pass
+
+    def finalizar(self, estatisticas):
+        pass
+
+    def fechar(self):
+        pass
+
+
+class EstatisticasIncrementais(SaidaExportacao):
+    """Estatísticas da exportação acumuladas bloco a bloco (memória constante)"""
+
+    def __init__(self, historico=None):
         """
-        Gera relatório resumido da sessão
-        
         Args:
-            nome_arquivo: Nome do arquivo (default: auto-gerado)
-            
-        Returns:
-            str: Caminho do arquivo gerado
+            historico: deque(maxlen=n) preenchida com os últimos pontos, se informada
         """
-        if not nome_arquivo:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            nome_arquivo = f"relatorio_{timestamp}.txt"
-            
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Buscar todos os pontos
-            cursor.execute("""
-                SELECT timestamp, latitude, longitude, hectares 
-                FROM pontos 
-                ORDER BY timestamp
-            """)
-            
-            pontos = cursor.fetchall()
-            conn.close()
-            
-            if not pontos:
-                raise ValueError("Nenhum dado encontrado para o relatório")
-            
-            # Calcular estatísticas
-            estatisticas = self._calcular_estatisticas(pontos)
-            
-            # Gerar relatório
-            with open(nome_arquivo, 'w', encoding='utf-8') as arquivo:
-                arquivo.write("=" * 50 + "\n")
-                arquivo.write("RELATÓRIO DE PULVERIZAÇÃO\n")
-                arquivo.write("=" * 50 + "\n\n")
-                
-                arquivo.write(f"Data/Hora: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n")
-                arquivo.write(f"Arquivo de dados: {self.db_path}\n\n")
-                
-                arquivo.write("RESUMO DA SESSÃO\n")
-                arquivo.write("-" * 20 + "\n")
-                arquivo.write(f"Pontos coletados: {estatisticas['total_pontos']}\n")
-                arquivo.write(f"Área total pulverizada: {estatisticas['area_total']:.2f} hectares\n")
-                arquivo.write(f"Distância percorrida: {estatisticas['distancia_total']:.2f} metros\n")
-                arquivo.write(f"Tempo total: {estatisticas['tempo_total']}\n")
-                arquivo.write(f"Velocidade média: {estatisticas['velocidade_media']:.1f} km/h\n")
-                arquivo.write(f"Velocidade máxima: {estatisticas['velocidade_maxima']:.1f} km/h\n\n")
-                
-                arquivo.write("COORDENADAS EXTREMAS\n")
-                arquivo.write("-" * 20 + "\n")
-                arquivo.write(f"Latitude mínima: {estatisticas['lat_min']:.6f}\n")
-                arquivo.write(f"Latitude máxima: {estatisticas['lat_max']:.6f}\n")
-                arquivo.write(f"Longitude mínima: {estatisticas['lon_min']:.6f}\n")
-                arquivo.write(f"Longitude máxima: {estatisticas['lon_max']:.6f}\n\n")
-                
-                arquivo.write("EFICIÊNCIA\n")
-                arquivo.write("-" * 20 + "\n")
-                arquivo.write(f"Hectares por hora: {estatisticas['hectares_por_hora']:.2f}\n")
-                arquivo.write(f"Metros por hectare: {estatisticas['metros_por_hectare']:.2f}\n\n")
-                
-                # Histórico detalhado (últimos 20 pontos)
-                arquivo.write("HISTÓRICO DETALHADO (últimos 20 pontos)\n")
-                arquivo.write("-" * 40 + "\n")
-                arquivo.write(f"{'Timestamp':<20} {'Latitude':<12} {'Longitude':<12} {'Hectares':<10}\n")
-                arquivo.write("-" * 60 + "\n")
-                
-                for timestamp, lat, lon, hectares in pontos[-20:]:
-                    dt = datetime.fromisoformat(timestamp)
-                    arquivo.write(f"{dt.strftime('%H:%M:%S'):<20} {lat:<12.6f} {lon:<12.6f} {hectares:<10.4f}\n")
-                
-            return nome_arquivo
-            
-        except Exception as e:
-            raise Exception(f"Erro ao gerar relatório: {str(e)}")
-    
-    def _calcular_estatisticas(self, pontos):
-        """Calcula estatísticas dos pontos"""
-        if not pontos:
+        self.historico = historico
+        self.total_pontos = 0
+        self.area_total = 0
+        self.lat_min = self.lat_max = self.lon_min = self.lon_max = None
+        self.distancia_total = 0
+        self.soma_velocidades = 0
+        self.quantidade_velocidades = 0
+        self.velocidade_maxima = 0
+        self.ts_inicio = self.ts_fim = None
+
+    def receber(self, bloco):
+        if self.ts_inicio is None:
+            self.ts_inicio = bloco.ts[0]
+            self.lat_min = self.lat_max = bloco.latitude[0]
+            self.lon_min = self.lon_max = bloco.longitude[0]
+        self.ts_fim = bloco.ts[-1]
+        self.total_pontos += len(bloco)
+        self.area_total += sum(bloco.hectares)
+        lat_min, lat_max, lon_min, lon_max = geodesia.limites(bloco.latitude, bloco.longitude)
+        self.lat_min = min(self.lat_min, lat_min)
+        self.lat_max = max(self.lat_max, lat_max)
+        self.lon_min = min(self.lon_min, lon_min)
+        self.lon_max = max(self.lon_max, lon_max)
+        self.distancia_total += geodesia.somar(bloco.distancias)
+
+        soma, quantidade, maxima = geodesia.resumo_velocidades(
+            bloco.velocidades, bloco.intervalos_ms, VELOCIDADE_ESTATISTICA_MAX_KMH)
+        self.soma_velocidades += soma
+        self.quantidade_velocidades += quantidade
+        self.velocidade_maxima = max(self.velocidade_maxima, maxima)
+
+        if self.historico is not None:
+            self.historico.extend(bloco.linhas[-self.historico.maxlen:])
+
+    def resultado(self):
+        """Dicionário de estatísticas ({} se nenhum ponto foi recebido)"""
+        if not self.total_pontos:
             return {}
-            
-        lats = [p[1] for p in pontos]
-        lons = [p[2] for p in pontos]
-        hectares = [p[3] for p in pontos]
-        
+
         # Estatísticas básicas
         estatisticas = {
-            'total_pontos': len(pontos),
-            'area_total': sum(hectares),
-            'lat_min': min(lats),
-            'lat_max': max(lats),
-            'lon_min': min(lons),
-            'lon_max': max(lons)
+            'total_pontos': self.total_pontos,
+            'area_total': self.area_total,
+            'lat_min': self.lat_min,
+            'lat_max': self.lat_max,
+            'lon_min': self.lon_min,
+            'lon_max': self.lon_max,
+            'distancia_total': self.distancia_total
         }
-        
-        # Calcular distância total e velocidades
-        distancia_total = 0
-        velocidades = []
-        
-        for i in range(1, len(pontos)):
-            p1 = pontos[i-1]
-            p2 = pontos[i]
-            
-            # Distância
-            dist = haversine(p1[1], p1[2], p2[1], p2[2])
-            distancia_total += dist
-            
-            # Velocidade
-            tempo1 = datetime.fromisoformat(p1[0])
-            tempo2 = datetime.fromisoformat(p2[0])
-            delta_tempo = (tempo2 - tempo1).total_seconds()
-            
-            if delta_tempo > 0:
-                velocidade = (dist / delta_tempo) * 3.6
-                if velocidade < 50:  # Filtrar velocidades absurdas
-                    velocidades.append(velocidade)
-        
-        estatisticas['distancia_total'] = distancia_total
-        
+
         # Tempo total
-        if len(pontos) > 1:
-            inicio = datetime.fromisoformat(pontos[0][0])
-            fim = datetime.fromisoformat(pontos[-1][0])
-            tempo_total = fim - inicio
+        if self.total_pontos > 1:
+            tempo_total = timedelta(milliseconds=self.ts_fim - self.ts_inicio)
             estatisticas['tempo_total'] = str(tempo_total).split('.')[0]  # Remover microssegundos
-            
+
             # Velocidades
-            if velocidades:
-                estatisticas['velocidade_media'] = sum(velocidades) / len(velocidades)
-                estatisticas['velocidade_maxima'] = max(velocidades)
+            if self.quantidade_velocidades:
+                estatisticas['velocidade_media'] = self.soma_velocidades / self.quantidade_velocidades
+                estatisticas['velocidade_maxima'] = self.velocidade_maxima
             else:
                 estatisticas['velocidade_media'] = 0
                 estatisticas['velocidade_maxima'] = 0
-                
+
             # Eficiência
             horas_totais = tempo_total.total_seconds() / 3600
             if horas_totais > 0:
-                estatisticas['hectares_por_hora'] = estatisticas['area_total'] / horas_totais
+                estatisticas['hectares_por_hora'] = self.area_total / horas_totais
             else:
                 estatisticas['hectares_por_hora'] = 0
-                
-            if estatisticas['area_total'] > 0:
-                estatisticas['metros_por_hectare'] = distancia_total / estatisticas['area_total']
+
+            if self.area_total > 0:
+                estatisticas['metros_por_hectare'] = self.distancia_total / self.area_total
             else:
                 estatisticas['metros_por_hectare'] = 0
         else:
@@ -227,30 +168,400 @@ class ExportadorDados:
             estatisticas['velocidade_maxima'] = 0
             estatisticas['hectares_por_hora'] = 0
             estatisticas['metros_por_hectare'] = 0
-        
+
         return estatisticas
-    
+
+
+class SaidaCSV(SaidaExportacao):
+    """Uma linha por ponto, com distância e velocidade desde o ponto anterior"""
+
+    CABECALHO = ['Timestamp', 'Latitude', 'Longitude', 'Hectares', 'Distancia_m', 'Velocidade_kmh']
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._arquivo = None
+        self._writer = None
+
+    def iniciar(self):
+        self._arquivo = open(self.caminho, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._arquivo)
+        self._writer.writerow(self.CABECALHO)
+
+    def receber(self, bloco):
+        # Datas do bloco a partir do primeiro ponto: um fromtimestamp por bloco
+        base_ts = bloco.ts[0]
+        base = db.ts_para_datetime(base_ts)
+        datas = [(base + timedelta(milliseconds=ts - base_ts)).isoformat() for ts in bloco.ts]
+        self._writer.writerows(zip(datas, bloco.latitude, bloco.longitude, bloco.hectares,
+                                   [round(d, 2) for d in geodesia.para_lista(bloco.distancias)],
+                                   [round(v, 1) for v in geodesia.para_lista(bloco.velocidades)]))
+
+    def fechar(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+
+class SaidaRelatorio(SaidaExportacao):
+    """Relatório em texto: resumo, extremos, eficiência e os últimos pontos"""
+
+    def __init__(self, caminho, db_path):
+        self.caminho = caminho
+        self.db_path = db_path
+        self.ultimos = deque(maxlen=PONTOS_HISTORICO)
+
+    def receber(self, bloco):
+        self.ultimos.extend(bloco.linhas[-PONTOS_HISTORICO:])
+
+    def finalizar(self, estatisticas):
+        with open(self.caminho, 'w', encoding='utf-8') as arquivo:
+            arquivo.write("=" * 50 + "\n")
+            arquivo.write("RELATÓRIO DE PULVERIZAÇÃO\n")
+            arquivo.write("=" * 50 + "\n\n")
+
+            arquivo.write(f"Data/Hora: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n")
+            arquivo.write(f"Arquivo de dados: {self.db_path}\n\n")
+
+            arquivo.write("RESUMO DA SESSÃO\n")
+            arquivo.write("-" * 20 + "\n")
+            arquivo.write(f"Pontos coletados: {estatisticas['total_pontos']}\n")
+            arquivo.write(f"Área total pulverizada: {estatisticas['area_total']:.2f} hectares\n")
+            arquivo.write(f"Distância percorrida: {estatisticas['distancia_total']:.2f} metros\n")
+            arquivo.write(f"Tempo total: {estatisticas['tempo_total']}\n")
+            arquivo.write(f"Velocidade média: {estatisticas['velocidade_media']:.1f} km/h\n")
+            arquivo.write(f"Velocidade máxima: {estatisticas['velocidade_maxima']:.1f} km/h\n\n")
+
+            arquivo.write("COORDENADAS EXTREMAS\n")
+            arquivo.write("-" * 20 + "\n")
+            arquivo.write(f"Latitude mínima: {estatisticas['lat_min']:.6f}\n")
+            arquivo.write(f"Latitude máxima: {estatisticas['lat_max']:.6f}\n")
+            arquivo.write(f"Longitude mínima: {estatisticas['lon_min']:.6f}\n")
+            arquivo.write(f"Longitude máxima: {estatisticas['lon_max']:.6f}\n\n")
+
+            arquivo.write("EFICIÊNCIA\n")
+            arquivo.write("-" * 20 + "\n")
+            arquivo.write(f"Hectares por hora: {estatisticas['hectares_por_hora']:.2f}\n")
+            arquivo.write(f"Metros por hectare: {estatisticas['metros_por_hectare']:.2f}\n\n")
+
+            # Histórico detalhado (últimos 20 pontos)
+            arquivo.write(f"HISTÓRICO DETALHADO (últimos {PONTOS_HISTORICO} pontos)\n")
+            arquivo.write("-" * 40 + "\n")
+            arquivo.write(f"{'Timestamp':<20} {'Latitude':<12} {'Longitude':<12} {'Hectares':<10}\n")
+            arquivo.write("-" * 60 + "\n")
+
+            for ts, lat, lon, hectares in self.ultimos:
+                dt = db.ts_para_datetime(ts)
+                arquivo.write(f"{dt.strftime('%H:%M:%S'):<20} {lat:<12.6f} {lon:<12.6f} {hectares:<10.4f}\n")
+
+
+class SaidaProgresso(SaidaExportacao):
+    """Chama progresso(pontos processados, total) a cada bloco"""
+
+    def __init__(self, total, progresso):
+        self.total = total
+        self.progresso = progresso
+        self.processados = 0
+
+    def receber(self, bloco):
+        self.processados += len(bloco)
+        self.progresso(self.processados, self.total)
+
+
+def processar_pontos(pontos, saidas, tamanho_bloco=db.TAMANHO_PAGINA_PADRAO, historico=None):
+    """
+    Passa os pontos uma única vez por todas as saídas
+
+    Args:
+        pontos: Iterável de (ts, lat, lon, hectares) em ordem (aceita um gerador)
+        saidas: SaidaExportacao que recebem os mesmos blocos
+        tamanho_bloco: Pontos por bloco (a memória não passa disso)
+        historico: deque(maxlen=n) preenchida com os últimos pontos, se informada
+
+    Returns:
+        dict: Estatísticas da passada (as mesmas entregues a finalizar())
+    """
+    return processar_sessoes(((None, pontos),), saidas, tamanho_bloco, historico)
+
+
+def processar_sessoes(sessoes, saidas, tamanho_bloco=db.TAMANHO_PAGINA_PADRAO, historico=None):
+    """
+    Como processar_pontos, com os pontos separados por sessão
+
+    Distância e velocidade continuam ligando o último ponto de uma sessão ao
+    primeiro da seguinte, como na leitura da tabela inteira.
+
+    Args:
+        sessoes: Iterável de (sessao, pontos); sessao None não gera nova_sessao()
+    """
+    estatisticas = EstatisticasIncrementais(historico)
+    saidas = list(saidas)
+    try:
+        for saida in saidas:
+            saida.iniciar()
+        anterior = None
+        for sessao, pontos in sessoes:
+            if sessao is not None:
+                for saida in saidas:
+                    saida.nova_sessao(sessao)
+            pontos = iter(pontos)
+            while True:
+                linhas = list(islice(pontos, tamanho_bloco))
+                if not linhas:
+                    break
+                bloco = BlocoPontos(linhas, anterior)
+                anterior = linhas[-1]
+                estatisticas.receber(bloco)
+                for saida in saidas:
+                    saida.receber(bloco)
+        resultado = estatisticas.resultado()
+        if resultado:
+            for saida in saidas:
+                saida.finalizar(resultado)
+        return resultado
+    finally:
+        for saida in saidas:
+            saida.fechar()
+
+
+def _nome_padrao(prefixo, extensao=None):
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{prefixo}_{timestamp}.{extensao}" if extensao else f"{prefixo}_{timestamp}"
+
+
+class ExportadorDados:
+    def __init__(self, db_path='pulverizacao.db', tamanho_pagina=db.TAMANHO_PAGINA_PADRAO):
+        self.db_path = db_path
+        # As leituras abaixo usam conexões sqlite3 próprias: o esquema precisa estar atual
+        db.migrar(db_path)
+        # Linhas por consulta: a memória das exportações não cresce com a sessão
+        self.tamanho_pagina = tamanho_pagina
+
+    def _iterar_sessoes(self, conn, sessao_id=None):
+        """(sessao, pontos paginados) das sessões com pontos; None se não houver nenhum"""
+        sessoes = [sessao for sessao in db.obter_sessoes(conn)
+                   if sessao_id is None or sessao['id'] == sessao_id]
+
+        def pares():
+            for sessao in sessoes:
+                pontos = db.iterar_pontos(COLUNAS_EXPORTACAO, sessao_id=sessao['id'], conexao=conn,
+                                          tamanho_pagina=self.tamanho_pagina)
+                primeiro = next(pontos, None)
+                if primeiro is not None:
+                    yield sessao, chain((primeiro,), pontos)
+
+        pares = pares()
+        primeiro = next(pares, None)
+        if primeiro is None:
+            return None
+        return chain((primeiro,), pares)
+
+    def exportar(self, saidas, sessao_id=None, progresso=None):
+        """
+        Lê os pontos uma vez e alimenta todas as saídas na mesma passada
+
+        Args:
+            saidas: Lista de SaidaExportacao (SaidaCSV, SaidaRelatorio, ...)
+            sessao_id: Exporta só essa sessão (default: todas)
+            progresso: Chamado com (pontos processados, total) a cada bloco;
+                       uma exceção levantada nele interrompe a exportação
+
+        Returns:
+            dict: Estatísticas calculadas na passada
+        """
+        db.sincronizar()  # Linhas do commit em grupo ainda pendentes
+        conn = sqlite3.connect(self.db_path)
+        try:
+            sessoes = self._iterar_sessoes(conn, sessao_id)
+            if sessoes is None:
+                raise ValueError("Nenhum dado encontrado para exportar")
+            if progresso is not None:
+                saidas = [*saidas, SaidaProgresso(db.contar_pontos(sessao_id, conn), progresso)]
+            return processar_sessoes(sessoes, saidas, self.tamanho_pagina)
+        finally:
+            conn.close()
+
+    def exportar_csv(self, nome_arquivo=None, progresso=None):
+        """
+        Exporta dados da sessão atual para CSV
+
+        Args:
+            nome_arquivo: Nome do arquivo (default: auto-gerado)
+            progresso: Ver exportar()
+
+        Returns:
+            str: Caminho do arquivo gerado
+        """
+        if not nome_arquivo:
+            nome_arquivo = _nome_padrao("pulverizacao", "csv")
+
+        try:
+            self.exportar([SaidaCSV(nome_arquivo)], progresso=progresso)
+            return nome_arquivo
+        except Exception as e:
+            raise Exception(f"Erro ao exportar CSV: {str(e)}")
+
+    def gerar_relatorio_resumo(self, nome_arquivo=None, progresso=None):
+        """
+        Gera relatório resumido da sessão
+
+        Args:
+            nome_arquivo: Nome do arquivo (default: auto-gerado)
+            progresso: Ver exportar()
+
+        Returns:
+            str: Caminho do arquivo gerado
+        """
+        if not nome_arquivo:
+            nome_arquivo = _nome_padrao("relatorio", "txt")
+
+        try:
+            self.exportar([SaidaRelatorio(nome_arquivo, self.db_path)], progresso=progresso)
+            return nome_arquivo
+        except Exception as e:
+            raise Exception(f"Erro ao gerar relatório: {str(e)}")
+
+    def exportar_tudo(self, nome_csv=None, nome_relatorio=None, saidas_extras=(), progresso=None):
+        """
+        CSV e relatório (e outras saídas) em uma única leitura do banco
+
+        Args:
+            nome_csv: Nome do CSV (default: auto-gerado)
+            nome_relatorio: Nome do relatório (default: auto-gerado)
+            saidas_extras: Outras SaidaExportacao alimentadas na mesma passada
+            progresso: Ver exportar()
+
+        Returns:
+            tuple: (caminho do CSV, caminho do relatório)
+        """
+        nome_csv = nome_csv or _nome_padrao("pulverizacao", "csv")
+        nome_relatorio = nome_relatorio or _nome_padrao("relatorio", "txt")
+
+        try:
+            self.exportar([SaidaCSV(nome_csv), SaidaRelatorio(nome_relatorio, self.db_path),
+                           *saidas_extras], progresso=progresso)
+            return nome_csv, nome_relatorio
+        except Exception as e:
+            raise Exception(f"Erro ao exportar dados: {str(e)}")
+
+    def exportar_geojson(self, nome_arquivo=None, sessao_id=None, tolerancia_m=None, camadas=None,
+                         progresso=None):
+        """
+        Exporta trilha, cobertura pulverizada e passadas em GeoJSON
+
+        Args:
+            nome_arquivo: Nome do arquivo (default: auto-gerado)
+            sessao_id: Só essa sessão (default: todas)
+            tolerancia_m: Simplificação das linhas em metros (None = todos os pontos)
+            camadas: Subconjunto de ('passadas', 'trilha', 'cobertura') (default: todas)
+            progresso: Ver exportar()
+
+        Returns:
+            str: Caminho do arquivo gerado
+        """
+        from utils.exportacao_geo import CAMADAS, SaidaGeoJSON
+
+        if not nome_arquivo:
+            nome_arquivo = _nome_padrao("pulverizacao", "geojson")
+
+        try:
+            self.exportar([SaidaGeoJSON(nome_arquivo, camadas or CAMADAS, tolerancia_m)], sessao_id, progresso)
+            return nome_arquivo
+        except Exception as e:
+            raise Exception(f"Erro ao exportar GeoJSON: {str(e)}")
+
+    def exportar_kml(self, nome_arquivo=None, sessao_id=None, tolerancia_m=None, camadas=None,
+                     progresso=None):
+        """
+        Exporta trilha, cobertura pulverizada e passadas em KML (mesmos argumentos de exportar_geojson)
+
+        Returns:
+            str: Caminho do arquivo gerado
+        """
+        from utils.exportacao_geo import CAMADAS, SaidaKML
+
+        if not nome_arquivo:
+            nome_arquivo = _nome_padrao("pulverizacao", "kml")
+
+        try:
+            self.exportar([SaidaKML(nome_arquivo, camadas or CAMADAS, tolerancia_m)], sessao_id, progresso)
+            return nome_arquivo
+        except Exception as e:
+            raise Exception(f"Erro ao exportar KML: {str(e)}")
+
+    def exportar_isoxml(self, destino=None, sessao_id=None, progresso=None):
+        """
+        Exporta as sessões como ISOXML TaskData (pasta TASKDATA com TASKDATA.XML e TLGs)
+
+        Args:
+            destino: Pasta onde TASKDATA é criada (default: auto-gerada)
+            sessao_id: Só essa sessão (default: todas)
+            progresso: Chamado com (pontos gravados, total) a cada lote de registros
+
+        Returns:
+            str: Caminho do TASKDATA.XML
+        """
+        from utils.isoxml import exportar_taskdata
+
+        if not destino:
+            destino = _nome_padrao("isoxml")
+
+        try:
+            return exportar_taskdata(destino, None if sessao_id is None else [sessao_id], self.db_path,
+                                     progresso)
+        except Exception as e:
+            raise Exception(f"Erro ao exportar ISOXML: {str(e)}")
+
+    def _calcular_estatisticas(self, pontos, historico=None):
+        """
+        Calcula estatísticas dos pontos em uma passada (aceita um gerador)
+
+        Args:
+            pontos: Iterável de (ts, lat, lon, hectares) em ordem
+            historico: deque(maxlen=n) preenchida com os últimos pontos, se informada
+        """
+        return processar_pontos(pontos, (), self.tamanho_pagina, historico)
+
     def limpar_dados(self):
         """Limpa todos os dados do banco"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM pontos")
-            conn.commit()
-            conn.close()
+            # Pela conexão compartilhada quando é o mesmo banco: o gravador não traz de volta linhas apagadas
+            db.limpar_dados(self.db_path)
             return True
         except Exception as e:
             raise Exception(f"Erro ao limpar dados: {str(e)}")
     
-    def backup_dados(self, nome_arquivo=None):
-        """Cria backup do banco de dados"""
+    def backup_dados(self, nome_arquivo=None, progresso=None):
+        """
+        Cria backup do banco de dados
+
+        Usa a API de backup do SQLite: a cópia inclui as linhas ainda no WAL
+        e o GravadorBanco continua gravando enquanto ela é feita.
+
+        Args:
+            nome_arquivo: Nome do arquivo (default: auto-gerado)
+            progresso: Chamado com (páginas copiadas, total) a cada passo;
+                       uma exceção levantada nele interrompe o backup
+        """
         if not nome_arquivo:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             nome_arquivo = f"backup_{timestamp}.db"
             
         try:
-            import shutil
-            shutil.copy2(self.db_path, nome_arquivo)
+            db.sincronizar()  # Linhas do commit em grupo ainda pendentes
+            origem = sqlite3.connect(self.db_path)
+            destino = sqlite3.connect(nome_arquivo)
+            try:
+                # Leitura aberta durante toda a cópia: todos os passos copiam o
+                # mesmo instantâneo (sem ela cada commit do gravador reinicia o backup)
+                origem.execute('BEGIN')
+                origem.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+                passo = None
+                if progresso is not None:
+                    passo = lambda status, restantes, total: progresso(total - restantes, total)
+                origem.backup(destino, pages=PAGINAS_POR_PASSO_BACKUP, progress=passo)
+            finally:
+                destino.close()
+                origem.close()
             return nome_arquivo
         except Exception as e:
             raise Exception(f"Erro ao fazer backup: {str(e)}")
@@ -258,32 +569,30 @@ class ExportadorDados:
     def obter_estatisticas_rapidas(self):
         """Retorna estatísticas rápidas para exibição"""
         try:
+            db.sincronizar()  # Linhas do commit em grupo ainda pendentes
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            # Contar pontos
-            cursor.execute("SELECT COUNT(*) FROM pontos")
-            total_pontos = cursor.fetchone()[0]
-            
-            # Área total
-            cursor.execute("SELECT SUM(hectares) FROM pontos")
-            area_total = cursor.fetchone()[0] or 0
+            # Resumo por sessão mantido a cada lote: não percorre a tabela pontos
+            cursor.execute("""
+                SELECT SUM(pontos), SUM(hectares), SUM(distancia), MAX(velocidade_max)
+                FROM resumo_sessoes
+            """)
+            total_pontos, area_total, distancia_total, velocidade_maxima = cursor.fetchone()
             
             # Último ponto
-            cursor.execute("SELECT timestamp FROM pontos ORDER BY timestamp DESC LIMIT 1")
+            cursor.execute("SELECT fim_ms FROM resumo_sessoes ORDER BY sessao_id DESC LIMIT 1")
             ultimo_ponto = cursor.fetchone()
             
             conn.close()
             
             return {
-                'total_pontos': total_pontos,
-                'area_total': area_total,
-                'ultimo_ponto': ultimo_ponto[0] if ultimo_ponto else None
+                'total_pontos': total_pontos or 0,
+                'area_total': area_total or 0,
+                'distancia_total': distancia_total or 0,
+                'velocidade_maxima': velocidade_maxima or 0,
+                'ultimo_ponto': db.ts_para_datetime(ultimo_ponto[0]).isoformat() if ultimo_ponto else None
             }
             
         except Exception as e:
-            return {
-                'total_pontos': 0,
-                'area_total': 0,
-                'ultimo_ponto': None
-            } 
\ No newline at end of file
+            raise Exception(f"Erro ao obter estatísticas: {str(e)}") 
\ No newline at end of file
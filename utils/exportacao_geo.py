@@ -0,0 +1,431 @@
+import json
+import shutil
+import tempfile
+from xml.sax.saxutils import escape
+
+import db
+from utils import geodesia
+from utils.haversine import haversine
+from utils.exportacao import SaidaExportacao
+
+# Exportação GeoJSON e KML em streaming
+#
+# Por sessão saem três camadas:
+#   passadas  - uma LineString por passada (trecho reto entre curvas de
+#               cabeceira, pausas ou liga/desliga da pulverização)
+#   trilha    - a sessão inteira como uma LineString
+#   cobertura - as faixas pulverizadas: cada passada com pulverização vira
+#               um polígono da largura do implemento ao redor do eixo
+#               (os retângulos de cada ponto unidos ao longo da passada)
+#
+# Só a passada corrente fica em memória (até MAXIMO_PONTOS_PASSADA pontos).
+# As passadas são gravadas assim que terminam; trilha e cobertura da sessão
+# vão para arquivos temporários e são copiadas para a saída no fim da sessão.
+
+CAMADAS = ('passadas', 'trilha', 'cobertura')
+
+# Desvio do rumo da passada que caracteriza uma curva
+LIMITE_CURVA_GRAUS = 45.0
+# Deslocamento mínimo para medir o rumo (abaixo disso é ruído do GPS parado)
+DISTANCIA_MINIMA_RUMO = 2.0
+# Peso do novo rumo no rumo de referência (acompanha curvas suaves de nível)
+SUAVIZACAO_RUMO = 0.2
+# Intervalo sem pontos que encerra a passada
+PAUSA_MAXIMA_MS = 10_000
+# Passadas mais longas são divididas (memória limitada)
+MAXIMO_PONTOS_PASSADA = 5000
+# Vértices mais próximos que isso saem do polígono da faixa
+DISTANCIA_MINIMA_VERTICE = 0.5
+
+
+def _diferenca_angular(a, b):
+    return abs((a - b + 180.0) % 360.0 - 180.0)
+
+
+def _iso(ts):
+    return db.ts_para_datetime(ts).isoformat() + 'Z'
+
+
+class Passada:
+    """Trecho de uma sessão com rumo aproximadamente constante"""
+    __slots__ = ('indice', 'pulverizando', 'ts', 'latitude', 'longitude', 'distancia')
+
+    def __init__(self, indice, pulverizando):
+        self.indice = indice
+        self.pulverizando = pulverizando
+        self.ts = []
+        self.latitude = []
+        self.longitude = []
+        self.distancia = 0.0
+
+    def adicionar(self, ts, lat, lon, distancia=0.0):
+        self.ts.append(ts)
+        self.latitude.append(lat)
+        self.longitude.append(lon)
+        self.distancia += distancia
+
+    def __len__(self):
+        return len(self.ts)
+
+    def rumo(self):
+        return geodesia.rumo(self.latitude[0], self.longitude[0], self.latitude[-1], self.longitude[-1])
+
+    def eixo(self, tolerancia_m=None):
+        """(lat, lon) do eixo, simplificado com tolerancia_m metros se informada"""
+        indices = geodesia.simplificar(self.latitude, self.longitude, tolerancia_m)
+        return [(self.latitude[i], self.longitude[i]) for i in indices]
+
+    def faixa(self, largura_m, tolerancia_m=None):
+        """
+        Polígono da faixa pulverizada: eixo deslocado largura/2 para cada lado
+
+        Returns:
+            list: Anel fechado de (lat, lon) em sentido anti-horário (RFC 7946),
+                  ou None se a passada não anda
+        """
+        eixo = []
+        for ponto in self.eixo(tolerancia_m):
+            if not eixo or haversine(*eixo[-1], *ponto) >= DISTANCIA_MINIMA_VERTICE:
+                eixo.append(ponto)
+        if len(eixo) < 2:
+            return None
+        meia = largura_m / 2
+        esquerda = []
+        direita = []
+        for i, (lat, lon) in enumerate(eixo):
+            # Rumo no vértice: do anterior ao seguinte (nas pontas, o do segmento)
+            antes = eixo[max(i - 1, 0)]
+            depois = eixo[min(i + 1, len(eixo) - 1)]
+            rumo = geodesia.rumo(*antes, *depois)
+            esquerda.append(geodesia.deslocar(lat, lon, rumo - 90.0, meia))
+            direita.append(geodesia.deslocar(lat, lon, rumo + 90.0, meia))
+        # Sobe pela direita e volta pela esquerda: anti-horário em qualquer rumo
+        anel = direita + esquerda[::-1]
+        anel.append(anel[0])
+        return anel
+
+
+class SaidaGeo(SaidaExportacao):
+    """
+    Base das saídas GeoJSON e KML: divide as sessões em passadas e grava as camadas
+
+    As subclasses só formatam: _cabecalho, _rodape, _texto_coordenadas,
+    _separador_coordenadas, _escrever_passada, _escrever_faixa e
+    _escrever_sessao.
+    """
+
+    def __init__(self, caminho, camadas=CAMADAS, tolerancia_m=None, largura_padrao=None, casas_decimais=7):
+        """
+        Args:
+            caminho: Arquivo de saída
+            camadas: Subconjunto de CAMADAS a gravar
+            tolerancia_m: Simplificação Douglas-Peucker em metros (None = todos os pontos)
+            largura_padrao: Largura do implemento para sessões sem largura gravada
+            casas_decimais: Casas das coordenadas (7 ≈ 1 cm)
+        """
+        invalidas = set(camadas) - set(CAMADAS)
+        if invalidas:
+            raise ValueError(f"Camadas desconhecidas: {', '.join(sorted(invalidas))}")
+        self.caminho = caminho
+        self.camadas = tuple(camadas)
+        self.tolerancia_m = tolerancia_m
+        self.largura_padrao = largura_padrao
+        self.casas_decimais = casas_decimais
+        self._arquivo = None
+        self._trilha = None
+        self._cobertura = None
+        self._sessao = None
+
+        # Estatísticas
+        self.sessoes = 0
+        self.passadas = 0
+        self.faixas = 0
+        self.vertices = 0
+
+    # --- ciclo do motor ---
+
+    def iniciar(self):
+        self._arquivo = open(self.caminho, 'w', encoding='utf-8')
+        self._trilha = tempfile.TemporaryFile('w+', encoding='utf-8')
+        self._cobertura = tempfile.TemporaryFile('w+', encoding='utf-8')
+        self._arquivo.write(self._cabecalho())
+
+    def nova_sessao(self, sessao):
+        self._encerrar_sessao()
+        self._sessao = sessao
+        self._largura = sessao.get('largura_implemento') or self.largura_padrao
+        self._passada = None
+        self._indice = 0
+        self._rumo_ref = None
+        self._ancora = None
+        self._desde_ancora = 0.0
+        self._inicio = self._fim = None
+        self._distancia = 0.0
+        self._vertices_trilha = 0
+        self._faixas_sessao = 0
+        self._area_faixas = 0.0
+        self._passadas_sessao = 0
+
+    def receber(self, bloco):
+        if self._sessao is None:
+            self.nova_sessao({'id': None, 'nome': None, 'largura_implemento': None,
+                              'inicio_ms': bloco.ts[0], 'fim_ms': None})
+        distancias = geodesia.para_lista(bloco.distancias)
+        for ts, lat, lon, hectares, distancia in zip(bloco.ts, bloco.latitude, bloco.longitude,
+                                                     bloco.hectares, distancias):
+            self._adicionar_ponto(ts, lat, lon, (hectares or 0) > 0, distancia)
+
+    def finalizar(self, estatisticas):
+        self._encerrar_sessao()
+        self._arquivo.write(self._rodape())
+
+    def fechar(self):
+        for arquivo in (self._arquivo, self._trilha, self._cobertura):
+            if arquivo is not None:
+                arquivo.close()
+        self._arquivo = self._trilha = self._cobertura = None
+
+    # --- passadas ---
+
+    def _adicionar_ponto(self, ts, lat, lon, pulverizando, distancia):
+        passada = self._passada
+        if passada is None:
+            self._inicio = ts
+            self._nova_passada(ts, lat, lon, pulverizando)
+            return
+        self._fim = ts
+        self._distancia += distancia
+
+        ultimo = (passada.ts[-1], passada.latitude[-1], passada.longitude[-1])
+        if (pulverizando != passada.pulverizando or ts - ultimo[0] > PAUSA_MAXIMA_MS
+                or len(passada) >= MAXIMO_PONTOS_PASSADA):
+            self._fechar_passada()
+            self._nova_passada(*ultimo, pulverizando)
+            self._passada.adicionar(ts, lat, lon, distancia)
+            return
+
+        # Rumo medido só depois de andar DISTANCIA_MINIMA_RUMO desde a última medida
+        self._desde_ancora += distancia
+        if self._desde_ancora >= DISTANCIA_MINIMA_RUMO:
+            rumo = geodesia.rumo(self._ancora[0], self._ancora[1], lat, lon)
+            self._ancora = (lat, lon)
+            self._desde_ancora = 0.0
+            if self._rumo_ref is None:
+                self._rumo_ref = rumo
+            elif _diferenca_angular(rumo, self._rumo_ref) > LIMITE_CURVA_GRAUS:
+                # Curva: a passada termina no ponto anterior e a próxima começa nele
+                self._fechar_passada()
+                self._nova_passada(*ultimo, pulverizando)
+                self._rumo_ref = rumo
+            else:
+                desvio = (rumo - self._rumo_ref + 180.0) % 360.0 - 180.0
+                self._rumo_ref = (self._rumo_ref + SUAVIZACAO_RUMO * desvio) % 360.0
+        self._passada.adicionar(ts, lat, lon, distancia)
+
+    def _nova_passada(self, ts, lat, lon, pulverizando):
+        self._indice += 1
+        self._passada = Passada(self._indice, pulverizando)
+        self._passada.adicionar(ts, lat, lon)
+        self._ancora = (lat, lon)
+        self._desde_ancora = 0.0
+        self._rumo_ref = None
+
+    def _fechar_passada(self):
+        passada = self._passada
+        self._passada = None
+        if passada is None or len(passada) < 2:
+            return
+        eixo = passada.eixo(self.tolerancia_m)
+        self.passadas += 1
+        self._passadas_sessao += 1
+
+        if 'trilha' in self.camadas:
+            # Passadas consecutivas compartilham o ponto da emenda
+            pontos = eixo if not self._vertices_trilha else eixo[1:]
+            if pontos:
+                if self._vertices_trilha:
+                    self._trilha.write(self._separador_coordenadas())
+                self._trilha.write(self._texto_coordenadas(pontos))
+                self._vertices_trilha += len(pontos)
+                self.vertices += len(pontos)
+
+        if 'passadas' in self.camadas:
+            self._escrever_passada(passada, eixo)
+            self.vertices += len(eixo)
+
+        if 'cobertura' in self.camadas and passada.pulverizando and self._largura:
+            anel = passada.faixa(self._largura, self.tolerancia_m)
+            if anel is not None:
+                self._escrever_faixa(anel, self._faixas_sessao == 0)
+                self._faixas_sessao += 1
+                self._area_faixas += passada.distancia * self._largura / 10000
+                self.faixas += 1
+                self.vertices += len(anel)
+
+    def _encerrar_sessao(self):
+        if self._sessao is None:
+            return
+        self._fechar_passada()
+        self.sessoes += 1
+        self._escrever_sessao()
+        for temporario in (self._trilha, self._cobertura):
+            temporario.seek(0)
+            temporario.truncate()
+        self._sessao = None
+
+    def _copiar(self, temporario):
+        temporario.seek(0)
+        shutil.copyfileobj(temporario, self._arquivo)
+
+    def _propriedades_sessao(self):
+        sessao = self._sessao
+        return {
+            'sessao_id': sessao['id'],
+            'nome': sessao.get('nome'),
+            'largura_implemento': self._largura,
+            'inicio': _iso(self._inicio),
+            'fim': _iso(self._fim if self._fim is not None else self._inicio),
+            'distancia_m': round(self._distancia, 2),
+            'passadas': self._passadas_sessao
+        }
+
+    def _propriedades_passada(self, passada):
+        return {
+            'sessao_id': self._sessao['id'],
+            'passada': passada.indice,
+            'pulverizando': passada.pulverizando,
+            'inicio': _iso(passada.ts[0]),
+            'fim': _iso(passada.ts[-1]),
+            'distancia_m': round(passada.distancia, 2),
+            'rumo': round(passada.rumo(), 1),
+            'pontos': len(passada)
+        }
+
+    def obter_estatisticas(self):
+        return {
+            'sessoes': self.sessoes,
+            'passadas': self.passadas,
+            'faixas': self.faixas,
+            'vertices': self.vertices
+        }
+
+
+class SaidaGeoJSON(SaidaGeo):
+    """FeatureCollection GeoJSON (RFC 7946, coordenadas lon,lat em WGS 84)"""
+
+    def _cabecalho(self):
+        self._primeira_feicao = True
+        return '{"type":"FeatureCollection","features":[\n'
+
+    def _rodape(self):
+        return '\n]}\n'
+
+    def _feicao(self, propriedades):
+        inicio = '' if self._primeira_feicao else ',\n'
+        self._primeira_feicao = False
+        return f'{inicio}{{"type":"Feature","properties":{json.dumps(propriedades, ensure_ascii=False)},'
+
+    def _texto_coordenadas(self, pontos):
+        casas = self.casas_decimais
+        return ','.join(f'[{lon:.{casas}f},{lat:.{casas}f}]' for lat, lon in pontos)
+
+    def _separador_coordenadas(self):
+        return ','
+
+    def _escrever_passada(self, passada, eixo):
+        self._arquivo.write(self._feicao({'camada': 'passada', **self._propriedades_passada(passada)}))
+        self._arquivo.write(f'"geometry":{{"type":"LineString","coordinates":[{self._texto_coordenadas(eixo)}]}}}}')
+
+    def _escrever_faixa(self, anel, primeira):
+        if not primeira:
+            self._cobertura.write(',')
+        self._cobertura.write(f'[[{self._texto_coordenadas(anel)}]]')
+
+    def _escrever_sessao(self):
+        if self._vertices_trilha >= 2:
+            self._arquivo.write(self._feicao({'camada': 'trilha', **self._propriedades_sessao()}))
+            self._arquivo.write('"geometry":{"type":"LineString","coordinates":[')
+            self._copiar(self._trilha)
+            self._arquivo.write(']}}')
+        if self._faixas_sessao:
+            propriedades = {'camada': 'cobertura', **self._propriedades_sessao(),
+                            'faixas': self._faixas_sessao, 'area_faixas_ha': round(self._area_faixas, 4)}
+            self._arquivo.write(self._feicao(propriedades))
+            self._arquivo.write('"geometry":{"type":"MultiPolygon","coordinates":[')
+            self._copiar(self._cobertura)
+            self._arquivo.write(']}}')
+
+
+class SaidaKML(SaidaGeo):
+    """Documento KML 2.2: uma pasta por sessão com trilha, cobertura e passadas"""
+
+    ESTILOS = (
+        '<Style id="trilha"><LineStyle><color>ff0000ff</color><width>2</width></LineStyle></Style>\n'
+        '<Style id="passada"><LineStyle><color>ffffaa00</color><width>1</width></LineStyle></Style>\n'
+        '<Style id="cobertura"><LineStyle><color>ff00aa00</color><width>1</width></LineStyle>'
+        '<PolyStyle><color>6000ff00</color></PolyStyle></Style>\n'
+    )
+
+    def _cabecalho(self):
+        self._pasta_aberta = False
+        return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<kml xmlns="http://www.opengis.net/kml/2.2">\n<Document>\n'
+                '<name>Pulverização</name>\n' + self.ESTILOS)
+
+    def _rodape(self):
+        return '</Document>\n</kml>\n'
+
+    def _texto_coordenadas(self, pontos):
+        casas = self.casas_decimais
+        return ' '.join(f'{lon:.{casas}f},{lat:.{casas}f}' for lat, lon in pontos)
+
+    def _separador_coordenadas(self):
+        return ' '
+
+    @staticmethod
+    def _dados(propriedades):
+        return '<ExtendedData>' + ''.join(
+            f'<Data name="{nome}"><value>{escape(str(valor))}</value></Data>'
+            for nome, valor in propriedades.items() if valor is not None) + '</ExtendedData>'
+
+    def _abrir_sessao(self):
+        # A pasta da sessão abre no primeiro conteúdo dela
+        if not self._pasta_aberta:
+            sessao = self._sessao
+            nome = f"Sessão {sessao['id']}" + (f" - {sessao['nome']}" if sessao.get('nome') else '')
+            self._arquivo.write(f'<Folder>\n<name>{escape(nome)}</name>\n<Folder>\n<name>Passadas</name>\n')
+            self._pasta_aberta = True
+
+    def _escrever_passada(self, passada, eixo):
+        self._abrir_sessao()
+        propriedades = self._propriedades_passada(passada)
+        self._arquivo.write(
+            f'<Placemark><name>Passada {passada.indice}</name><styleUrl>#passada</styleUrl>'
+            f'<TimeSpan><begin>{propriedades["inicio"]}</begin><end>{propriedades["fim"]}</end></TimeSpan>'
+            f'{self._dados(propriedades)}'
+            f'<LineString><tessellate>1</tessellate><coordinates>{self._texto_coordenadas(eixo)}'
+            f'</coordinates></LineString></Placemark>\n')
+
+    def _escrever_faixa(self, anel, primeira):
+        self._cobertura.write(f'<Polygon><outerBoundaryIs><LinearRing><coordinates>'
+                              f'{self._texto_coordenadas(anel)}</coordinates></LinearRing></outerBoundaryIs></Polygon>\n')
+
+    def _escrever_sessao(self):
+        self._abrir_sessao()
+        self._arquivo.write('</Folder>\n')
+        propriedades = self._propriedades_sessao()
+        tempo = f'<TimeSpan><begin>{propriedades["inicio"]}</begin><end>{propriedades["fim"]}</end></TimeSpan>'
+        if self._vertices_trilha >= 2:
+            self._arquivo.write(f'<Placemark><name>Trilha</name><styleUrl>#trilha</styleUrl>{tempo}'
+                                f'{self._dados(propriedades)}<LineString><tessellate>1</tessellate><coordinates>')
+            self._copiar(self._trilha)
+            self._arquivo.write('</coordinates></LineString></Placemark>\n')
+        if self._faixas_sessao:
+            propriedades = {**propriedades, 'faixas': self._faixas_sessao,
+                            'area_faixas_ha': round(self._area_faixas, 4)}
+            self._arquivo.write(f'<Placemark><name>Cobertura</name><styleUrl>#cobertura</styleUrl>{tempo}'
+                                f'{self._dados(propriedades)}<MultiGeometry>\n')
+            self._copiar(self._cobertura)
+            self._arquivo.write('</MultiGeometry></Placemark>\n')
+        self._arquivo.write('</Folder>\n')
+        self._pasta_aberta = False
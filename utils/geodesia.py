@@ -0,0 +1,267 @@
+import math
+from itertools import accumulate
+
+from utils.haversine import haversine
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Geodésia sobre colunas inteiras (distância, rumo, velocidade, limites)
+#
+# Com NumPy as funções trabalham em arrays e devolvem ndarray; sem NumPy
+# (ou para colunas curtas, onde criar o array custa mais que o laço) caem
+# no caminho em Python puro e devolvem listas. Quem precisa de valores
+# Python usa para_lista(); somas e limites saem sempre como float.
+
+RAIO_TERRA = 6371e3
+
+# Metros por grau de latitude (aproximação local, trechos de algumas dezenas de metros)
+METROS_POR_GRAU = RAIO_TERRA * math.pi / 180
+
+# Abaixo disso o laço em Python é mais rápido que converter para array
+MINIMO_NUMPY = 64
+
+NUMPY_DISPONIVEL = np is not None
+
+
+def _usar_numpy(valores):
+    if np is None:
+        return False
+    return isinstance(valores, np.ndarray) or len(valores) >= MINIMO_NUMPY
+
+
+def rumo(lat1, lon1, lat2, lon2):
+    """Rumo inicial do ponto 1 para o ponto 2, em graus [0, 360)"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dl = math.radians(lon2 - lon1)
+    y = math.sin(dl) * math.cos(phi2)
+    x = math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(dl)
+    return math.degrees(math.atan2(y, x)) % 360.0
+
+
+def haversine_pares(lat1, lon1, lat2, lon2):
+    """Distância em metros entre os pares (lat1[i], lon1[i]) e (lat2[i], lon2[i])"""
+    if not _usar_numpy(lat1):
+        return list(map(haversine, lat1, lon1, lat2, lon2))
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    dphi = np.radians(np.subtract(lat2, lat1))
+    dl = np.radians(np.subtract(lon2, lon1))
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dl / 2) ** 2
+    return RAIO_TERRA * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def rumo_pares(lat1, lon1, lat2, lon2):
+    """Rumo inicial em graus [0, 360) de cada par"""
+    if not _usar_numpy(lat1):
+        return list(map(rumo, lat1, lon1, lat2, lon2))
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    dl = np.radians(np.subtract(lon2, lon1))
+    y = np.sin(dl) * np.cos(phi2)
+    x = np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(dl)
+    return np.degrees(np.arctan2(y, x)) % 360.0
+
+
+def distancias(lats, lons):
+    """Distâncias entre pontos consecutivos (n - 1 valores)"""
+    if not _usar_numpy(lats):
+        return haversine_pares(lats[:-1], lons[:-1], lats[1:], lons[1:])
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    return haversine_pares(lats[:-1], lons[:-1], lats[1:], lons[1:])
+
+
+def rumos(lats, lons):
+    """Rumos entre pontos consecutivos (n - 1 valores)"""
+    if not _usar_numpy(lats):
+        return rumo_pares(lats[:-1], lons[:-1], lats[1:], lons[1:])
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    return rumo_pares(lats[:-1], lons[:-1], lats[1:], lons[1:])
+
+
+def distancia_acumulada(lats, lons):
+    """Distância percorrida até cada ponto (n valores, o primeiro é 0)"""
+    trechos = distancias(lats, lons)
+    if np is not None and isinstance(trechos, np.ndarray):
+        return np.concatenate(([0.0], np.cumsum(trechos)))
+    return list(accumulate(trechos, initial=0.0))
+
+
+def diferencas(anteriores, atuais):
+    """atuais[i] - anteriores[i] (intervalos de tempo entre pares)"""
+    if not _usar_numpy(atuais):
+        return [b - a for a, b in zip(anteriores, atuais)]
+    return np.subtract(atuais, anteriores)
+
+
+def velocidades_kmh(distancias_m, intervalos, unidades_por_segundo=1):
+    """
+    Velocidade em km/h de cada trecho; 0 onde o intervalo não é positivo
+
+    Args:
+        distancias_m: Distância de cada trecho em metros
+        intervalos: Tempo de cada trecho
+        unidades_por_segundo: 1 para intervalos em segundos, 1000 para epoch-ms
+    """
+    fator = 3.6 * unidades_por_segundo
+    if not _usar_numpy(distancias_m):
+        return [d / dt * fator if dt > 0 else 0 for d, dt in zip(distancias_m, intervalos)]
+    d = np.asarray(distancias_m, dtype=float)
+    dt = np.asarray(intervalos, dtype=float)
+    resultado = np.zeros_like(d)
+    np.divide(d * fator, dt, out=resultado, where=dt > 0)
+    return resultado
+
+
+def resumo_velocidades(velocidades, intervalos, limite):
+    """
+    Soma, quantidade e máximo das velocidades com intervalo positivo e abaixo do limite
+
+    Returns:
+        tuple: (soma, quantidade, maxima)
+    """
+    if not _usar_numpy(velocidades):
+        validas = [v for v, dt in zip(velocidades, intervalos) if dt > 0 and v < limite]
+        return sum(validas), len(validas), max(validas, default=0)
+    v = np.asarray(velocidades, dtype=float)
+    validas = v[(np.asarray(intervalos) > 0) & (v < limite)]
+    if not validas.size:
+        return 0, 0, 0
+    return float(validas.sum()), int(validas.size), float(validas.max())
+
+
+def somar(valores):
+    if np is not None and isinstance(valores, np.ndarray):
+        return float(valores.sum())
+    return sum(valores)
+
+
+def para_lista(valores):
+    """Valores Python (float) de uma coluna devolvida por este módulo"""
+    if np is not None and isinstance(valores, np.ndarray):
+        return valores.tolist()
+    return valores
+
+
+def limites(lats, lons):
+    """
+    Retângulo envolvente das colunas
+
+    Returns:
+        tuple: (lat_min, lat_max, lon_min, lon_max)
+    """
+    if not _usar_numpy(lats):
+        return min(lats), max(lats), min(lons), max(lons)
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    return float(lats.min()), float(lats.max()), float(lons.min()), float(lons.max())
+
+
+def limites_pontos(pontos):
+    """
+    Retângulo envolvente de (lat, lon, ...) em uma passada (aceita um gerador)
+
+    Returns:
+        tuple: (lat_min, lat_max, lon_min, lon_max), ou None sem pontos
+    """
+    if hasattr(pontos, '__len__') and _usar_numpy(pontos):
+        coordenadas = np.asarray(pontos, dtype=float)
+        if not coordenadas.size:
+            return None
+        minimos = coordenadas[:, :2].min(axis=0)
+        maximos = coordenadas[:, :2].max(axis=0)
+        return float(minimos[0]), float(maximos[0]), float(minimos[1]), float(maximos[1])
+
+    lat_min = lat_max = lon_min = lon_max = None
+    for ponto in pontos:
+        lat, lon = ponto[0], ponto[1]
+        if lat_min is None:
+            lat_min = lat_max = lat
+            lon_min = lon_max = lon
+            continue
+        if lat < lat_min:
+            lat_min = lat
+        elif lat > lat_max:
+            lat_max = lat
+        if lon < lon_min:
+            lon_min = lon
+        elif lon > lon_max:
+            lon_max = lon
+    if lat_min is None:
+        return None
+    return lat_min, lat_max, lon_min, lon_max
+
+
+def deslocar(lat, lon, rumo_graus, distancia_m):
+    """Ponto a distancia_m de (lat, lon) no rumo dado (aproximação local)"""
+    angulo = math.radians(rumo_graus)
+    return (lat + distancia_m * math.cos(angulo) / METROS_POR_GRAU,
+            lon + distancia_m * math.sin(angulo) / (METROS_POR_GRAU * math.cos(math.radians(lat))))
+
+
+def simplificar(lats, lons, tolerancia_m):
+    """
+    Douglas-Peucker em metros (projeção local no primeiro ponto)
+
+    Returns:
+        list: Índices dos pontos mantidos, em ordem (sempre o primeiro e o último)
+    """
+    n = len(lats)
+    if n <= 2 or not tolerancia_m:
+        return list(range(n))
+    escala_x = METROS_POR_GRAU * math.cos(math.radians(lats[0]))
+    if _usar_numpy(lats):
+        xs = (np.asarray(lons, dtype=float) - lons[0]) * escala_x
+        ys = (np.asarray(lats, dtype=float) - lats[0]) * METROS_POR_GRAU
+    else:
+        xs = [(lon - lons[0]) * escala_x for lon in lons]
+        ys = [(lat - lats[0]) * METROS_POR_GRAU for lat in lats]
+    limite = tolerancia_m * tolerancia_m
+
+    manter = [False] * n
+    manter[0] = manter[-1] = True
+    pilha = [(0, n - 1)]
+    while pilha:
+        i, j = pilha.pop()
+        if j <= i + 1:
+            continue
+        indice, maior = _mais_distante(xs, ys, i, j)
+        if maior > limite:
+            manter[indice] = True
+            pilha.append((i, indice))
+            pilha.append((indice, j))
+    return [i for i in range(n) if manter[i]]
+
+
+def _mais_distante(xs, ys, i, j):
+    """(índice, distância²) do ponto entre i e j mais longe do segmento i-j"""
+    dx = xs[j] - xs[i]
+    dy = ys[j] - ys[i]
+    comprimento = dx * dx + dy * dy
+    if np is not None and isinstance(xs, np.ndarray) and j - i > MINIMO_NUMPY:
+        px = xs[i + 1:j] - xs[i]
+        py = ys[i + 1:j] - ys[i]
+        if comprimento > 0:
+            t = np.clip((px * dx + py * dy) / comprimento, 0.0, 1.0)
+            px = px - t * dx
+            py = py - t * dy
+        distancias2 = px * px + py * py
+        k = int(distancias2.argmax())
+        return i + 1 + k, float(distancias2[k])
+
+    indice, maior = i, -1.0
+    for k in range(i + 1, j):
+        px = xs[k] - xs[i]
+        py = ys[k] - ys[i]
+        if comprimento > 0:
+            t = min(1.0, max(0.0, (px * dx + py * dy) / comprimento))
+            px -= t * dx
+            py -= t * dy
+        distancia2 = px * px + py * py
+        if distancia2 > maior:
+            indice, maior = k, distancia2
+    return indice, maior
@@ -0,0 +1,276 @@
+import glob
+import gzip
+import os
+import struct
+import time
+from datetime import datetime
+
+# Gravação bruta do stream do receptor (NMEA/UBX) e reprodução determinística
+#
+# Arquivo: gzip contendo o cabeçalho MAGICO seguido de registros
+#   instante (double, time.time() da chegada) | tamanho (U4) | bytes recebidos
+
+MAGICO = b'GNSSRAW1'
+_REGISTRO = struct.Struct('<dI')
+
+
+class GravadorBruto:
+    def __init__(self, diretorio='gravacoes', prefixo='gnss', tamanho_max_arquivo=64 * 1024 * 1024,
+                 duracao_max_arquivo=3600, intervalo_flush=5.0, nivel_compressao=6):
+        """
+        Grava o stream bruto do receptor em arquivos gzip rotativos
+
+        Args:
+            diretorio: Pasta onde os arquivos são criados
+            prefixo: Prefixo do nome dos arquivos
+            tamanho_max_arquivo: Bytes recebidos por arquivo antes de rotacionar
+            duracao_max_arquivo: Segundos por arquivo antes de rotacionar
+            intervalo_flush: Segundos entre flushes do gzip (limita perda em queda de energia)
+            nivel_compressao: Nível de compressão gzip (1-9)
+        """
+        self.diretorio = diretorio
+        self.prefixo = prefixo
+        self.tamanho_max_arquivo = tamanho_max_arquivo
+        self.duracao_max_arquivo = duracao_max_arquivo
+        self.intervalo_flush = intervalo_flush
+        self.nivel_compressao = nivel_compressao
+
+        self._arquivo = None
+        self._inicio_arquivo = None
+        self._bytes_arquivo = 0
+        self._ultimo_flush = 0.0
+        self.arquivo_atual = None
+
+        # Estatísticas
+        self.bytes_gravados = 0
+        self.registros_gravados = 0
+        self.arquivos_criados = 0
+
+    def _abrir_novo(self, instante):
+        self.fechar()
+        os.makedirs(self.diretorio, exist_ok=True)
+        nome = f"{self.prefixo}_{datetime.fromtimestamp(instante).strftime('%Y%m%d_%H%M%S')}.raw.gz"
+        caminho = os.path.join(self.diretorio, nome)
+        contador = 1
+        while os.path.exists(caminho):
+            caminho = os.path.join(self.diretorio, f"{nome[:-7]}_{contador}.raw.gz")
+            contador += 1
+
+        self._arquivo = gzip.open(caminho, 'wb', compresslevel=self.nivel_compressao)
+        self._arquivo.write(MAGICO)
+        self._inicio_arquivo = instante
+        self._bytes_arquivo = 0
+        self._ultimo_flush = instante
+        self.arquivo_atual = caminho
+        self.arquivos_criados += 1
+
+    def gravar(self, dados, instante=None):
+        """
+        Grava um bloco de bytes recebido do receptor
+
+        Args:
+            dados: Bytes lidos da porta serial
+            instante: Instante de chegada em time.time() (default: agora)
+        """
+        if not dados:
+            return
+        if instante is None:
+            instante = time.time()
+
+        if (self._arquivo is None
+                or self._bytes_arquivo >= self.tamanho_max_arquivo
+                or instante - self._inicio_arquivo >= self.duracao_max_arquivo):
+            self._abrir_novo(instante)
+
+        self._arquivo.write(_REGISTRO.pack(instante, len(dados)))
+        self._arquivo.write(dados)
+        self._bytes_arquivo += len(dados)
+        self.bytes_gravados += len(dados)
+        self.registros_gravados += 1
+
+        if instante - self._ultimo_flush >= self.intervalo_flush:
+            self._arquivo.flush()
+            self._ultimo_flush = instante
+
+    def fechar(self):
+        """Fecha o arquivo atual"""
+        if self._arquivo is not None:
+            try:
+                self._arquivo.close()
+            finally:
+                self._arquivo = None
+
+    def obter_estatisticas(self):
+        return {
+            'arquivo_atual': self.arquivo_atual,
+            'bytes_gravados': self.bytes_gravados,
+            'registros_gravados': self.registros_gravados,
+            'arquivos_criados': self.arquivos_criados
+        }
+
+
+def listar_gravacoes(caminho):
+    """
+    Lista os arquivos de uma gravação em ordem cronológica
+
+    Args:
+        caminho: Arquivo .raw.gz, diretório ou padrão glob
+
+    Returns:
+        list: Caminhos dos arquivos
+    """
+    if os.path.isdir(caminho):
+        return sorted(glob.glob(os.path.join(caminho, '*.raw.gz')))
+    if any(c in caminho for c in '*?['):
+        return sorted(glob.glob(caminho))
+    return [caminho]
+
+
+def ler_gravacao(arquivos):
+    """
+    Lê os registros de uma ou mais gravações
+
+    Args:
+        arquivos: Caminho (ver listar_gravacoes) ou lista de caminhos
+
+    Yields:
+        tuple: (instante, dados)
+    """
+    if isinstance(arquivos, str):
+        arquivos = listar_gravacoes(arquivos)
+
+    for caminho in arquivos:
+        with gzip.open(caminho, 'rb') as arquivo:
+            if arquivo.read(len(MAGICO)) != MAGICO:
+                raise ValueError(f"Arquivo de gravação inválido: {caminho}")
+            while True:
+                try:
+                    cabecalho = arquivo.read(_REGISTRO.size)
+                except EOFError:
+                    break  # Arquivo interrompido (queda de energia)
+                if len(cabecalho) < _REGISTRO.size:
+                    break
+                instante, tamanho = _REGISTRO.unpack(cabecalho)
+                try:
+                    dados = arquivo.read(tamanho)
+                except EOFError:
+                    break
+                if len(dados) < tamanho:
+                    break
+                yield instante, dados
+
+
+class FonteReplay:
+    def __init__(self, arquivos, velocidade=1.0, timeout=1.0):
+        """
+        Reproduz uma gravação como se fosse a porta serial
+
+        Implementa a parte da interface de serial.Serial usada pelo sistema
+        (read, readline, in_waiting, is_open, close), podendo substituir a
+        porta no GNSSManager/GNSSController.
+
+        Args:
+            arquivos: Caminho (arquivo, diretório ou glob) ou lista de caminhos
+            velocidade: 1.0 = tempo real, N = N vezes mais rápido,
+                        None ou 0 = o mais rápido possível
+            timeout: Espera máxima de read() sem dados, como na serial
+        """
+        self.arquivos = arquivos
+        self.velocidade = velocidade
+        self.timeout = timeout
+        self.is_open = True
+        self.terminado = False
+
+        self._registros = ler_gravacao(arquivos)
+        self._pendente = bytearray()
+        self._proximo = next(self._registros, None)
+        self._t0_gravacao = self._proximo[0] if self._proximo else 0.0
+        self._t0_replay = time.monotonic()
+        self._instante_virtual = self._t0_gravacao
+
+        # Estatísticas
+        self.bytes_entregues = 0
+        self.registros_entregues = 0
+
+    def relogio(self):
+        """
+        Relógio da reprodução (segundos, base time.monotonic())
+
+        Avança conforme o instante gravado dos bytes entregues, então os
+        instantes de chegada são os mesmos em qualquer velocidade.
+        """
+        return self._t0_replay + (self._instante_virtual - self._t0_gravacao)
+
+    def _agora_gravacao(self):
+        if not self.velocidade:
+            return float('inf')
+        return self._t0_gravacao + (time.monotonic() - self._t0_replay) * self.velocidade
+
+    def _avancar(self):
+        agora = self._agora_gravacao()
+        while self._proximo is not None and self._proximo[0] <= agora:
+            instante, dados = self._proximo
+            self._pendente += dados
+            self._instante_virtual = instante
+            self.registros_entregues += 1
+            self._proximo = next(self._registros, None)
+            # O mais rápido possível: um registro por vez, como leituras reais
+            if not self.velocidade:
+                break
+        if self._proximo is None:
+            self.terminado = not self._pendente
+
+    @property
+    def in_waiting(self):
+        if not self._pendente:
+            self._avancar()
+        return len(self._pendente)
+
+    def _aguardar_dados(self):
+        if not self._pendente:
+            self._avancar()
+        if self._pendente or self._proximo is None:
+            return
+        espera = (self._proximo[0] - self._agora_gravacao()) / self.velocidade
+        time.sleep(max(0.0, min(self.timeout, espera)))
+        self._avancar()
+
+    def read(self, n=1):
+        if not self.is_open:
+            raise OSError("Fonte de replay fechada")
+        self._aguardar_dados()
+        if not self._pendente:
+            if self.terminado:
+                time.sleep(self.timeout if self.velocidade else 0)
+            return b''
+        dados = bytes(self._pendente[:n])
+        del self._pendente[:n]
+        self.bytes_entregues += len(dados)
+        return dados
+
+    def readline(self):
+        linha = bytearray()
+        limite = time.monotonic() + self.timeout
+        while True:
+            self._aguardar_dados()
+            fim = self._pendente.find(b'\n')
+            if fim >= 0:
+                linha += self._pendente[:fim + 1]
+                del self._pendente[:fim + 1]
+                break
+            linha += self._pendente
+            self._pendente.clear()
+            if self.terminado or time.monotonic() >= limite:
+                break
+        self.bytes_entregues += len(linha)
+        return bytes(linha)
+
+    def write(self, dados):
+        # Comandos enviados ao receptor são ignorados na reprodução
+        return len(dados)
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
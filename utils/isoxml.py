@@ -0,0 +1,420 @@
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+
+import db
+from utils.haversine import haversine
+
+# Exportação ISO 11783-10 (ISOXML) TaskData
+#
+# Pasta TASKDATA/ com:
+#   TASKDATA.XML   cliente, fazenda, talhão, dispositivo e uma tarefa (TSK)
+#                  por sessão, cada uma apontando para o seu TLG
+#   TLGnnnnn.XML   cabeçalho do log: quais campos cada registro traz
+#   TLGnnnnn.BIN   um registro binário (little-endian) por ponto
+#
+# Todo registro traz a posição e todos os DLVs, então tem tamanho fixo:
+#   ms desde 0h UTC (U4) | dias desde 1980-01-01 (U2)
+#   | norte, leste (I4, 1e-7 grau) | status da posição (U1) | HDOP (U2, 0,1)
+#   | número de DLVs (U1) | DLVs: índice no cabeçalho (U1) + valor (I4)
+#
+# Os pontos vêm do banco em páginas (db.iterar_pontos) e os registros são
+# gravados em lotes, sem montar a sessão em memória. ler_tlg() decodifica
+# qualquer TLG pelo cabeçalho e validar_taskdata() confere a ida e volta
+# contra o banco.
+
+VERSAO_PRINCIPAL = 4
+VERSAO_SECUNDARIA = 3
+FABRICANTE = 'GPS Navegador'
+VERSAO_SOFTWARE = '1.0'
+
+PASTA_TASKDATA = 'TASKDATA'
+ARQUIVO_TASKDATA = 'TASKDATA.XML'
+
+# Data Dictionary Identifiers (ISO 11783-11) gravados a cada ponto
+DDI_LARGURA_TRABALHO = 0x0043   # Actual Working Width, mm
+DDI_AREA_TOTAL = 0x0074         # Total Area, m²
+DDI_DISTANCIA_EFETIVA = 0x0075  # Effective Total Distance, mm
+DDI_ESTADO_TRABALHO = 0x008D    # Actual Work State, 0 = desligado, 1 = ligado
+DDI_VELOCIDADE = 0x018D         # Ground-based Machine Speed, mm/s
+DDIS = (DDI_LARGURA_TRABALHO, DDI_AREA_TOTAL, DDI_DISTANCIA_EFETIVA, DDI_ESTADO_TRABALHO, DDI_VELOCIDADE)
+NOMES_DDI = {
+    DDI_LARGURA_TRABALHO: 'Largura de trabalho',
+    DDI_AREA_TOTAL: 'Área total',
+    DDI_DISTANCIA_EFETIVA: 'Distância efetiva',
+    DDI_ESTADO_TRABALHO: 'Estado de trabalho',
+    DDI_VELOCIDADE: 'Velocidade',
+}
+
+ESCALA_GRAUS = 10_000_000
+ESCALA_HDOP = 10
+SEM_HDOP = 0xFFFF
+# Status da posição do PTN: o mesmo código da qualidade do GGA (0-8); 15 = indisponível
+STATUS_INDISPONIVEL = 15
+EPOCA_ISO = datetime(1980, 1, 1, tzinfo=timezone.utc)
+DIAS_EPOCA_ISO = (EPOCA_ISO - datetime(1970, 1, 1, tzinfo=timezone.utc)).days
+MS_POR_DIA = 86_400_000
+
+_REGISTRO = struct.Struct('<IHiiBHB' + 'Bi' * len(DDIS))
+TAMANHO_REGISTRO = _REGISTRO.size
+REGISTROS_POR_ESCRITA = 4096
+
+COLUNAS_TLG = ('ts', 'latitude', 'longitude', 'hectares', 'velocidade', 'hdop', 'qualidade')
+
+# Campos do PTN, na ordem em que aparecem no registro, e seus formatos
+_CAMPOS_PTN = (('A', 'i'), ('B', 'i'), ('C', 'i'), ('D', 'B'), ('E', 'H'), ('F', 'H'),
+               ('G', 'B'), ('H', 'I'), ('I', 'H'))
+
+
+def _data_hora(ts):
+    """xs:dateTime UTC de um epoch-ms"""
+    return db.ts_para_datetime(ts).isoformat(timespec='seconds') + 'Z'
+
+
+def _gravar_xml(raiz, caminho):
+    ET.indent(raiz)
+    temporario = caminho + '.tmp'
+    ET.ElementTree(raiz).write(temporario, encoding='utf-8', xml_declaration=True)
+    os.replace(temporario, caminho)
+
+
+def _cabecalho_tlg():
+    tempo = ET.Element('TIM', A='', D='4')
+    ET.SubElement(tempo, 'PTN', A='', B='', D='', F='')
+    for ddi in DDIS:
+        ET.SubElement(tempo, 'DLV', A=f'{ddi:04X}', B='', C='DET-1')
+    return tempo
+
+
+def gravar_tlg(pontos, caminho_base, largura_m):
+    """
+    Grava TLGnnnnn.BIN e TLGnnnnn.XML de uma sessão
+
+    Args:
+        pontos: Iterável de tuplas na ordem de COLUNAS_TLG (aceita um gerador)
+        caminho_base: Caminho sem extensão (.../TLG00001)
+        largura_m: Largura do implemento (0 se desconhecida)
+
+    Returns:
+        dict: registros, inicio_ms, fim_ms, area_m2, distancia_m
+    """
+    largura_mm = round((largura_m or 0) * 1000)
+    indices = range(len(DDIS))
+    area_ha = 0.0
+    distancia = 0.0
+    anterior = None
+    inicio = fim = None
+    registros = 0
+    temporario = caminho_base + '.BIN.tmp'
+    with open(temporario, 'wb') as arquivo:
+        lote = []
+        pacote = _REGISTRO.pack
+        for ts, lat, lon, hectares, velocidade, hdop, qualidade in pontos:
+            if anterior is not None:
+                distancia += haversine(anterior[0], anterior[1], lat, lon)
+            else:
+                inicio = ts
+            anterior = (lat, lon)
+            fim = ts
+            area_ha += hectares or 0
+            dias, ms = divmod(ts, MS_POR_DIA)
+            valores = (largura_mm, round(area_ha * 10000), round(distancia * 1000),
+                       1 if (hectares or 0) > 0 else 0,
+                       round((velocidade or 0) / 3.6 * 1000))
+            campos = [ms, dias - DIAS_EPOCA_ISO, round(lat * ESCALA_GRAUS), round(lon * ESCALA_GRAUS),
+                      STATUS_INDISPONIVEL if qualidade is None else qualidade,
+                      SEM_HDOP if hdop is None else min(round(hdop * ESCALA_HDOP), SEM_HDOP - 1),
+                      len(DDIS)]
+            for i in indices:
+                campos.append(i)
+                campos.append(valores[i])
+            lote.append(pacote(*campos))
+            if len(lote) >= REGISTROS_POR_ESCRITA:
+                registros += len(lote)
+                arquivo.write(b''.join(lote))
+                lote = []
+        registros += len(lote)
+        arquivo.write(b''.join(lote))
+    os.replace(temporario, caminho_base + '.BIN')
+    _gravar_xml(_cabecalho_tlg(), caminho_base + '.XML')
+    return {'registros': registros, 'inicio_ms': inicio, 'fim_ms': fim,
+            'area_m2': area_ha * 10000, 'distancia_m': distancia}
+
+
+def _dispositivo(raiz):
+    dispositivo = ET.SubElement(raiz, 'DVC', A='DVC-1', B='Pulverizador', C=VERSAO_SOFTWARE,
+                                D='A00084000DE00001', F='00000000000000', G='FF000000007074')
+    elemento = ET.SubElement(dispositivo, 'DET', A='DET-1', B='1', C='1', D='Pulverizador', E='0', F='0')
+    for i, ddi in enumerate(DDIS, start=2):
+        ET.SubElement(elemento, 'DOR', A=str(i))
+    for i, ddi in enumerate(DDIS, start=2):
+        # Property 1: conjunto padrão; TriggerMethods 1: intervalo de tempo
+        ET.SubElement(dispositivo, 'DPD', A=str(i), B=f'{ddi:04X}', C='1', D='1', E=NOMES_DDI[ddi])
+
+
+def _contar(pontos, progresso, gravados, total):
+    """Repassa os pontos chamando progresso a cada REGISTROS_POR_ESCRITA"""
+    for i, ponto in enumerate(pontos, 1):
+        yield ponto
+        if i % REGISTROS_POR_ESCRITA == 0:
+            progresso(gravados + i, total)
+
+
+def _conectar(caminho_banco):
+    """Conexão sqlite3 ao banco já no esquema atual (default: o da conexão compartilhada)"""
+    caminho = caminho_banco or db.obter_conexao().caminho
+    db.migrar(caminho)
+    return sqlite3.connect(caminho)
+
+
+def exportar_taskdata(destino, sessoes=None, caminho_banco=None, progresso=None):
+    """
+    Exporta sessões do banco como ISOXML TaskData
+
+    Args:
+        destino: Pasta onde a pasta TASKDATA é criada
+        sessoes: ids das sessões (default: todas com pontos)
+        caminho_banco: Banco (default: o da conexão compartilhada)
+        progresso: Chamado com (pontos gravados, total); uma exceção
+                   levantada nele interrompe a exportação
+
+    Returns:
+        str: Caminho do TASKDATA.XML
+    """
+    db.sincronizar()  # Linhas do commit em grupo ainda pendentes
+    pasta = os.path.join(destino, PASTA_TASKDATA)
+    os.makedirs(pasta, exist_ok=True)
+    conn = _conectar(caminho_banco)
+    try:
+        fazenda = conn.execute('SELECT nome, largura_implemento FROM fazenda LIMIT 1').fetchone()
+        nome_fazenda = fazenda[0] if fazenda else 'Fazenda'
+
+        raiz = ET.Element('ISO11783_TaskData', VersionMajor=str(VERSAO_PRINCIPAL),
+                          VersionMinor=str(VERSAO_SECUNDARIA), ManagementSoftwareManufacturer=FABRICANTE,
+                          ManagementSoftwareVersion=VERSAO_SOFTWARE, TaskControllerManufacturer=FABRICANTE,
+                          TaskControllerVersion=VERSAO_SOFTWARE, DataTransferOrigin='2', DataTransferLanguage='pt')
+        ET.SubElement(raiz, 'CTR', A='CTR-1', B=nome_fazenda)
+        _dispositivo(raiz)
+        ET.SubElement(raiz, 'FRM', A='FRM-1', B=nome_fazenda, I='CTR-1')
+        talhao = ET.SubElement(raiz, 'PFD', A='PFD-1', C=nome_fazenda, D='0', E='CTR-1', F='FRM-1')
+        tarefas = []
+        area_total = 0.0
+        selecionadas = [sessao for sessao in db.obter_sessoes(conn)
+                        if sessoes is None or sessao['id'] in sessoes]
+        gravados = 0
+        if progresso is not None:
+            total = sum(db.contar_pontos(sessao['id'], conn) for sessao in selecionadas)
+
+        for sessao in selecionadas:
+            indice = len(tarefas) + 1
+            nome_tlg = f'TLG{indice:05d}'
+            largura = sessao['largura_implemento'] or (fazenda[1] if fazenda else 0)
+            pontos = db.iterar_pontos(COLUNAS_TLG, sessao['id'], conexao=conn)
+            if progresso is not None:
+                pontos = _contar(pontos, progresso, gravados, total)
+            resultado = gravar_tlg(pontos, os.path.join(pasta, nome_tlg), largura)
+            gravados += resultado['registros']
+            if not resultado['registros']:
+                for extensao in ('.BIN', '.XML'):
+                    os.remove(os.path.join(pasta, nome_tlg + extensao))
+                continue
+            area_total += resultado['area_m2']
+
+            # Id da tarefa = id da sessão (negativo: criado no controlador, não no FMIS)
+            tarefa = ET.Element('TSK', A=f"TSK-{sessao['id']}", B=sessao['nome'] or f"Sessão {sessao['id']}",
+                                C='CTR-1', D='FRM-1', E='PFD-1', G='4' if sessao['fim_ms'] else '3')
+            # TIM D=4: tempo efetivo de trabalho
+            ET.SubElement(tarefa, 'TIM', A=_data_hora(resultado['inicio_ms']),
+                          B=_data_hora(resultado['fim_ms']), D='4')
+            ET.SubElement(tarefa, 'TLG', A=nome_tlg)
+            tarefas.append(tarefa)
+
+        talhao.set('D', str(round(area_total)))
+        raiz.extend(tarefas)
+        caminho = os.path.join(pasta, ARQUIVO_TASKDATA)
+        _gravar_xml(raiz, caminho)
+        return caminho
+    finally:
+        conn.close()
+
+
+def _formato_registro(cabecalho):
+    """(formato struct do PTN, nomes dos campos do PTN, DDIs dos DLVs) a partir do XML do TLG"""
+    tempo = cabecalho.getroot() if isinstance(cabecalho, ET.ElementTree) else cabecalho
+    formato = '<'
+    nomes = []
+    if tempo.get('A') == '':
+        formato += 'I'
+        nomes.append('ms')
+    if tempo.get('B') == '':
+        raise ValueError("TLG com fim de tempo (TIM B) por registro não é suportado")
+    formato += 'H'
+    nomes.append('dias')
+    posicao = tempo.find('PTN')
+    if posicao is not None:
+        for atributo, codigo in _CAMPOS_PTN:
+            if posicao.get(atributo) == '':
+                formato += codigo
+                nomes.append(atributo)
+    ddis = [int(dlv.get('A'), 16) for dlv in tempo.findall('DLV')]
+    return formato, nomes, ddis
+
+
+def ler_tlg(caminho_base):
+    """
+    Decodifica um TLG pelo seu cabeçalho XML
+
+    Yields:
+        dict: ts (epoch-ms), latitude, longitude, status, hdop (se presentes) e
+        dlv ({DDI: valor}) de cada registro
+    """
+    formato, nomes, ddis = _formato_registro(ET.parse(caminho_base + '.XML'))
+    fixo = struct.Struct(formato)
+    with open(caminho_base + '.BIN', 'rb') as arquivo:
+        if not os.fstat(arquivo.fileno()).st_size:
+            return
+        dados = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield from _decodificar(dados, fixo, nomes, ddis)
+    finally:
+        dados.close()
+
+
+def _decodificar(dados, fixo, nomes, ddis):
+    valor_dlv = struct.Struct('<Bi')
+    offset = 0
+    while offset < len(dados):
+        campos = dict(zip(nomes, fixo.unpack_from(dados, offset)))
+        offset += fixo.size
+        quantidade = dados[offset]
+        offset += 1
+        dlv = {}
+        for _ in range(quantidade):
+            indice, valor = valor_dlv.unpack_from(dados, offset)
+            offset += valor_dlv.size
+            dlv[ddis[indice]] = valor
+        registro = {'ts': (campos['dias'] + DIAS_EPOCA_ISO) * MS_POR_DIA + campos.get('ms', 0), 'dlv': dlv}
+        if 'A' in campos:
+            registro['latitude'] = campos['A'] / ESCALA_GRAUS
+        if 'B' in campos:
+            registro['longitude'] = campos['B'] / ESCALA_GRAUS
+        if 'D' in campos:
+            registro['status'] = campos['D']
+        if 'F' in campos:
+            registro['hdop'] = None if campos['F'] == SEM_HDOP else campos['F'] / ESCALA_HDOP
+        yield registro
+
+
+def validar_taskdata(pasta, caminho_banco=None):
+    """
+    Ida e volta: relê TASKDATA.XML e os TLGs e compara com as sessões do banco
+
+    Confere as referências do XML (ids e arquivos dos TLGs) e, registro a
+    registro, tempo exato, posição dentro da resolução de 1e-7 grau, status,
+    HDOP, estado de trabalho, velocidade e área acumulada.
+
+    Args:
+        pasta: Pasta TASKDATA
+        caminho_banco: Banco de origem (default: o da conexão compartilhada)
+
+    Returns:
+        dict: tarefas, registros, erro_posicao_max (graus) e erros (lista vazia = válido)
+    """
+    erros = []
+    raiz = ET.parse(os.path.join(pasta, ARQUIVO_TASKDATA)).getroot()
+    if raiz.tag != 'ISO11783_TaskData':
+        erros.append(f"Raiz inesperada: {raiz.tag}")
+    ids = {elemento.get('A') for elemento in raiz if elemento.get('A')}
+    ddis_dispositivo = {int(dpd.get('B'), 16) for dpd in raiz.iter('DPD')}
+    elementos = {det.get('A') for det in raiz.iter('DET')}
+
+    conn = _conectar(caminho_banco)
+    sessoes = {f"TSK-{sessao['id']}": sessao for sessao in db.obter_sessoes(conn)}
+    registros = 0
+    erro_posicao = 0.0
+    tarefas = raiz.findall('TSK')
+    try:
+        for tarefa in tarefas:
+            for referencia in ('C', 'D', 'E'):
+                if tarefa.get(referencia) and tarefa.get(referencia) not in ids:
+                    erros.append(f"{tarefa.get('A')}: referência {tarefa.get(referencia)} inexistente")
+            sessao = sessoes.get(tarefa.get('A'))
+            if sessao is None:
+                erros.append(f"{tarefa.get('A')}: sessão não está no banco")
+                continue
+            for log in tarefa.findall('TLG'):
+                base = os.path.join(pasta, log.get('A'))
+                if not (os.path.exists(base + '.XML') and os.path.exists(base + '.BIN')):
+                    erros.append(f"{log.get('A')}: arquivos ausentes")
+                    continue
+                for dlv in ET.parse(base + '.XML').getroot().findall('DLV'):
+                    if int(dlv.get('A'), 16) not in ddis_dispositivo or dlv.get('C') not in elementos:
+                        erros.append(f"{log.get('A')}: DLV {dlv.get('A')} sem DPD/DET no dispositivo")
+
+                area_ha = 0.0
+                originais = db.iterar_pontos(COLUNAS_TLG, sessao['id'], conexao=conn)
+                for numero, registro in enumerate(ler_tlg(base)):
+                    original = next(originais, None)
+                    if original is None:
+                        erros.append(f"{log.get('A')}: registros além dos pontos do banco")
+                        break
+                    ts, lat, lon, hectares, velocidade, hdop, qualidade = original
+                    area_ha += hectares or 0
+                    registros += 1
+                    diferencas = []
+                    if registro['ts'] != ts:
+                        diferencas.append('tempo')
+                    desvio = max(abs(registro['latitude'] - lat), abs(registro['longitude'] - lon))
+                    erro_posicao = max(erro_posicao, desvio)
+                    if desvio > 0.5 / ESCALA_GRAUS + 1e-12:
+                        diferencas.append('posição')
+                    if registro['status'] != (STATUS_INDISPONIVEL if qualidade is None else qualidade):
+                        diferencas.append('status')
+                    if (registro['hdop'] is None) != (hdop is None) or (
+                            hdop is not None and abs(registro['hdop'] - hdop) > 0.5 / ESCALA_HDOP + 1e-9):
+                        diferencas.append('hdop')
+                    dlv = registro['dlv']
+                    if dlv.get(DDI_ESTADO_TRABALHO) != (1 if (hectares or 0) > 0 else 0):
+                        diferencas.append('estado de trabalho')
+                    if abs(dlv.get(DDI_VELOCIDADE, 0) - (velocidade or 0) / 3.6 * 1000) > 0.5 + 1e-6:
+                        diferencas.append('velocidade')
+                    if abs(dlv.get(DDI_AREA_TOTAL, 0) - area_ha * 10000) > 0.5 + 1e-6:
+                        diferencas.append('área')
+                    if diferencas:
+                        erros.append(f"{log.get('A')} registro {numero}: {', '.join(diferencas)}")
+                        if len(erros) > 100:
+                            return {'tarefas': len(tarefas), 'registros': registros,
+                                    'erro_posicao_max': erro_posicao, 'erros': erros}
+                if next(originais, None) is not None:
+                    erros.append(f"{log.get('A')}: faltam pontos do banco no TLG")
+    finally:
+        conn.close()
+    return {'tarefas': len(tarefas), 'registros': registros, 'erro_posicao_max': erro_posicao, 'erros': erros}
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Exporta sessões do banco como ISOXML TaskData")
+    parser.add_argument('destino', help="Pasta onde a pasta TASKDATA é criada")
+    parser.add_argument('--banco', default=db.CAMINHO_BANCO)
+    parser.add_argument('--sessao', type=int, action='append', help="Sessão a exportar (default: todas)")
+    parser.add_argument('--validar', action='store_true', help="Relê a exportação e compara com o banco")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    caminho = exportar_taskdata(args.destino, args.sessao, args.banco)
+    print(f"{caminho} em {time.perf_counter() - inicio:.2f} s")
+    if args.validar:
+        inicio = time.perf_counter()
+        resultado = validar_taskdata(os.path.dirname(caminho), args.banco)
+        print(f"{resultado['tarefas']} tarefas, {resultado['registros']} registros conferidos em "
+              f"{time.perf_counter() - inicio:.2f} s (erro de posição máx. {resultado['erro_posicao_max']:.1e} grau)")
+        for erro in resultado['erros']:
+            print(f"  {erro}")
+        sys.exit(1 if resultado['erros'] else 0)
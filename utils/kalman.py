@@ -0,0 +1,258 @@
+import math
+
+RAIO_TERRA = 6371e3
+
+# Erro de posição equivalente a HDOP 1 (UERE típico de receptor autônomo)
+UERE_PADRAO = 2.5
+
+
+class _EixoKalman:
+    """Filtro de velocidade constante em um eixo: estado (pos, vel) e covariância 2x2"""
+    __slots__ = ('pos', 'vel', 'ppp', 'ppv', 'pvv')
+
+    def __init__(self, pos, vel, var_pos, var_vel):
+        self.pos = pos
+        self.vel = vel
+        self.ppp = var_pos
+        self.ppv = 0.0
+        self.pvv = var_vel
+
+    def prever(self, dt, q):
+        dt2 = dt * dt
+        self.pos += self.vel * dt
+        self.ppp += 2 * dt * self.ppv + dt2 * self.pvv + q * dt2 * dt / 3
+        self.ppv += dt * self.pvv + q * dt2 / 2
+        self.pvv += q * dt
+
+    def corrigir_posicao(self, z, r):
+        s = self.ppp + r
+        kp = self.ppp / s
+        kv = self.ppv / s
+        inovacao = z - self.pos
+        self.pos += kp * inovacao
+        self.vel += kv * inovacao
+        self.pvv -= kv * self.ppv
+        self.ppv -= kp * self.ppv
+        self.ppp -= kp * self.ppp
+        return inovacao
+
+    def corrigir_velocidade(self, z, r):
+        s = self.pvv + r
+        kp = self.ppv / s
+        kv = self.pvv / s
+        inovacao = z - self.vel
+        self.pos += kp * inovacao
+        self.vel += kv * inovacao
+        self.ppp -= kp * self.ppv
+        self.ppv -= kv * self.ppv
+        self.pvv -= kv * self.pvv
+
+
+class FiltroKalmanENU:
+    def __init__(self, ruido_aceleracao=0.5, sigma_velocidade=0.3, usar_taxa_giro=True,
+                 uere=UERE_PADRAO, sigma_posicao_padrao=3.0):
+        """
+        Filtro de Kalman de posição/velocidade em um plano local ENU
+
+        O modelo é de velocidade constante com aceleração branca; os eixos
+        leste e norte são filtrados de forma independente, então cada
+        atualização custa O(1) sem nenhuma matriz. Opcionalmente a taxa de
+        giro estimada pelo curso é usada para curvar a predição (modelo de
+        giro constante), o que melhora a ponte em cabeceiras.
+
+        Args:
+            ruido_aceleracao: Densidade espectral da aceleração (m²/s³)
+            sigma_velocidade: Desvio padrão da velocidade medida (m/s)
+            usar_taxa_giro: Curvar a predição pela taxa de giro estimada
+            uere: Erro de posição (m) por unidade de HDOP
+            sigma_posicao_padrao: Desvio padrão usado sem HDOP/sigma (m)
+        """
+        self.ruido_aceleracao = ruido_aceleracao
+        self.sigma_velocidade = sigma_velocidade
+        self.usar_taxa_giro = usar_taxa_giro
+        self.uere = uere
+        self.sigma_posicao_padrao = sigma_posicao_padrao
+        self.resetar()
+
+    def resetar(self):
+        """Descarta o estado do filtro e a origem do plano local"""
+        self.lat_origem = None
+        self.lon_origem = None
+        self._m_por_grau_lat = 0.0
+        self._m_por_grau_lon = 0.0
+        self._leste = None
+        self._norte = None
+        self.instante = None
+        self.taxa_giro = 0.0  # rad/s
+        self._curso_anterior = None
+        self.total_atualizacoes = 0
+
+    @property
+    def inicializado(self):
+        return self._leste is not None
+
+    def _definir_origem(self, lat, lon):
+        self.lat_origem = lat
+        self.lon_origem = lon
+        self._m_por_grau_lat = math.radians(1) * RAIO_TERRA
+        self._m_por_grau_lon = self._m_por_grau_lat * math.cos(math.radians(lat))
+
+    def para_enu(self, lat, lon):
+        """Converte lat/lon para metros (leste, norte) em relação à origem"""
+        return ((lon - self.lon_origem) * self._m_por_grau_lon,
+                (lat - self.lat_origem) * self._m_por_grau_lat)
+
+    def para_geodesico(self, leste, norte):
+        """Converte metros (leste, norte) para lat/lon"""
+        return (self.lat_origem + norte / self._m_por_grau_lat,
+                self.lon_origem + leste / self._m_por_grau_lon)
+
+    def atualizar(self, instante, latitude, longitude, velocidade_kmh=None, curso=None,
+                  sigma_h=None, hdop=None):
+        """
+        Incorpora um novo fix
+
+        Args:
+            instante: Instante do fix em segundos (mesmo relógio das consultas)
+            latitude: Latitude em graus decimais
+            longitude: Longitude em graus decimais
+            velocidade_kmh: Velocidade medida (opcional)
+            curso: Curso sobre o solo em graus (opcional)
+            sigma_h: Desvio padrão horizontal informado pelo receptor (m)
+            hdop: HDOP do fix (usado se sigma_h não for informado)
+
+        Returns:
+            tuple: Estimativa (latitude, longitude, velocidade_kmh, direcao)
+        """
+        if sigma_h is None:
+            sigma_h = hdop * self.uere if hdop else self.sigma_posicao_padrao
+        # Cada eixo recebe metade da variância horizontal
+        r_pos = sigma_h * sigma_h / 2
+
+        vel_medida = None
+        if velocidade_kmh is not None and curso is not None:
+            v = velocidade_kmh / 3.6
+            rumo = math.radians(curso)
+            vel_medida = (v * math.sin(rumo), v * math.cos(rumo))
+
+        if not self.inicializado:
+            if self.lat_origem is None:
+                self._definir_origem(latitude, longitude)
+            leste, norte = self.para_enu(latitude, longitude)
+            ve, vn = vel_medida if vel_medida else (0.0, 0.0)
+            var_vel = self.sigma_velocidade ** 2 if vel_medida else 25.0
+            self._leste = _EixoKalman(leste, ve, r_pos, var_vel)
+            self._norte = _EixoKalman(norte, vn, r_pos, var_vel)
+            self.instante = instante
+            self.total_atualizacoes = 1
+            self._atualizar_taxa_giro(curso, velocidade_kmh, 0.0)
+            return self.estimar(instante)
+
+        dt = instante - self.instante
+        if dt > 0:
+            self._prever_estado(dt)
+            self.instante = instante
+
+        leste, norte = self.para_enu(latitude, longitude)
+        self._leste.corrigir_posicao(leste, r_pos)
+        self._norte.corrigir_posicao(norte, r_pos)
+
+        if vel_medida:
+            r_vel = self.sigma_velocidade ** 2
+            self._leste.corrigir_velocidade(vel_medida[0], r_vel)
+            self._norte.corrigir_velocidade(vel_medida[1], r_vel)
+
+        self._atualizar_taxa_giro(curso, velocidade_kmh, dt)
+        self.total_atualizacoes += 1
+        return self.estimar(instante)
+
+    def _atualizar_taxa_giro(self, curso, velocidade_kmh, dt):
+        if not self.usar_taxa_giro or curso is None:
+            return
+        # Curso é ruidoso em baixa velocidade
+        if velocidade_kmh is None or velocidade_kmh < 2.0:
+            self._curso_anterior = None
+            self.taxa_giro = 0.0
+            return
+        if self._curso_anterior is not None and dt > 0:
+            delta = (curso - self._curso_anterior + 180.0) % 360.0 - 180.0
+            taxa = math.radians(delta) / dt
+            self.taxa_giro += 0.3 * (taxa - self.taxa_giro)
+        self._curso_anterior = curso
+
+    def _prever_estado(self, dt):
+        leste, norte = self._leste, self._norte
+        omega = self.taxa_giro
+        if omega and abs(omega * dt) > 1e-6:
+            # Giro constante: integra a posição sobre o arco e gira a velocidade
+            s, c = math.sin(omega * dt), math.cos(omega * dt)
+            ve, vn = leste.vel, norte.vel
+            # Rumo medido a partir do norte, sentido horário
+            de = (ve * s + vn * (1 - c)) / omega
+            dn = (vn * s - ve * (1 - c)) / omega
+            leste.prever(dt, self.ruido_aceleracao)
+            norte.prever(dt, self.ruido_aceleracao)
+            leste.pos += de - ve * dt
+            norte.pos += dn - vn * dt
+            leste.vel = ve * c + vn * s
+            norte.vel = vn * c - ve * s
+        else:
+            leste.prever(dt, self.ruido_aceleracao)
+            norte.prever(dt, self.ruido_aceleracao)
+
+    def estimar(self, instante):
+        """
+        Estima o estado em qualquer instante sem alterar o filtro
+
+        Args:
+            instante: Instante da consulta (pode ser entre fixes ou após o último)
+
+        Returns:
+            tuple: (latitude, longitude, velocidade_kmh, direcao) ou None
+        """
+        if not self.inicializado:
+            return None
+
+        leste, norte = self._leste, self._norte
+        dt = instante - self.instante
+        e, n, ve, vn = leste.pos, norte.pos, leste.vel, norte.vel
+        if dt > 0:
+            omega = self.taxa_giro
+            if omega and abs(omega * dt) > 1e-6:
+                s, c = math.sin(omega * dt), math.cos(omega * dt)
+                e += (ve * s + vn * (1 - c)) / omega
+                n += (vn * s - ve * (1 - c)) / omega
+                ve, vn = ve * c + vn * s, vn * c - ve * s
+            else:
+                e += ve * dt
+                n += vn * dt
+
+        lat, lon = self.para_geodesico(e, n)
+        velocidade = math.hypot(ve, vn)
+        direcao = math.degrees(math.atan2(ve, vn)) % 360.0
+        return (lat, lon, velocidade * 3.6, direcao)
+
+    def incerteza_posicao(self, instante=None):
+        """
+        Desvio padrão horizontal estimado (m), opcionalmente projetado no tempo
+
+        Args:
+            instante: Instante da consulta (default: último fix)
+
+        Returns:
+            float: Desvio padrão em metros ou None
+        """
+        if not self.inicializado:
+            return None
+        dt = 0.0 if instante is None else max(0.0, instante - self.instante)
+        q = self.ruido_aceleracao
+        variancia = 0.0
+        for eixo in (self._leste, self._norte):
+            variancia += (eixo.ppp + 2 * dt * eixo.ppv + dt * dt * eixo.pvv + q * dt ** 3 / 3)
+        return math.sqrt(variancia)
+
+    def tempo_desde_atualizacao(self, instante):
+        """Segundos desde o último fix incorporado"""
+        if self.instante is None:
+            return None
+        return instante - self.instante
@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import deque
+
+# Etapas medidas, em ordem no caminho do fix. A latência de cada etapa é o
+# tempo desde a chegada dos bytes na porta serial (FixGNSS.instante, base
+# time.monotonic()) até o fim da etapa.
+LEITURA = 'leitura'   # bytes lidos da porta até a sentença ser enquadrada
+PARSE = 'parse'       # época montada (última sentença decodificada)
+FILTRO = 'filtro'     # fix validado e incorporado ao filtro de Kalman
+BANCO = 'banco'       # ponto gravado no banco (commit)
+TELA = 'tela'         # canvas do mapa atualizado com o fix
+
+ETAPAS = (LEITURA, PARSE, FILTRO, BANCO, TELA)
+
+PERCENTIS = (50, 95, 99)
+
+
+class HistogramaLatencia:
+    def __init__(self, janela=2048):
+        """
+        Janela deslizante das últimas latências de uma etapa
+
+        O registro é O(1); os percentis são calculados só na consulta
+        (ordenação da janela), que acontece no máximo algumas vezes por
+        segundo.
+
+        Args:
+            janela: Número de amostras mantidas
+        """
+        self.amostras = deque(maxlen=janela)
+        self.total = 0
+        self.maximo = 0.0
+
+    def registrar(self, latencia):
+        self.amostras.append(latencia)
+        self.total += 1
+        if latencia > self.maximo:
+            self.maximo = latencia
+
+    def percentis(self, percentis=PERCENTIS):
+        """
+        Returns:
+            dict: {'p50': s, 'p95': s, 'p99': s, 'max': s, 'amostras': n} ou None sem amostras
+        """
+        ordenadas = sorted(self.amostras)
+        if not ordenadas:
+            return None
+        n = len(ordenadas)
+        resultado = {f'p{p}': ordenadas[min(n - 1, int(p / 100 * n))] for p in percentis}
+        resultado['max'] = ordenadas[-1]
+        resultado['max_total'] = self.maximo
+        resultado['amostras'] = self.total
+        return resultado
+
+
+class MonitorLatencia:
+    def __init__(self, janela=2048, relogio=time.monotonic):
+        """
+        Latência ponta a ponta por etapa, do byte na UART ao quadro desenhado
+
+        Args:
+            janela: Amostras por etapa na janela deslizante
+            relogio: Relógio comum a todas as marcas (o mesmo dos instantes de chegada)
+        """
+        self.janela = janela
+        self.relogio = relogio
+        self.ativo = True
+        self._trava = threading.Lock()
+        self._histogramas = {etapa: HistogramaLatencia(janela) for etapa in ETAPAS}
+
+    def registrar(self, etapa, instante_chegada, agora=None):
+        """
+        Registra o fim de uma etapa para um fix
+
+        Args:
+            etapa: Uma das ETAPAS
+            instante_chegada: Instante de chegada dos bytes do fix (FixGNSS.instante)
+            agora: Instante do fim da etapa (default: relógio atual)
+
+        Returns:
+            float: Latência em segundos, ou None se o monitor estiver desligado
+        """
+        if not self.ativo or instante_chegada is None:
+            return None
+        latencia = (self.relogio() if agora is None else agora) - instante_chegada
+        with self._trava:
+            histograma = self._histogramas.get(etapa)
+            if histograma is None:
+                histograma = self._histogramas[etapa] = HistogramaLatencia(self.janela)
+            histograma.registrar(latencia)
+        return latencia
+
+    def obter_percentis(self):
+        """
+        Returns:
+            dict: {etapa: {'p50', 'p95', 'p99', 'max', 'max_total', 'amostras'}} das
+                  etapas com amostras, em segundos
+        """
+        with self._trava:
+            resultado = {}
+            for etapa, histograma in self._histogramas.items():
+                percentis = histograma.percentis()
+                if percentis:
+                    resultado[etapa] = percentis
+            return resultado
+
+    def verificar_orcamento(self, orcamento, etapa=TELA, percentil=95):
+        """
+        Verifica se a latência de uma etapa cabe no orçamento
+
+        Args:
+            orcamento: Latência máxima em segundos
+            etapa: Etapa verificada (default: tela, ponta a ponta)
+            percentil: Percentil comparado (50, 95 ou 99)
+
+        Returns:
+            bool: True se dentro do orçamento, None se ainda não há amostras
+        """
+        percentis = self.obter_percentis().get(etapa)
+        if not percentis:
+            return None
+        return percentis[f'p{percentil}'] <= orcamento
+
+    def formatar(self):
+        """Texto de uma linha por etapa, em milissegundos (sobreposição de depuração)"""
+        linhas = []
+        for etapa, p in self.obter_percentis().items():
+            linhas.append(f"{etapa:<8} p50 {p['p50'] * 1000:6.1f}  p95 {p['p95'] * 1000:6.1f}  "
+                          f"p99 {p['p99'] * 1000:6.1f} ms")
+        return '\n'.join(linhas)
+
+    def resetar(self):
+        with self._trava:
+            self._histogramas = {etapa: HistogramaLatencia(self.janela) for etapa in ETAPAS}
+
+
+# Monitor do processo: as etapas ficam em módulos e threads diferentes
+monitor = MonitorLatencia()
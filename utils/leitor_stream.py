@@ -0,0 +1,216 @@
+import time
+from utils.ubx import SYNC_UBX, TAMANHO_CABECALHO, TAMANHO_MAX_PAYLOAD, frame_valido
+
+
+class LeitorStreamGNSS:
+    def __init__(self, fonte, tamanho_max_buffer=65536, tamanho_max_sentenca=512,
+                 relogio=None, gravador=None):
+        """
+        Inicializa o leitor contínuo de sentenças NMEA e frames UBX
+
+        Em vez de chamar readline() uma vez por ponto, o leitor lê em bloco
+        tudo o que já está disponível na porta serial e separa as sentenças
+        de forma incremental, preservando o instante de chegada de cada uma.
+        Sentenças NMEA ('$' ... '\\n') e frames binários UBX (0xB5 0x62)
+        podem vir intercalados no mesmo stream.
+
+        Args:
+            fonte: Objeto compatível com serial.Serial (read, in_waiting, is_open)
+            tamanho_max_buffer: Limite de bytes pendentes sem frame completo
+            tamanho_max_sentenca: Tamanho máximo aceito para uma sentença
+            relogio: Função que retorna o instante atual em segundos (default:
+                     relógio da fonte, se houver, ou time.monotonic)
+            gravador: GravadorBruto opcional que recebe cópia dos bytes lidos
+        """
+        self.fonte = fonte
+        self.tamanho_max_buffer = tamanho_max_buffer
+        self.tamanho_max_sentenca = tamanho_max_sentenca
+        if relogio is None:
+            # Fontes de replay fornecem o relógio da gravação
+            relogio = getattr(fonte, 'relogio', time.monotonic)
+        self.relogio = relogio
+        self.gravador = gravador
+        self._buffer = bytearray()
+
+        # Contadores
+        self.bytes_lidos = 0
+        self.leituras = 0
+        self.sentencas_lidas = 0
+        self.sentencas_truncadas = 0
+        self.frames_ubx = 0
+        self.erros_checksum_ubx = 0
+        self.bytes_descartados = 0
+        self.overruns = 0
+
+    def ler_disponivel(self):
+        """
+        Lê de uma vez todos os bytes disponíveis na fonte
+
+        Se não houver nada pendente, bloqueia lendo 1 byte até o timeout
+        da porta, evitando espera ativa.
+
+        Returns:
+            list: Lista de tuplas (instante_chegada, sentenca_bytes)
+        """
+        pendentes = self.fonte.in_waiting
+        dados = self.fonte.read(pendentes if pendentes > 0 else 1)
+        if not dados:
+            return []
+        if self.gravador is not None:
+            self.gravador.gravar(dados)
+        return self.alimentar(dados, self.relogio())
+
+    def alimentar(self, dados, instante=None):
+        """
+        Acrescenta bytes ao buffer e extrai as sentenças completas
+
+        Args:
+            dados: Bytes recebidos
+            instante: Instante de chegada (default: relógio atual)
+
+        Returns:
+            list: Lista de tuplas (instante_chegada, sentenca_bytes)
+        """
+        if instante is None:
+            instante = self.relogio()
+
+        self.bytes_lidos += len(dados)
+        self.leituras += 1
+
+        buffer = self._buffer
+        buffer += dados
+        sentencas = []
+        pos = self._varrer(buffer, instante, sentencas)
+
+        if pos:
+            del buffer[:pos]
+
+        # Buffer cresceu sem nenhum frame completo: dados corrompidos
+        if len(buffer) > self.tamanho_max_buffer:
+            self.bytes_descartados += len(buffer)
+            self.overruns += 1
+            buffer.clear()
+
+        return sentencas
+
+    def _proximo_inicio(self, buffer, pos, fim=None):
+        """Posição do próximo '$' ou sincronismo UBX a partir de pos (-1 se nenhum)"""
+        if fim is None:
+            fim = len(buffer)
+        dolar = buffer.find(b'$', pos, fim)
+        sync = buffer.find(SYNC_UBX, pos, fim)
+        if dolar < 0:
+            return sync
+        if sync < 0:
+            return dolar
+        return min(dolar, sync)
+
+    def _varrer(self, buffer, instante, sentencas):
+        """
+        Extrai todos os frames completos do buffer
+
+        Returns:
+            int: Posição até onde o buffer já foi consumido
+        """
+        pos = 0
+        tamanho = len(buffer)
+
+        while pos < tamanho:
+            inicio = self._proximo_inicio(buffer, pos)
+            if inicio < 0:
+                # Mantém um possível 0xB5 no final, início de um frame UBX
+                manter = 1 if buffer[tamanho - 1] == 0xB5 else 0
+                self.bytes_descartados += tamanho - manter - pos
+                return tamanho - manter
+            self.bytes_descartados += inicio - pos
+            pos = inicio
+
+            if buffer[pos] == 0x24:  # '$'
+                fim = buffer.find(b'\n', pos)
+                limite = fim if fim >= 0 else tamanho
+                interrupcao = self._proximo_inicio(buffer, pos + 1, limite)
+                if interrupcao >= 0:
+                    # Bytes perdidos no meio da sentença: recomeça no próximo início
+                    self.sentencas_truncadas += 1
+                    self.bytes_descartados += interrupcao - pos
+                    pos = interrupcao
+                    continue
+                if fim < 0:
+                    if tamanho - pos > self.tamanho_max_sentenca:
+                        self.sentencas_truncadas += 1
+                        self.bytes_descartados += tamanho - pos
+                        return tamanho
+                    return pos
+                self._extrair_sentenca(buffer, pos, fim, instante, sentencas)
+                pos = fim + 1
+            else:
+                if tamanho - pos < TAMANHO_CABECALHO:
+                    return pos
+                comprimento = buffer[pos + 4] | (buffer[pos + 5] << 8)
+                if comprimento > TAMANHO_MAX_PAYLOAD:
+                    self.bytes_descartados += 1
+                    pos += 1
+                    continue
+                total = TAMANHO_CABECALHO + comprimento + 2
+                if tamanho - pos < total:
+                    return pos
+                if not frame_valido(buffer, pos):
+                    self.erros_checksum_ubx += 1
+                    self.bytes_descartados += 1
+                    pos += 1
+                    continue
+                sentencas.append((instante, bytes(buffer[pos:pos + total])))
+                self.frames_ubx += 1
+                pos += total
+
+        return pos
+
+    def _extrair_sentenca(self, buffer, inicio, fim, instante, sentencas):
+        """Extrai a sentença NMEA entre inicio ('$') e fim ('\\n')"""
+        if fim > inicio and buffer[fim - 1] == 0x0D:  # '\r'
+            fim -= 1
+        if fim - inicio > self.tamanho_max_sentenca:
+            self.sentencas_truncadas += 1
+            self.bytes_descartados += fim - inicio
+            return
+
+        sentencas.append((instante, bytes(buffer[inicio:fim])))
+        self.sentencas_lidas += 1
+
+    def sentencas(self, continuar=None):
+        """
+        Gera continuamente as sentenças recebidas
+
+        Args:
+            continuar: Função opcional; a leitura para quando retornar False
+
+        Yields:
+            tuple: (instante_chegada, sentenca_bytes) - frames UBX começam com 0xB5 0x62
+        """
+        while continuar is None or continuar():
+            for item in self.ler_disponivel():
+                yield item
+
+    def limpar(self):
+        """Descarta bytes pendentes no buffer"""
+        self.bytes_descartados += len(self._buffer)
+        self._buffer.clear()
+
+    def obter_estatisticas(self):
+        """
+        Retorna contadores do leitor
+
+        Returns:
+            dict: Estatísticas de leitura
+        """
+        return {
+            'bytes_lidos': self.bytes_lidos,
+            'leituras': self.leituras,
+            'sentencas_lidas': self.sentencas_lidas,
+            'sentencas_truncadas': self.sentencas_truncadas,
+            'frames_ubx': self.frames_ubx,
+            'erros_checksum_ubx': self.erros_checksum_ubx,
+            'bytes_descartados': self.bytes_descartados,
+            'overruns': self.overruns,
+            'bytes_pendentes': len(self._buffer)
+        }
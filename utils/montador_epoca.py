@@ -0,0 +1,266 @@
+from utils.nmea_parser import SentencaRMC, SentencaGGA, SentencaVTG, SentencaGSA, SentencaGST
+from utils.ubx import UBXNavPVT, UBXNavDOP
+
+# Tipos de sentença contados em cada época
+_RMC = 0x01
+_GGA = 0x02
+_VTG = 0x04
+_GSA = 0x08
+_GST = 0x10
+
+# Diferença mínima (s) entre horas UTC para considerar uma nova época
+_TOLERANCIA_HORA = 1e-3
+
+# Com NAV-PVT chegando, épocas NMEA até esse tempo (s) depois do último PVT são
+# a mesma solução repetida (receptor com NMEA e UBX ligados) e são descartadas
+JANELA_PVT = 2.0
+
+_SEGUNDOS_DIA = 86400
+
+
+class FixGNSS:
+    __slots__ = ('hora', 'instante', 'latitude', 'longitude', 'velocidade_kmh', 'curso',
+                 'qualidade', 'tipo_fix', 'satelites', 'hdop', 'pdop', 'altitude',
+                 'sigma_h', 'valido')
+
+    def __init__(self, hora=None, instante=None):
+        self.hora = hora
+        self.instante = instante
+        self.latitude = None
+        self.longitude = None
+        self.velocidade_kmh = None
+        self.curso = None
+        self.qualidade = None
+        self.tipo_fix = None
+        self.satelites = None
+        self.hdop = None
+        self.pdop = None
+        self.altitude = None
+        self.sigma_h = None
+        self.valido = True
+
+    def como_ponto(self):
+        """
+        Retorna o fix no formato usado pelo restante do sistema
+
+        Returns:
+            tuple: (latitude, longitude, velocidade_kmh, direcao)
+        """
+        return (self.latitude, self.longitude, self.velocidade_kmh or 0, self.curso or 0)
+
+
+class MontadorEpoca:
+    def __init__(self):
+        """
+        Agrupa sentenças NMEA de uma mesma época (hora UTC) em um único FixGNSS
+
+        Os tipos de sentença vistos em cada época, e quantas de cada (um
+        receptor multiconstelação manda um GSA por sistema), são aprendidos;
+        assim que a época atual contém todas as sentenças esperadas o fix é
+        emitido, sem esperar a primeira sentença da época seguinte.
+
+        NAV-PVT tem prioridade: enquanto chega, as épocas NMEA da mesma hora
+        são descartadas, para que cada época vire um único fix.
+        """
+        self._atual = None
+        self._contagem = {}
+        self._esperados = {}
+        # A época começa por sentença com hora (RMC/GGA)? Aprendido como _esperados
+        self._abre_com_hora = False
+        self._abriu_com_hora = False
+        # Época fechada antes da hora seguinte: GSA/VTG sem hora que ainda chegarem são dela
+        self._recem_fechado = None
+        self._dop_ubx = None
+        self._hora_pvt = None  # Hora UTC (s do dia) do último NAV-PVT
+
+        self._tratadores = {
+            SentencaRMC: (_RMC, self._aplicar_rmc),
+            SentencaGGA: (_GGA, self._aplicar_gga),
+            SentencaVTG: (_VTG, self._aplicar_vtg),
+            SentencaGSA: (_GSA, self._aplicar_gsa),
+            SentencaGST: (_GST, self._aplicar_gst),
+        }
+
+        # Estatísticas
+        self.epocas_emitidas = 0
+        self.epocas_descartadas = 0
+        self.epocas_duplicadas = 0
+
+    def adicionar(self, msg, instante=None):
+        """
+        Adiciona uma mensagem decodificada
+
+        Args:
+            msg: Registro do ParserNMEA ou do DecodificadorUBX
+            instante: Instante de chegada da mensagem
+
+        Returns:
+            list: Fixes de épocas concluídas (normalmente vazia ou com um item)
+        """
+        tipo = type(msg)
+        if tipo is UBXNavPVT:
+            return self._adicionar_pvt(msg, instante)
+        if tipo is UBXNavDOP:
+            self._dop_ubx = msg
+            return []
+
+        entrada = self._tratadores.get(tipo)
+        if entrada is None:
+            return []
+        bit, aplicar = entrada
+
+        emitidos = []
+        hora = getattr(msg, 'hora', None)
+        atual = self._atual
+        if (hora is not None and atual is not None and atual.hora is not None
+                and abs(hora - atual.hora) > _TOLERANCIA_HORA):
+            self._fechar(emitidos, aprender=True)
+            atual = None
+
+        if atual is None:
+            if hora is None and self._recem_fechado is not None and self._abre_com_hora:
+                # Sobra da época recém-emitida (ex.: um GSA a mais): não abre uma época sem hora
+                aplicar(self._recem_fechado, msg)
+                self._esperados[bit] = self._esperados.get(bit, 0) + 1
+                return emitidos
+            atual = self._atual = FixGNSS(hora, instante)
+            self._contagem = {}
+            self._abriu_com_hora = hora is not None
+            self._recem_fechado = None
+        elif atual.hora is None:
+            atual.hora = hora
+
+        aplicar(atual, msg)
+        contagem = self._contagem
+        contagem[bit] = contagem.get(bit, 0) + 1
+
+        esperados = self._esperados
+        if esperados and all(contagem.get(b, 0) >= n for b, n in esperados.items()):
+            self._recem_fechado = atual
+            self._fechar(emitidos)
+
+        return emitidos
+
+    def finalizar(self):
+        """
+        Fecha a época em andamento (fim do stream)
+
+        Returns:
+            list: Fix da época pendente, se válido
+        """
+        emitidos = []
+        if self._atual is not None:
+            self._fechar(emitidos, aprender=True)
+        return emitidos
+
+    def _fechar(self, emitidos, aprender=False):
+        fix = self._atual
+        self._atual = None
+        if aprender:
+            # Época fechada pela hora seguinte: tem todas as sentenças do receptor
+            self._esperados = self._contagem
+            self._abre_com_hora = self._abriu_com_hora
+            self._recem_fechado = None
+        self._contagem = {}
+
+        if self._coberta_por_pvt(fix.hora):
+            self.epocas_duplicadas += 1
+            return
+        if not fix.valido or fix.latitude is None or fix.longitude is None:
+            self.epocas_descartadas += 1
+            return
+        self.epocas_emitidas += 1
+        emitidos.append(fix)
+
+    def _coberta_por_pvt(self, hora):
+        """A época NMEA dessa hora já veio (ou vem logo) como NAV-PVT"""
+        if self._hora_pvt is None:
+            return False
+        if hora is None:
+            return True
+        # Diferença em (-12 h, 12 h]: atravessa a meia-noite UTC
+        diferenca = (hora - self._hora_pvt + _SEGUNDOS_DIA / 2) % _SEGUNDOS_DIA - _SEGUNDOS_DIA / 2
+        return diferenca < JANELA_PVT
+
+    def _adicionar_pvt(self, msg, instante):
+        # NAV-PVT já é uma época completa
+        self._hora_pvt = msg.segundos_do_dia
+        fix = FixGNSS(msg.segundos_do_dia, instante)
+        fix.latitude = msg.latitude
+        fix.longitude = msg.longitude
+        fix.velocidade_kmh = msg.velocidade_kmh
+        fix.curso = msg.rumo
+        fix.tipo_fix = msg.tipo_fix
+        fix.qualidade = 1 if msg.fix_ok else 0
+        fix.satelites = msg.satelites
+        fix.pdop = msg.pdop
+        fix.altitude = msg.altitude
+        fix.sigma_h = msg.precisao_h
+        fix.valido = msg.fix_ok and msg.tipo_fix >= 2
+
+        dop = self._dop_ubx
+        if dop is not None and dop.itow == msg.itow:
+            fix.hdop = dop.hdop
+
+        if not fix.valido:
+            self.epocas_descartadas += 1
+            return []
+        self.epocas_emitidas += 1
+        return [fix]
+
+    @staticmethod
+    def _aplicar_rmc(fix, msg):
+        if not msg.valido:
+            fix.valido = False
+        fix.latitude = msg.latitude
+        fix.longitude = msg.longitude
+        if msg.velocidade_nos is not None:
+            fix.velocidade_kmh = msg.velocidade_kmh
+        if msg.curso is not None:
+            fix.curso = msg.curso
+
+    @staticmethod
+    def _aplicar_gga(fix, msg):
+        if msg.qualidade == 0:
+            fix.valido = False
+        if fix.latitude is None:
+            fix.latitude = msg.latitude
+            fix.longitude = msg.longitude
+        fix.qualidade = msg.qualidade
+        fix.satelites = msg.satelites
+        fix.hdop = msg.hdop
+        fix.altitude = msg.altitude
+
+    @staticmethod
+    def _aplicar_vtg(fix, msg):
+        if fix.velocidade_kmh is None and msg.velocidade_kmh is not None:
+            fix.velocidade_kmh = msg.velocidade_kmh
+        if fix.curso is None and msg.curso is not None:
+            fix.curso = msg.curso
+
+    @staticmethod
+    def _aplicar_gsa(fix, msg):
+        fix.tipo_fix = msg.tipo_fix
+        fix.pdop = msg.pdop
+        if msg.hdop is not None:
+            fix.hdop = msg.hdop
+        if fix.satelites is None:
+            fix.satelites = len(msg.satelites)
+
+    @staticmethod
+    def _aplicar_gst(fix, msg):
+        if msg.sigma_lat is not None and msg.sigma_lon is not None:
+            fix.sigma_h = (msg.sigma_lat ** 2 + msg.sigma_lon ** 2) ** 0.5
+
+    def obter_estatisticas(self):
+        """
+        Retorna contadores do montador
+
+        Returns:
+            dict: Estatísticas de épocas
+        """
+        return {
+            'epocas_emitidas': self.epocas_emitidas,
+            'epocas_descartadas': self.epocas_descartadas,
+            'epocas_duplicadas': self.epocas_duplicadas
+        }
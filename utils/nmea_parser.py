@@ -0,0 +1,260 @@
+from functools import reduce
+from operator import xor
+
+# Parser NMEA dedicado para o caminho crítico de leitura.
+#
+# Trabalha diretamente sobre os bytes recebidos da serial, valida o
+# checksum '*hh' e devolve registros compactos com __slots__. Tipos de
+# sentença não tratados aqui podem ser repassados ao pynmea2 (opcional).
+
+NOS_PARA_KMH = 1.852
+
+
+class SentencaRMC:
+    __slots__ = ('hora', 'valido', 'latitude', 'longitude', 'velocidade_nos', 'curso', 'data')
+
+    def __init__(self, hora, valido, latitude, longitude, velocidade_nos, curso, data):
+        self.hora = hora
+        self.valido = valido
+        self.latitude = latitude
+        self.longitude = longitude
+        self.velocidade_nos = velocidade_nos
+        self.curso = curso
+        self.data = data
+
+    @property
+    def velocidade_kmh(self):
+        if self.velocidade_nos is None:
+            return None
+        return self.velocidade_nos * NOS_PARA_KMH
+
+
+class SentencaGGA:
+    __slots__ = ('hora', 'latitude', 'longitude', 'qualidade', 'satelites', 'hdop', 'altitude')
+
+    def __init__(self, hora, latitude, longitude, qualidade, satelites, hdop, altitude):
+        self.hora = hora
+        self.latitude = latitude
+        self.longitude = longitude
+        self.qualidade = qualidade
+        self.satelites = satelites
+        self.hdop = hdop
+        self.altitude = altitude
+
+
+class SentencaVTG:
+    __slots__ = ('curso', 'velocidade_kmh')
+
+    def __init__(self, curso, velocidade_kmh):
+        self.curso = curso
+        self.velocidade_kmh = velocidade_kmh
+
+
+class SentencaGSA:
+    __slots__ = ('tipo_fix', 'satelites', 'pdop', 'hdop', 'vdop')
+
+    def __init__(self, tipo_fix, satelites, pdop, hdop, vdop):
+        self.tipo_fix = tipo_fix
+        self.satelites = satelites
+        self.pdop = pdop
+        self.hdop = hdop
+        self.vdop = vdop
+
+
+class SentencaGST:
+    __slots__ = ('hora', 'rms', 'sigma_lat', 'sigma_lon', 'sigma_alt')
+
+    def __init__(self, hora, rms, sigma_lat, sigma_lon, sigma_alt):
+        self.hora = hora
+        self.rms = rms
+        self.sigma_lat = sigma_lat
+        self.sigma_lon = sigma_lon
+        self.sigma_alt = sigma_alt
+
+
+def checksum_valido(linha):
+    """
+    Verifica o checksum '*hh' de uma sentença NMEA
+
+    Args:
+        linha: Sentença em bytes, começando com '$'
+
+    Returns:
+        bool: True se o checksum confere
+    """
+    estrela = linha.rfind(b'*')
+    if estrela < 1 or len(linha) < estrela + 3:
+        return False
+    try:
+        esperado = int(linha[estrela + 1:estrela + 3], 16)
+    except ValueError:
+        return False
+    return reduce(xor, linha[1:estrela], 0) == esperado
+
+
+def _float(campo):
+    return float(campo) if campo else None
+
+
+def _int(campo):
+    return int(campo) if campo else None
+
+
+def _hora(campo):
+    """Converte hhmmss.ss em segundos desde a meia-noite UTC"""
+    if len(campo) < 6:
+        return None
+    return int(campo[0:2]) * 3600 + int(campo[2:4]) * 60 + float(campo[4:])
+
+
+def _coordenada(valor, hemisferio, graus_digitos):
+    """Converte (d)ddmm.mmmm + hemisfério em graus decimais"""
+    if not valor:
+        return None
+    graus = int(valor[:graus_digitos]) + float(valor[graus_digitos:]) / 60.0
+    if hemisferio == b'S' or hemisferio == b'W':
+        return -graus
+    return graus
+
+
+def _parse_rmc(c):
+    return SentencaRMC(
+        _hora(c[1]),
+        c[2] == b'A',
+        _coordenada(c[3], c[4], 2),
+        _coordenada(c[5], c[6], 3),
+        _float(c[7]),
+        _float(c[8]),
+        _int(c[9])
+    )
+
+
+def _parse_gga(c):
+    return SentencaGGA(
+        _hora(c[1]),
+        _coordenada(c[2], c[3], 2),
+        _coordenada(c[4], c[5], 3),
+        _int(c[6]) or 0,
+        _int(c[7]),
+        _float(c[8]),
+        _float(c[9])
+    )
+
+
+def _parse_vtg(c):
+    # $--VTG,curso,T,curso_mag,M,vel_nos,N,vel_kmh,K[,modo]
+    return SentencaVTG(_float(c[1]), _float(c[7]))
+
+
+def _parse_gsa(c):
+    satelites = tuple(int(s) for s in c[3:15] if s)
+    return SentencaGSA(_int(c[2]), satelites, _float(c[15]), _float(c[16]), _float(c[17]))
+
+
+def _parse_gst(c):
+    return SentencaGST(_hora(c[1]), _float(c[2]), _float(c[6]), _float(c[7]), _float(c[8]))
+
+
+# Tipo da sentença (sem o talker) -> (função, número mínimo de campos)
+_PARSERS = {
+    b'RMC': (_parse_rmc, 10),
+    b'GGA': (_parse_gga, 10),
+    b'VTG': (_parse_vtg, 8),
+    b'GSA': (_parse_gsa, 18),
+    b'GST': (_parse_gst, 9),
+}
+
+
+class ParserNMEA:
+    def __init__(self, usar_fallback=True):
+        """
+        Inicializa o parser
+
+        Args:
+            usar_fallback: Repassa ao pynmea2 os tipos não tratados aqui
+        """
+        self.usar_fallback = usar_fallback
+        self._pynmea2 = None
+
+        # Estatísticas
+        self.sentencas_processadas = 0
+        self.erros_checksum = 0
+        self.erros_formato = 0
+        self.sentencas_fallback = 0
+        self.sentencas_ignoradas = 0
+
+    def parse(self, linha):
+        """
+        Processa uma sentença NMEA
+
+        Args:
+            linha: Sentença em bytes ou str, sem terminador de linha
+
+        Returns:
+            Registro Sentenca* (ou objeto pynmea2 no fallback), ou None
+        """
+        if isinstance(linha, str):
+            linha = linha.encode('ascii', errors='replace')
+
+        if not checksum_valido(linha):
+            self.erros_checksum += 1
+            return None
+
+        tipo = linha[3:6]
+        entrada = _PARSERS.get(tipo)
+        if entrada is None:
+            return self._fallback(linha)
+
+        funcao, minimo_campos = entrada
+        campos = linha[:linha.rfind(b'*')].split(b',')
+        if len(campos) < minimo_campos:
+            self.erros_formato += 1
+            return None
+
+        try:
+            registro = funcao(campos)
+        except (ValueError, IndexError):
+            self.erros_formato += 1
+            return None
+
+        self.sentencas_processadas += 1
+        return registro
+
+    def _fallback(self, linha):
+        """Repassa sentenças não suportadas ao pynmea2, se disponível"""
+        if not self.usar_fallback:
+            self.sentencas_ignoradas += 1
+            return None
+
+        if self._pynmea2 is None:
+            try:
+                import pynmea2
+                self._pynmea2 = pynmea2
+            except ImportError:
+                self.usar_fallback = False
+                self.sentencas_ignoradas += 1
+                return None
+
+        try:
+            msg = self._pynmea2.parse(linha.decode('ascii', errors='replace'))
+        except Exception:
+            self.erros_formato += 1
+            return None
+
+        self.sentencas_fallback += 1
+        return msg
+
+    def obter_estatisticas(self):
+        """
+        Retorna contadores do parser
+
+        Returns:
+            dict: Estatísticas de processamento
+        """
+        return {
+            'sentencas_processadas': self.sentencas_processadas,
+            'erros_checksum': self.erros_checksum,
+            'erros_formato': self.erros_formato,
+            'sentencas_fallback': self.sentencas_fallback,
+            'sentencas_ignoradas': self.sentencas_ignoradas
+        }
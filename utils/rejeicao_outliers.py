@@ -0,0 +1,222 @@
+import math
+
+RAIO_TERRA = 6371e3
+
+# Erro de posição equivalente a HDOP 1 (mesmo valor do filtro de Kalman)
+UERE_PADRAO = 2.5
+
+# Motivos de rejeição
+COORDENADAS = 'coordenadas'   # fora de -90..90 / -180..180
+SEM_FIX = 'sem_fix'           # GGA qualidade 0 / UBX fixType < fix_minimo
+SATELITES = 'satelites'       # poucos satélites na solução
+HDOP = 'hdop'                 # geometria ruim
+VELOCIDADE = 'velocidade'     # deslocamento implica velocidade impossível
+ACELERACAO = 'aceleracao'     # salto de velocidade impossível para o veículo
+SALTO = 'salto'               # deslocamento grande sem tempo decorrido (instantes repetidos)
+
+MOTIVOS = (COORDENADAS, SEM_FIX, SATELITES, HDOP, VELOCIDADE, ACELERACAO, SALTO)
+
+
+class FiltroOutliers:
+    def __init__(self, velocidade_max_kmh=50.0, aceleracao_max=3.0, hdop_max=5.0, satelites_min=4,
+                 fix_minimo=2, uere=UERE_PADRAO, sigma_posicao_padrao=3.0, k_sigma=3.0,
+                 distancia_max_sem_tempo=5.0, max_rejeicoes_seguidas=10, tempo_reancoragem=5.0):
+        """
+        Rejeição de outliers considerando tempo e qualidade do fix
+
+        Cada fix é comparado apenas com o último aceito (custo O(1)). O
+        deslocamento é descontado do ruído esperado para os dois fixes
+        (k_sigma * UERE * HDOP), então um fix de geometria ruim tem mais
+        tolerância de posição, mas pode ser rejeitado pelo HDOP em si.
+
+        Se o filtro rejeitar muitos fixes seguidos por cinemática, ou ficar
+        tempo demais sem aceitar nenhum, o próximo fix de boa qualidade é
+        aceito como nova âncora: o erro pode estar no último aceito.
+
+        Args:
+            velocidade_max_kmh: Velocidade máxima plausível do veículo
+            aceleracao_max: Aceleração máxima plausível (m/s²)
+            hdop_max: HDOP máximo aceito
+            satelites_min: Mínimo de satélites na solução
+            fix_minimo: Tipo de fix mínimo (2 = 2D, 3 = 3D)
+            uere: Erro de posição (m) por unidade de HDOP
+            sigma_posicao_padrao: Desvio padrão usado sem HDOP (m)
+            k_sigma: Número de desvios padrão tolerados no deslocamento
+            distancia_max_sem_tempo: Deslocamento além do ruído aceito entre
+                                     fixes com o mesmo instante (m)
+            max_rejeicoes_seguidas: Rejeições cinemáticas seguidas antes de reancorar
+            tempo_reancoragem: Segundos sem aceitar nenhum fix antes de reancorar
+        """
+        self.velocidade_max = velocidade_max_kmh / 3.6
+        self.aceleracao_max = aceleracao_max
+        self.hdop_max = hdop_max
+        self.satelites_min = satelites_min
+        self.fix_minimo = fix_minimo
+        self.uere = uere
+        self.sigma_posicao_padrao = sigma_posicao_padrao
+        self.k_sigma = k_sigma
+        self.distancia_max_sem_tempo = distancia_max_sem_tempo
+        self.max_rejeicoes_seguidas = max_rejeicoes_seguidas
+        self.tempo_reancoragem = tempo_reancoragem
+        self.resetar()
+
+    def resetar(self, estatisticas=True):
+        """Esquece o último fix aceito e, com estatisticas, zera os contadores"""
+        self._instante = None
+        self._lat = None
+        self._lon = None
+        self._sigma = None
+        self._velocidade = None
+        self._velocidade_implicita = None
+        self._m_por_grau_lon = 0.0
+        self._rejeicoes_seguidas = 0
+        if not estatisticas:
+            return
+
+        # Estatísticas
+        self.aceitos = 0
+        self.reancoragens = 0
+        self.rejeicoes = dict.fromkeys(MOTIVOS, 0)
+
+    def _rejeitar(self, motivo):
+        self.rejeicoes[motivo] += 1
+        return motivo
+
+    def avaliar(self, instante, latitude, longitude, velocidade_kmh=None, hdop=None,
+                satelites=None, tipo_fix=None, qualidade=None):
+        """
+        Avalia um fix e, se aceito, passa a usá-lo como referência
+
+        Args:
+            instante: Instante do fix em segundos
+            latitude: Latitude em graus decimais
+            longitude: Longitude em graus decimais
+            velocidade_kmh: Velocidade informada pelo receptor (Doppler), se houver
+            hdop: HDOP do fix
+            satelites: Satélites usados na solução
+            tipo_fix: Tipo de fix (GSA/UBX: 1 = sem fix, 2 = 2D, 3 = 3D)
+            qualidade: Qualidade GGA (0 = inválido)
+
+        Returns:
+            str: Motivo da rejeição (ver MOTIVOS) ou None se o fix foi aceito
+        """
+        if not (-90 <= latitude <= 90) or not (-180 <= longitude <= 180):
+            return self._rejeitar(COORDENADAS)
+
+        # Qualidade informada pelo receptor
+        if qualidade == 0 or (tipo_fix is not None and tipo_fix < self.fix_minimo):
+            return self._rejeitar(SEM_FIX)
+        if satelites is not None and satelites < self.satelites_min:
+            return self._rejeitar(SATELITES)
+        if hdop is not None and hdop > self.hdop_max:
+            return self._rejeitar(HDOP)
+
+        sigma = hdop * self.uere if hdop else self.sigma_posicao_padrao
+        velocidade = velocidade_kmh / 3.6 if velocidade_kmh is not None else None
+
+        if self._instante is not None:
+            motivo = self._avaliar_cinematica(instante, latitude, longitude, sigma)
+            if motivo:
+                self._rejeicoes_seguidas += 1
+                if (self._rejeicoes_seguidas <= self.max_rejeicoes_seguidas
+                        and instante - self._instante <= self.tempo_reancoragem):
+                    return self._rejeitar(motivo)
+                self.reancoragens += 1
+                velocidade = velocidade if velocidade is not None else 0.0
+            elif velocidade is None:
+                velocidade = self._velocidade_implicita
+        else:
+            self._m_por_grau_lon = math.radians(1) * RAIO_TERRA * math.cos(math.radians(latitude))
+
+        self._instante = instante
+        self._lat = latitude
+        self._lon = longitude
+        self._sigma = sigma
+        self._velocidade = velocidade if velocidade is not None else 0.0
+        self._rejeicoes_seguidas = 0
+        self.aceitos += 1
+        return None
+
+    def _avaliar_cinematica(self, instante, latitude, longitude, sigma):
+        # Aproximação plana local: erro desprezível nas distâncias entre fixes
+        dn = (latitude - self._lat) * (math.radians(1) * RAIO_TERRA)
+        de = (longitude - self._lon) * self._m_por_grau_lon
+        distancia = math.hypot(de, dn)
+        # Parte do deslocamento que não se explica pelo ruído dos dois fixes
+        excesso = max(0.0, distancia - self.k_sigma * math.hypot(sigma, self._sigma))
+
+        dt = instante - self._instante
+        if dt <= 0:
+            self._velocidade_implicita = self._velocidade
+            return SALTO if excesso > self.distancia_max_sem_tempo else None
+
+        velocidade = excesso / dt
+        if velocidade > self.velocidade_max:
+            return VELOCIDADE
+        if (velocidade - self._velocidade) / dt > self.aceleracao_max:
+            return ACELERACAO
+        self._velocidade_implicita = velocidade
+        return None
+
+    def obter_estatisticas(self):
+        rejeitados = sum(self.rejeicoes.values())
+        total = self.aceitos + rejeitados
+        return {
+            'aceitos': self.aceitos,
+            'rejeitados': rejeitados,
+            'taxa_rejeicao': (rejeitados / total) * 100 if total else 0.0,
+            'reancoragens': self.reancoragens,
+            'rejeicoes': dict(self.rejeicoes)
+        }
+
+
+def filtrar_lote(registros, filtro=None, **opcoes):
+    """
+    Aplica a rejeição de outliers a uma sequência de fixes já gravados
+
+    Args:
+        registros: Iterável de tuplas (instante, latitude, longitude[, velocidade_kmh,
+                   hdop, satelites, tipo_fix, qualidade]) em ordem cronológica
+        filtro: FiltroOutliers a usar (default: um novo com **opcoes)
+
+    Yields:
+        tuple: (registro, motivo) - motivo None para fixes aceitos
+    """
+    if filtro is None:
+        filtro = FiltroOutliers(**opcoes)
+    for registro in registros:
+        yield registro, filtro.avaliar(*registro[:8])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import db
+
+    parser = argparse.ArgumentParser(description="Rejeição de outliers sobre os pontos gravados")
+    parser.add_argument('--remover', action='store_true', help="Apaga do banco os pontos rejeitados")
+    parser.add_argument('--velocidade-max', type=float, default=50.0, help="km/h")
+    parser.add_argument('--sessao', type=int, help="Só essa sessão (default: todas)")
+    args = parser.parse_args()
+
+    filtro = FiltroOutliers(velocidade_max_kmh=args.velocidade_max)
+    rejeitados = []
+    sessao_anterior = None
+    for ident, sessao, ts, lat, lon, velocidade, hdop, qualidade in db.iterar_pontos(
+            ('id', 'sessao_id', 'ts', 'latitude', 'longitude', 'velocidade', 'hdop', 'qualidade'), args.sessao):
+        if sessao != sessao_anterior:
+            # Cada sessão começa sem âncora: o último fix da anterior não é referência
+            filtro.resetar(estatisticas=False)
+            sessao_anterior = sessao
+        if filtro.avaliar(ts / 1000, lat, lon, velocidade, hdop, qualidade=qualidade):
+            rejeitados.append(ident)
+
+    estatisticas = filtro.obter_estatisticas()
+    print(f"Aceitos: {estatisticas['aceitos']}  Rejeitados: {estatisticas['rejeitados']} "
+          f"({estatisticas['taxa_rejeicao']:.1f}%)  Reancoragens: {estatisticas['reancoragens']}")
+    for motivo, quantidade in estatisticas['rejeicoes'].items():
+        if quantidade:
+            print(f"  {motivo}: {quantidade}")
+    if args.remover and rejeitados:
+        db.remover_pontos(rejeitados)
+        print(f"{len(rejeitados)} pontos removidos")
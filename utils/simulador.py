@@ -0,0 +1,405 @@
+import math
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from functools import reduce
+from operator import xor
+
+from utils.ubx import montar_nav_pvt, montar_nav_dop
+
+RAIO_TERRA = 6371e3
+KMH_PARA_NOS = 1 / 1.852
+
+# Época GPS (para o itow do UBX); segundos intercalares são irrelevantes aqui
+_INICIO_GPS = datetime(1980, 1, 6)
+
+
+class PlanoTalhao:
+    def __init__(self, latitude, longitude, rumo=0.0, comprimento_passada=300.0,
+                 espacamento=12.0, num_passadas=20):
+        """
+        Plano de trabalho em vai-e-vem sobre um talhão retangular
+
+        As passadas são paralelas ao rumo informado e avançam para a direita
+        dele; nas cabeceiras o veículo faz uma curva de 180 graus com raio
+        igual a metade do espaçamento. Depois da última passada o veículo
+        volta percorrendo o talhão no sentido contrário.
+
+        Args:
+            latitude: Latitude do início da primeira passada
+            longitude: Longitude do início da primeira passada
+            rumo: Rumo da primeira passada em graus
+            comprimento_passada: Comprimento de cada passada (m)
+            espacamento: Distância entre passadas, normalmente a largura do implemento (m)
+            num_passadas: Número de passadas no talhão
+        """
+        self.latitude = latitude
+        self.longitude = longitude
+        self.rumo = rumo
+        self.comprimento_passada = comprimento_passada
+        self.espacamento = espacamento
+        self.num_passadas = num_passadas
+
+    @property
+    def raio_manobra(self):
+        return self.espacamento / 2
+
+
+class SimuladorTrajetoria:
+    def __init__(self, plano, velocidade_kmh=8.0, velocidade_manobra_kmh=5.0, taxa_hz=10,
+                 sigma_ruido=0.8, tau_ruido=30.0, falhas_por_hora=6.0, duracao_falha=(1.0, 8.0),
+                 protocolo='nmea', inicio_utc=None, semente=None):
+        """
+        Simula um veículo percorrendo o plano e gera os bytes do receptor
+
+        Args:
+            plano: PlanoTalhao
+            velocidade_kmh: Velocidade nas passadas
+            velocidade_manobra_kmh: Velocidade nas curvas de cabeceira
+            taxa_hz: Taxa de épocas (até 25 Hz)
+            sigma_ruido: Desvio padrão do erro de posição por eixo (m)
+            tau_ruido: Constante de tempo do erro (s); o erro GNSS real é correlacionado
+            falhas_por_hora: Frequência média de perdas de fix
+            duracao_falha: Intervalo (min, max) da duração de cada perda (s)
+            protocolo: 'nmea', 'ubx' ou 'ambos'
+            inicio_utc: datetime UTC da primeira época (default: agora)
+            semente: Semente do gerador aleatório (reprodutibilidade)
+        """
+        if protocolo not in ('nmea', 'ubx', 'ambos'):
+            raise ValueError(f"Protocolo inválido: {protocolo}")
+
+        self.plano = plano
+        self.velocidade_kmh = velocidade_kmh
+        self.velocidade_manobra_kmh = velocidade_manobra_kmh
+        self.taxa_hz = taxa_hz
+        self.sigma_ruido = sigma_ruido
+        self.tau_ruido = tau_ruido
+        self.falhas_por_hora = falhas_por_hora
+        self.duracao_falha = duracao_falha
+        self.protocolo = protocolo
+        self.inicio_utc = inicio_utc or datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None)
+        self._random = random.Random(semente)
+
+        self._m_por_grau_lat = math.radians(1) * RAIO_TERRA
+        self._m_por_grau_lon = self._m_por_grau_lat * math.cos(math.radians(plano.latitude))
+
+        # Estado do veículo no plano local (m)
+        self.tempo = 0.0
+        self.leste = 0.0
+        self.norte = 0.0
+        self.rumo = plano.rumo % 360.0
+        self.velocidade = velocidade_kmh / 3.6
+        self.passada = 0
+        self._em_manobra = False
+        self._restante = plano.comprimento_passada
+        self._sentido_giro = 1  # +1 = horário
+        self._sentido_lateral = 1
+        self._erro_leste = 0.0
+        self._erro_norte = 0.0
+        self._fim_falha = None
+
+        # Estatísticas
+        self.epocas_geradas = 0
+        self.epocas_sem_fix = 0
+
+    @property
+    def em_falha(self):
+        return self._fim_falha is not None and self.tempo < self._fim_falha
+
+    def posicao_real(self):
+        """Posição verdadeira (sem ruído) como (latitude, longitude)"""
+        return (self.plano.latitude + self.norte / self._m_por_grau_lat,
+                self.plano.longitude + self.leste / self._m_por_grau_lon)
+
+    def _mover(self, dt):
+        plano = self.plano
+        if self._em_manobra:
+            self.velocidade = self.velocidade_manobra_kmh / 3.6
+            passo = self.velocidade * dt
+            angulo = min(math.degrees(passo / plano.raio_manobra), self._restante)
+            passo = math.radians(angulo) * plano.raio_manobra
+            rumo_medio = self.rumo + self._sentido_giro * angulo / 2
+            self.leste += passo * math.sin(math.radians(rumo_medio))
+            self.norte += passo * math.cos(math.radians(rumo_medio))
+            self.rumo = (self.rumo + self._sentido_giro * angulo) % 360.0
+            self._restante -= angulo
+            if self._restante <= 1e-9:
+                self._em_manobra = False
+                self._restante = plano.comprimento_passada
+                self._sentido_giro = -self._sentido_giro
+        else:
+            self.velocidade = self.velocidade_kmh / 3.6
+            passo = min(self.velocidade * dt, self._restante)
+            self.leste += passo * math.sin(math.radians(self.rumo))
+            self.norte += passo * math.cos(math.radians(self.rumo))
+            self._restante -= passo
+            if self._restante <= 1e-9:
+                self._iniciar_manobra()
+
+    def _iniciar_manobra(self):
+        self.passada += self._sentido_lateral
+        if self.passada >= self.plano.num_passadas or self.passada < 0:
+            # Fim do talhão: volta no sentido contrário repetindo o último giro
+            self._sentido_lateral = -self._sentido_lateral
+            self.passada += 2 * self._sentido_lateral
+            self._sentido_giro = -self._sentido_giro
+        self._em_manobra = True
+        self._restante = 180.0
+
+    def _atualizar_erro(self, dt):
+        a = math.exp(-dt / self.tau_ruido) if self.tau_ruido > 0 else 0.0
+        escala = self.sigma_ruido * math.sqrt(1 - a * a)
+        self._erro_leste = a * self._erro_leste + escala * self._random.gauss(0, 1)
+        self._erro_norte = a * self._erro_norte + escala * self._random.gauss(0, 1)
+
+    def _atualizar_falhas(self, dt):
+        if self.em_falha:
+            return
+        self._fim_falha = None
+        if self._random.random() < self.falhas_por_hora / 3600.0 * dt:
+            self._fim_falha = self.tempo + self._random.uniform(*self.duracao_falha)
+
+    def avancar(self):
+        """
+        Avança uma época e retorna os bytes que o receptor enviaria
+
+        Returns:
+            bytes: Sentenças NMEA e/ou frames UBX da época
+        """
+        dt = 1.0 / self.taxa_hz
+        self._mover(dt)
+        self._atualizar_erro(dt)
+        self._atualizar_falhas(dt)
+        self.tempo += dt
+        self.epocas_geradas += 1
+
+        data_hora = self.inicio_utc + timedelta(seconds=self.tempo)
+        com_fix = not self.em_falha
+        if not com_fix:
+            self.epocas_sem_fix += 1
+
+        lat = self.plano.latitude + (self.norte + self._erro_norte) / self._m_por_grau_lat
+        lon = self.plano.longitude + (self.leste + self._erro_leste) / self._m_por_grau_lon
+        velocidade = max(0.0, self.velocidade + self._random.gauss(0, 0.05))
+        rumo = (self.rumo + self._random.gauss(0, 0.5)) % 360.0
+        hdop = 0.8 + abs(self._random.gauss(0, 0.1))
+
+        dados = b''
+        if self.protocolo in ('ubx', 'ambos'):
+            itow = int(round((data_hora - _INICIO_GPS).total_seconds() * 1000)) % (7 * 86400 * 1000)
+            dados += montar_nav_dop(itow, hdop=hdop)
+            dados += montar_nav_pvt(itow, data_hora, lat, lon, 1172.0, velocidade, rumo,
+                                    tipo_fix=3 if com_fix else 0,
+                                    satelites=14 if com_fix else 3,
+                                    precisao_h=self.sigma_ruido * math.sqrt(2))
+        if self.protocolo in ('nmea', 'ambos'):
+            dados += self._sentencas_nmea(data_hora, lat, lon, velocidade, rumo, hdop, com_fix)
+        return dados
+
+    def _sentencas_nmea(self, data_hora, lat, lon, velocidade, rumo, hdop, com_fix):
+        hora = data_hora.strftime('%H%M%S') + f".{data_hora.microsecond // 10000:02d}"
+        data = data_hora.strftime('%d%m%y')
+        if com_fix:
+            lat_txt, ns = _formatar_coordenada(lat, 2, 'N', 'S')
+            lon_txt, ew = _formatar_coordenada(lon, 3, 'E', 'W')
+            nos = velocidade * 3.6 * KMH_PARA_NOS
+            corpos = [
+                f"GNRMC,{hora},A,{lat_txt},{ns},{lon_txt},{ew},{nos:.3f},{rumo:.2f},{data},,,A",
+                f"GNVTG,{rumo:.2f},T,,M,{nos:.3f},N,{velocidade * 3.6:.3f},K,A",
+                f"GNGGA,{hora},{lat_txt},{ns},{lon_txt},{ew},1,14,{hdop:.2f},1172.0,M,-12.3,M,,",
+                f"GNGSA,A,3,02,05,12,15,18,24,25,29,31,,,,{hdop * 1.6:.2f},{hdop:.2f},{hdop * 1.3:.2f}",
+                f"GNGST,{hora},{self.sigma_ruido:.1f},{self.sigma_ruido:.2f},{self.sigma_ruido:.2f},0.0,"
+                f"{self.sigma_ruido:.2f},{self.sigma_ruido:.2f},{self.sigma_ruido * 1.5:.2f}",
+            ]
+        else:
+            corpos = [
+                f"GNRMC,{hora},V,,,,,,,{data},,,N",
+                f"GNVTG,,T,,M,,N,,K,N",
+                f"GNGGA,{hora},,,,,0,03,99.99,,,,,,",
+                f"GNGSA,A,1,,,,,,,,,,,,,99.99,99.99,99.99",
+            ]
+        return b''.join(_sentenca(c) for c in corpos)
+
+    def iterar_epocas(self, quantidade=None):
+        """
+        Gera épocas sucessivas
+
+        Args:
+            quantidade: Número de épocas (None = infinito)
+
+        Yields:
+            tuple: (tempo_simulado, bytes)
+        """
+        n = 0
+        while quantidade is None or n < quantidade:
+            dados = self.avancar()
+            yield self.tempo, dados
+            n += 1
+
+
+def _sentenca(corpo):
+    cs = reduce(xor, corpo.encode('ascii'), 0)
+    return f"${corpo}*{cs:02X}\r\n".encode('ascii')
+
+
+def _formatar_coordenada(valor, digitos_graus, positivo, negativo):
+    hemisferio = positivo if valor >= 0 else negativo
+    valor = abs(valor)
+    graus = int(valor)
+    minutos = (valor - graus) * 60
+    return f"{graus:0{digitos_graus}d}{minutos:08.5f}", hemisferio
+
+
+class FonteSimulada:
+    def __init__(self, simulador, tempo_real=True, timeout=1.0):
+        """
+        Stream em memória com os bytes do simulador, no lugar da porta serial
+
+        Implementa a parte da interface de serial.Serial usada pelo sistema
+        (read, readline, in_waiting, is_open, close, write).
+
+        Args:
+            simulador: SimuladorTrajetoria
+            tempo_real: Entregar as épocas no ritmo da taxa do simulador;
+                        False = o mais rápido possível
+            timeout: Espera máxima de read() sem dados
+        """
+        self.simulador = simulador
+        self.tempo_real = tempo_real
+        self.timeout = timeout
+        self.is_open = True
+        self._pendente = bytearray()
+        self._inicio = time.monotonic()
+        self._tempo_virtual = 0.0
+        self.bytes_entregues = 0
+
+    def relogio(self):
+        """Relógio da simulação (base time.monotonic()), determinístico no modo rápido"""
+        return self._inicio + self._tempo_virtual
+
+    def _produzir(self):
+        if not self.tempo_real:
+            if not self._pendente:
+                self._pendente += self.simulador.avancar()
+                self._tempo_virtual = self.simulador.tempo
+            return
+        decorrido = time.monotonic() - self._inicio
+        while self.simulador.tempo + 1.0 / self.simulador.taxa_hz <= decorrido:
+            self._pendente += self.simulador.avancar()
+            self._tempo_virtual = self.simulador.tempo
+
+    @property
+    def in_waiting(self):
+        self._produzir()
+        return len(self._pendente)
+
+    def _aguardar_dados(self):
+        self._produzir()
+        if self._pendente:
+            return
+        proxima = self._inicio + self.simulador.tempo + 1.0 / self.simulador.taxa_hz
+        time.sleep(max(0.0, min(self.timeout, proxima - time.monotonic())))
+        self._produzir()
+
+    def read(self, n=1):
+        if not self.is_open:
+            raise OSError("Fonte simulada fechada")
+        self._aguardar_dados()
+        dados = bytes(self._pendente[:n])
+        del self._pendente[:n]
+        self.bytes_entregues += len(dados)
+        return dados
+
+    def readline(self):
+        linha = bytearray()
+        limite = time.monotonic() + self.timeout
+        while time.monotonic() < limite:
+            self._aguardar_dados()
+            fim = self._pendente.find(b'\n')
+            if fim >= 0:
+                linha += self._pendente[:fim + 1]
+                del self._pendente[:fim + 1]
+                break
+            linha += self._pendente
+            self._pendente.clear()
+        self.bytes_entregues += len(linha)
+        return bytes(linha)
+
+    def write(self, dados):
+        # Comandos de configuração são ignorados pelo simulador
+        return len(dados)
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+
+class ServidorPTY:
+    def __init__(self, simulador):
+        """
+        Publica o simulador em um pseudo-terminal (Linux)
+
+        O caminho em self.porta pode ser aberto com serial.Serial como se
+        fosse um receptor real, exercitando também o driver tty.
+
+        Args:
+            simulador: SimuladorTrajetoria
+        """
+        import tty
+
+        self.simulador = simulador
+        self._mestre, self._escravo = os.openpty()
+        tty.setraw(self._escravo)
+        self.porta = os.ttyname(self._escravo)
+        self._rodando = False
+        self._thread = None
+        self.bytes_enviados = 0
+
+    def iniciar(self):
+        self._rodando = True
+        self._thread = threading.Thread(target=self._laco, daemon=True)
+        self._thread.start()
+        return self.porta
+
+    def _laco(self):
+        inicio = time.monotonic()
+        periodo = 1.0 / self.simulador.taxa_hz
+        while self._rodando:
+            dados = self.simulador.avancar()
+            try:
+                os.write(self._mestre, dados)
+            except OSError:
+                break
+            self.bytes_enviados += len(dados)
+            espera = inicio + self.simulador.tempo + periodo - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+
+    def parar(self):
+        self._rodando = False
+        if self._thread:
+            self._thread.join()
+        for fd in (self._mestre, self._escravo):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    import sys
+
+    taxa = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    protocolo = sys.argv[2] if len(sys.argv) > 2 else 'nmea'
+    simulador = SimuladorTrajetoria(PlanoTalhao(-15.7801, -47.9292), taxa_hz=taxa, protocolo=protocolo)
+    servidor = ServidorPTY(simulador)
+    print(f"Simulador GNSS ({protocolo}, {taxa} Hz) em: {servidor.iniciar()}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        servidor.parar()
@@ -0,0 +1,235 @@
+import random
+import threading
+import time
+
+from utils.barramento import BarramentoFix
+from utils.detect_gps_port import detectar_gps
+
+# Estados de saúde do enlace com o receptor
+PARADO = 'parado'
+DETECTANDO = 'detectando'
+CONECTANDO = 'conectando'
+CONECTADO = 'conectado'
+SEM_DADOS = 'sem_dados'          # porta aberta, mas o receptor parou de enviar
+DESCONECTADO = 'desconectado'    # aguardando o próximo intervalo de reconexão
+
+
+class EventoConexao:
+    """Mudança de estado publicada pelo SupervisorConexao"""
+    __slots__ = ('estado', 'anterior', 'instante', 'detalhe')
+
+    def __init__(self, estado, anterior, instante, detalhe=None):
+        self.estado = estado
+        self.anterior = anterior
+        self.instante = instante
+        self.detalhe = detalhe
+
+    def __repr__(self):
+        return f"EventoConexao({self.anterior} -> {self.estado}, {self.detalhe!r})"
+
+
+class SupervisorConexao:
+    def __init__(self, gnss_manager, intervalo_inicial=0.5, intervalo_maximo=30.0, fator=2.0,
+                 falhas_para_detectar=2, timeout_dados=5.0, detectar=detectar_gps, eventos=None):
+        """
+        Controla o ciclo de vida da conexão com o receptor em uma thread própria
+
+        A leitura nunca espera por uma reconexão: enquanto o enlace está fora
+        o GNSSManager apenas devolve o fallback, e o supervisor tenta
+        reconectar com espera exponencial. Depois de algumas falhas seguidas
+        a porta é detectada de novo, cobrindo o receptor que volta em outra
+        tty após ser desconectado e reconectado (ex.: ttyUSB0 -> ttyUSB1).
+
+        Args:
+            gnss_manager: GNSSManager supervisionado
+            intervalo_inicial: Espera após a primeira falha (s)
+            intervalo_maximo: Limite da espera entre tentativas (s)
+            fator: Multiplicador da espera a cada falha
+            falhas_para_detectar: Falhas seguidas antes de detectar a porta de novo
+            timeout_dados: Segundos sem nenhum byte com a porta aberta para
+                           considerar o enlace caído (None desativa)
+            detectar: Função de detecção (ver utils.detect_gps_port.detectar_gps)
+            eventos: BarramentoFix onde publicar os EventoConexao (default: um novo)
+        """
+        self.gnss_manager = gnss_manager
+        self.intervalo_inicial = intervalo_inicial
+        self.intervalo_maximo = intervalo_maximo
+        self.fator = fator
+        self.falhas_para_detectar = falhas_para_detectar
+        self.timeout_dados = timeout_dados
+        self.detectar = detectar
+
+        # Mudanças de estado; cada interessado assina com sua política
+        self.eventos = eventos if eventos is not None else BarramentoFix(capacidade=64)
+        self.estado = PARADO
+        self._condicao = threading.Condition()
+        self._rodando = False
+        self._thread = None
+        self._falhas_seguidas = 0
+        self._inicio = None
+        self._inicio_queda = None
+        self._ultimo_bytes = 0
+        self._instante_ultimo_byte = None
+
+        # Estatísticas
+        self.tentativas = 0
+        self.tempo_primeira_conexao = None
+        self.reconexoes = 0
+        self.quedas = 0
+        self.deteccoes = 0
+        self.latencia_ultima_reconexao = None
+        self.latencia_maxima_reconexao = 0.0
+        self._soma_latencias = 0.0
+        self.tempo_desconectado_total = 0.0
+
+    @property
+    def conectado(self):
+        return self.estado == CONECTADO
+
+    def _mudar_estado(self, estado, detalhe=None):
+        with self._condicao:
+            if estado == self.estado:
+                return
+            evento = EventoConexao(estado, self.estado, time.monotonic(), detalhe)
+            self.estado = estado
+            self._condicao.notify_all()
+        self.eventos.publicar(evento)
+
+    def iniciar(self):
+        """Inicia a thread do supervisor (não bloqueia)"""
+        if self._rodando:
+            return
+        self._rodando = True
+        self._inicio = time.monotonic()
+        self._thread = threading.Thread(target=self._laco, daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        """Encerra o supervisor e fecha a conexão"""
+        with self._condicao:
+            self._rodando = False
+            self._condicao.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.gnss_manager.desconectar()
+        if self._inicio_queda is not None:
+            self.tempo_desconectado_total += time.monotonic() - self._inicio_queda
+            self._inicio_queda = None
+        self._mudar_estado(PARADO)
+
+    def aguardar_conexao(self, timeout=None):
+        """
+        Aguarda o enlace ficar disponível
+
+        Returns:
+            bool: True se conectado
+        """
+        with self._condicao:
+            return self._condicao.wait_for(lambda: self.estado == CONECTADO or not self._rodando, timeout) \
+                and self.estado == CONECTADO
+
+    def notificar_queda(self, motivo=None, estado=DESCONECTADO):
+        """
+        Informa que a leitura falhou (chamado pela thread de leitura)
+
+        Não bloqueia: a reconexão acontece na thread do supervisor.
+        """
+        with self._condicao:
+            if self.estado != CONECTADO:
+                return
+            self.quedas += 1
+            self._inicio_queda = time.monotonic()
+        self.gnss_manager.desconectar()
+        self._mudar_estado(estado, motivo or self.gnss_manager.ultimo_erro)
+
+    def _intervalo(self):
+        intervalo = min(self.intervalo_maximo,
+                        self.intervalo_inicial * self.fator ** max(0, self._falhas_seguidas - 1))
+        # Jitter evita tentativas em fase com um receptor que reinicia periodicamente
+        return intervalo * random.uniform(0.8, 1.2)
+
+    def _esperar(self, segundos):
+        with self._condicao:
+            self._condicao.wait_for(lambda: not self._rodando, segundos)
+
+    def _laco(self):
+        while self._rodando:
+            if self.estado == CONECTADO:
+                self._vigiar()
+                self._esperar(0.5)
+                continue
+
+            if self._tentar_conectar():
+                continue
+            self._mudar_estado(DESCONECTADO, self.gnss_manager.ultimo_erro)
+            self._esperar(self._intervalo())
+
+    def _tentar_conectar(self):
+        manager = self.gnss_manager
+        self.tentativas += 1
+
+        if manager.fonte is None and (manager.porta is None
+                                      or self._falhas_seguidas >= self.falhas_para_detectar):
+            self._mudar_estado(DETECTANDO)
+            self.deteccoes += 1
+            deteccao = self.detectar()
+            if deteccao is None:
+                self._falhas_seguidas += 1
+                manager.ultimo_erro = "GPS não detectado"
+                return False
+            manager.porta = deteccao['porta']
+            manager.baudrate = deteccao['baudrate']
+
+        self._mudar_estado(CONECTANDO, manager.porta)
+        if not manager.conectar():
+            self._falhas_seguidas += 1
+            return False
+
+        agora = time.monotonic()
+        self._falhas_seguidas = 0
+        self._ultimo_bytes = 0
+        self._instante_ultimo_byte = agora
+        if self._inicio_queda is not None:
+            latencia = agora - self._inicio_queda
+            self.reconexoes += 1
+            self.latencia_ultima_reconexao = latencia
+            self.latencia_maxima_reconexao = max(self.latencia_maxima_reconexao, latencia)
+            self._soma_latencias += latencia
+            self.tempo_desconectado_total += latencia
+            self._inicio_queda = None
+        elif self.tempo_primeira_conexao is None:
+            self.tempo_primeira_conexao = agora - self._inicio
+        self._mudar_estado(CONECTADO, manager.porta)
+        return True
+
+    def _vigiar(self):
+        """Detecta porta aberta sem dados (receptor travado ou sem energia)"""
+        leitor = self.gnss_manager.leitor_stream
+        if self.timeout_dados is None or leitor is None:
+            return
+        agora = time.monotonic()
+        if leitor.bytes_lidos != self._ultimo_bytes:
+            self._ultimo_bytes = leitor.bytes_lidos
+            self._instante_ultimo_byte = agora
+        elif agora - self._instante_ultimo_byte > self.timeout_dados:
+            # Fechar a porta faz a leitura em andamento falhar e liberar a thread
+            self.notificar_queda(f"Sem dados há {self.timeout_dados:.0f} s", SEM_DADOS)
+
+    def obter_estatisticas(self):
+        desconectado = self.tempo_desconectado_total
+        if self._inicio_queda is not None:
+            desconectado += time.monotonic() - self._inicio_queda
+        return {
+            'estado': self.estado,
+            'porta': self.gnss_manager.porta,
+            'baudrate': self.gnss_manager.baudrate,
+            'tentativas': self.tentativas,
+            'quedas': self.quedas,
+            'reconexoes': self.reconexoes,
+            'deteccoes': self.deteccoes,
+            'tempo_primeira_conexao': self.tempo_primeira_conexao,
+            'latencia_ultima_reconexao': self.latencia_ultima_reconexao,
+            'latencia_media_reconexao': self._soma_latencias / self.reconexoes if self.reconexoes else None,
+            'latencia_maxima_reconexao': self.latencia_maxima_reconexao,
+            'tempo_desconectado_total': desconectado
+        }
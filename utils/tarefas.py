@@ -0,0 +1,355 @@
+import itertools
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.exportacao import _nome_padrao
+
+# Tarefas longas (exportação, relatório, backup, limpeza) fora da thread da interface
+#
+# As funções rodam num pool de threads; a interface só enfileira pedidos e,
+# a cada quadro, chama ExecutorTarefas.processar_eventos(), que entrega os
+# callbacks de progresso e de término na própria thread da interface. Nada
+# aqui espera uma tarefa terminar, então o laço de desenho nunca bloqueia.
+#
+# Cancelamento é cooperativo: Tarefa.cancelar() marca a tarefa e o próximo
+# aviso de progresso (a cada bloco exportado ou passo do backup) levanta
+# TarefaCancelada dentro da função. Arquivos parciais são apagados.
+#
+# Threads e não processos: as tarefas usam o estado do módulo db (commit em
+# grupo pendente, sessão atual) e o trabalho pesado é SQLite, E/S e, com
+# NumPy, as colunas de utils.geodesia, que liberam o GIL.
+
+# Estados de uma Tarefa
+AGUARDANDO = 'aguardando'
+EXECUTANDO = 'executando'
+CONCLUIDA = 'concluida'
+CANCELADA = 'cancelada'
+FALHOU = 'falhou'
+ESTADOS_FINAIS = (CONCLUIDA, CANCELADA, FALHOU)
+
+# Tipos de evento entregues por processar_eventos()
+INICIO = 'inicio'
+PROGRESSO = 'progresso'
+FIM = 'fim'
+
+# Intervalo mínimo entre dois eventos de progresso da mesma tarefa (s)
+INTERVALO_PROGRESSO = 0.1
+
+# Formatos de ExecutorTarefas.exportar(): (prefixo, extensão) do nome padrão
+FORMATOS = {
+    'csv': ('pulverizacao', 'csv'),
+    'relatorio': ('relatorio', 'txt'),
+    'tudo': None,  # CSV + relatório na mesma leitura
+    'geojson': ('pulverizacao', 'geojson'),
+    'kml': ('pulverizacao', 'kml'),
+    'isoxml': ('isoxml', None),
+}
+
+
+class TarefaCancelada(Exception):
+    """Levantada dentro da função da tarefa quando o cancelamento foi pedido"""
+
+
+class Tarefa:
+    def __init__(self, id, nome, ao_progresso=None, ao_terminar=None):
+        """
+        Uma tarefa submetida ao ExecutorTarefas (criada por ExecutorTarefas.submeter)
+
+        Os atributos são escritos pela thread de trabalho e lidos pela
+        interface; os callbacks só rodam em processar_eventos().
+
+        Args:
+            id: Número sequencial da tarefa no executor
+            nome: Descrição exibida na interface
+            ao_progresso: Chamado com a tarefa a cada evento de progresso
+            ao_terminar: Chamado com a tarefa ao concluir, falhar ou ser cancelada
+        """
+        self.id = id
+        self.nome = nome
+        self.ao_progresso = ao_progresso
+        self.ao_terminar = ao_terminar
+        self.estado = AGUARDANDO
+        self.progresso = None  # Fração 0-1; None enquanto o total é desconhecido
+        self.resultado = None
+        self.erro = None
+        self.inicio = None
+        self.fim = None
+        self._cancelamento = threading.Event()
+        self._futuro = None
+        self._executor = None
+        self._ultimo_aviso = 0.0
+
+    @property
+    def terminada(self):
+        return self.estado in ESTADOS_FINAIS
+
+    @property
+    def cancelamento_pedido(self):
+        return self._cancelamento.is_set()
+
+    @property
+    def duracao(self):
+        """Segundos desde o início (até o fim, se terminada); None se não começou"""
+        if self.inicio is None:
+            return None
+        return (self.fim or time.monotonic()) - self.inicio
+
+    def cancelar(self):
+        """Pede o cancelamento; uma tarefa ainda na fila nem chega a rodar"""
+        self._cancelamento.set()
+        if self._futuro is not None and self._futuro.cancel():
+            # Saiu da fila antes de começar: ninguém mais vai avisar o fim
+            self._executor._terminar(self, CANCELADA)
+
+    def verificar_cancelamento(self):
+        """Levanta TarefaCancelada se o cancelamento foi pedido (chamar na thread de trabalho)"""
+        if self._cancelamento.is_set():
+            raise TarefaCancelada(self.nome)
+
+    def informar(self, feitos, total=None):
+        """
+        Atualiza o progresso (chamar na thread de trabalho)
+
+        Tem a assinatura dos callbacks de progresso de ExportadorDados, então
+        pode ser passado direto como progresso=tarefa.informar.
+
+        Args:
+            feitos: Unidades processadas (pontos, páginas, ...)
+            total: Total de unidades (None ou 0 = indeterminado)
+
+        Raises:
+            TarefaCancelada: se o cancelamento foi pedido
+        """
+        self.verificar_cancelamento()
+        self.progresso = min(1.0, feitos / total) if total else None
+        agora = time.monotonic()
+        if agora - self._ultimo_aviso >= INTERVALO_PROGRESSO:
+            self._ultimo_aviso = agora
+            self._executor._avisar(self, PROGRESSO)
+
+    def obter_estatisticas(self):
+        return {
+            'id': self.id,
+            'nome': self.nome,
+            'estado': self.estado,
+            'progresso': self.progresso,
+            'duracao': self.duracao,
+            'erro': str(self.erro) if self.erro else None
+        }
+
+
+class ExecutorTarefas:
+    def __init__(self, trabalhadores=2):
+        """
+        Executa tarefas longas num pool de threads, com progresso e cancelamento
+
+        Args:
+            trabalhadores: Tarefas executadas ao mesmo tempo (as demais esperam na fila)
+        """
+        self.trabalhadores = trabalhadores
+        self._pool = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix='tarefa')
+        self._eventos = queue.SimpleQueue()
+        self._ids = itertools.count(1)
+        self._trava = threading.Lock()
+        self._tarefas = []
+        self.encerrado = False
+
+    def submeter(self, nome, funcao, *args, ao_progresso=None, ao_terminar=None, **kwargs):
+        """
+        Enfileira funcao(tarefa, *args, **kwargs) e retorna sem esperar
+
+        A função recebe a Tarefa como primeiro argumento para informar o
+        progresso e verificar o cancelamento; seu retorno vira tarefa.resultado.
+
+        Args:
+            nome: Descrição exibida na interface
+            funcao: Executada numa thread do pool
+            ao_progresso, ao_terminar: Callbacks (ver Tarefa), chamados em processar_eventos()
+
+        Returns:
+            Tarefa
+        """
+        if self.encerrado:
+            raise RuntimeError("Executor de tarefas encerrado")
+        tarefa = Tarefa(next(self._ids), nome, ao_progresso, ao_terminar)
+        tarefa._executor = self
+        with self._trava:
+            self._tarefas.append(tarefa)
+        tarefa._futuro = self._pool.submit(self._executar, tarefa, funcao, args, kwargs)
+        return tarefa
+
+    def _executar(self, tarefa, funcao, args, kwargs):
+        if tarefa.cancelamento_pedido:
+            self._terminar(tarefa, CANCELADA)
+            return
+        tarefa.inicio = time.monotonic()
+        tarefa.estado = EXECUTANDO
+        self._avisar(tarefa, INICIO)
+        try:
+            tarefa.resultado = funcao(tarefa, *args, **kwargs)
+        except Exception as e:
+            # ExportadorDados reembala as exceções: o pedido de cancelamento decide
+            if isinstance(e, TarefaCancelada) or tarefa.cancelamento_pedido:
+                self._terminar(tarefa, CANCELADA)
+            else:
+                tarefa.erro = e
+                self._terminar(tarefa, FALHOU)
+            return
+        tarefa.progresso = 1.0
+        self._terminar(tarefa, CONCLUIDA)
+
+    def _terminar(self, tarefa, estado):
+        with self._trava:
+            if tarefa.terminada:
+                return
+            tarefa.estado = estado
+            tarefa.fim = time.monotonic()
+        self._avisar(tarefa, FIM)
+
+    def _avisar(self, tarefa, tipo):
+        self._eventos.put((tarefa, tipo))
+
+    def processar_eventos(self, maximo=None):
+        """
+        Entrega os callbacks pendentes na thread que chama (a da interface)
+
+        Nunca bloqueia; progresso acumulado de uma mesma tarefa vira um
+        único callback.
+
+        Args:
+            maximo: Limite de eventos retirados da fila
+
+        Returns:
+            int: Número de callbacks chamados
+        """
+        eventos = []
+        while maximo is None or len(eventos) < maximo:
+            try:
+                eventos.append(self._eventos.get_nowait())
+            except queue.Empty:
+                break
+
+        chamados = 0
+        ja_informadas = set()
+        for tarefa, tipo in eventos:
+            if tipo == FIM:
+                with self._trava:
+                    if tarefa in self._tarefas:
+                        self._tarefas.remove(tarefa)
+                callback = tarefa.ao_terminar
+            elif tarefa.terminada or tarefa.id in ja_informadas:
+                continue
+            else:
+                ja_informadas.add(tarefa.id)
+                callback = tarefa.ao_progresso
+            if callback is not None:
+                callback(tarefa)
+                chamados += 1
+        return chamados
+
+    @property
+    def tarefas(self):
+        """Tarefas na fila ou em execução cujo fim ainda não foi entregue"""
+        with self._trava:
+            return list(self._tarefas)
+
+    @property
+    def ocupado(self):
+        return any(not tarefa.terminada for tarefa in self.tarefas)
+
+    def cancelar_todas(self):
+        for tarefa in self.tarefas:
+            tarefa.cancelar()
+
+    def encerrar(self, cancelar=True, esperar=True):
+        """
+        Encerra o pool
+
+        Args:
+            cancelar: Cancela as tarefas na fila e em execução
+            esperar: Aguarda as threads terminarem (bloqueia: só ao sair do programa)
+        """
+        self.encerrado = True
+        if cancelar:
+            self.cancelar_todas()
+        self._pool.shutdown(wait=esperar)
+
+    # Tarefas do ExportadorDados
+
+    def exportar(self, exportador, formato='tudo', destino=None, sessao_id=None,
+                 ao_progresso=None, ao_terminar=None):
+        """
+        Exporta em segundo plano; tarefa.resultado é o retorno do método do exportador
+
+        Args:
+            exportador: ExportadorDados
+            formato: Uma das chaves de FORMATOS
+            destino: Arquivo (pasta no ISOXML; ignorado em 'tudo') (default: auto-gerado)
+            sessao_id: Só essa sessão (default: todas; CSV e relatório sempre exportam todas)
+
+        Returns:
+            Tarefa
+        """
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato de exportação inválido: {formato}")
+        return self.submeter(f"Exportar {formato}", _exportar, exportador, formato, destino, sessao_id,
+                             ao_progresso=ao_progresso, ao_terminar=ao_terminar)
+
+    def backup(self, exportador, nome_arquivo=None, ao_progresso=None, ao_terminar=None):
+        """Backup do banco em segundo plano; tarefa.resultado é o caminho do arquivo"""
+        return self.submeter("Backup", _backup, exportador, nome_arquivo,
+                             ao_progresso=ao_progresso, ao_terminar=ao_terminar)
+
+    def limpar(self, exportador, ao_terminar=None):
+        """Apaga os dados do banco em segundo plano (não pode ser cancelada depois de começar)"""
+        return self.submeter("Limpar dados", _limpar, exportador, ao_terminar=ao_terminar)
+
+
+def _remover(caminho):
+    if os.path.isdir(caminho):
+        shutil.rmtree(caminho, ignore_errors=True)
+    elif os.path.exists(caminho):
+        os.remove(caminho)
+
+
+def _exportar(tarefa, exportador, formato, destino, sessao_id):
+    if formato == 'tudo':
+        arquivos = [_nome_padrao("pulverizacao", "csv"), _nome_padrao("relatorio", "txt")]
+    else:
+        arquivos = [destino or _nome_padrao(*FORMATOS[formato])]
+    # Pasta do ISOXML que já existia não é apagada se a exportação falhar
+    parciais = [caminho for caminho in arquivos if not os.path.exists(caminho)]
+    try:
+        if formato == 'csv':
+            return exportador.exportar_csv(arquivos[0], progresso=tarefa.informar)
+        if formato == 'relatorio':
+            return exportador.gerar_relatorio_resumo(arquivos[0], progresso=tarefa.informar)
+        if formato == 'tudo':
+            return exportador.exportar_tudo(*arquivos, progresso=tarefa.informar)
+        if formato == 'geojson':
+            return exportador.exportar_geojson(arquivos[0], sessao_id, progresso=tarefa.informar)
+        if formato == 'kml':
+            return exportador.exportar_kml(arquivos[0], sessao_id, progresso=tarefa.informar)
+        return exportador.exportar_isoxml(arquivos[0], sessao_id, progresso=tarefa.informar)
+    except BaseException:
+        for caminho in parciais:
+            _remover(caminho)
+        raise
+
+
+def _backup(tarefa, exportador, nome_arquivo):
+    nome_arquivo = nome_arquivo or _nome_padrao("backup", "db")
+    try:
+        return exportador.backup_dados(nome_arquivo, progresso=tarefa.informar)
+    except BaseException:
+        _remover(nome_arquivo)
+        raise
+
+
+def _limpar(tarefa, exportador):
+    tarefa.verificar_cancelamento()
+    return exportador.limpar_dados()
@@ -0,0 +1,361 @@
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import weakref
+from array import array
+from itertools import accumulate
+
+import db
+
+# Trilha de uma sessão em formato colunar binário, só de acréscimo
+#
+# Arquivo (little-endian):
+#   cabeçalho (64 bytes) | bloco | bloco | ... | índice de blocos
+#
+# Cada bloco guarda até tamanho_bloco pontos em colunas contíguas, para serem
+# lidas direto do mmap como memoryview, sem cópia:
+#   n (U4) | reservado (U4) | ts_base (I8, epoch-ms)
+#   dt        I4[n]  ms desde o ponto anterior (o primeiro é 0, relativo a ts_base)
+#   lat_e6    I4[n]  latitude em micrograus
+#   lon_e6    I4[n]  longitude em micrograus
+#   velocidade U2[n] centésimos de km/h (SEM_VALOR se ausente)
+#   rumo      U2[n]  centésimos de grau (SEM_VALOR se ausente)
+#
+# O índice (uma entrada por bloco, com intervalo de tempo e retângulo) fica no
+# fim do arquivo. Um acréscimo grava os blocos novos e um índice novo depois
+# do antigo e só então atualiza o cabeçalho: uma queda no meio deixa o arquivo
+# como estava antes do acréscimo.
+
+MAGICO = b'TRK1'
+VERSAO = 1
+SEM_VALOR = 0xFFFF
+ESCALA_GRAUS = 1_000_000
+ESCALA_VELOCIDADE = 100
+ESCALA_RUMO = 100
+TAMANHO_BLOCO_PADRAO = 65536
+
+# magico, versao, flags, sessao_id, inicio_ms, total_pontos, num_blocos, tamanho_bloco, offset_indice
+_CABECALHO = struct.Struct('<4sHHqqQIIQ')
+TAMANHO_CABECALHO = 64
+_CABECALHO_BLOCO = struct.Struct('<IIq')
+# offset, n, reservado, ts_inicio, ts_fim, lat_min, lat_max, lon_min, lon_max
+_ENTRADA_INDICE = struct.Struct('<QIIqqiiii')
+
+_NATIVO = sys.byteorder == 'little'
+
+
+def _coluna(dados, formato):
+    """memoryview tipado sobre os bytes do mmap (cópia com inversão só em máquinas big-endian)"""
+    if _NATIVO:
+        return dados.cast(formato)
+    valores = array(formato, dados.tobytes())
+    valores.byteswap()
+    return memoryview(valores)
+
+
+class BlocoTrilha:
+    __slots__ = ('n', 'ts_base', 'dt', 'lat_e6', 'lon_e6', 'velocidade', 'rumo', '__weakref__')
+
+    def __init__(self, dados):
+        """
+        Colunas de um bloco como memoryviews sobre o mmap
+
+        Args:
+            dados: memoryview do bloco inteiro (cabeçalho do bloco incluído)
+        """
+        self.n, _, self.ts_base = _CABECALHO_BLOCO.unpack_from(dados)
+        n = self.n
+        inicio = _CABECALHO_BLOCO.size
+        self.dt = _coluna(dados[inicio:inicio + 4 * n], 'i')
+        inicio += 4 * n
+        self.lat_e6 = _coluna(dados[inicio:inicio + 4 * n], 'i')
+        inicio += 4 * n
+        self.lon_e6 = _coluna(dados[inicio:inicio + 4 * n], 'i')
+        inicio += 4 * n
+        self.velocidade = _coluna(dados[inicio:inicio + 2 * n], 'H')
+        inicio += 2 * n
+        self.rumo = _coluna(dados[inicio:inicio + 2 * n], 'H')
+
+    def timestamps(self):
+        """Timestamps absolutos (epoch-ms) do bloco"""
+        return list(accumulate(self.dt, initial=self.ts_base))[1:]
+
+    def liberar(self):
+        """Solta as memoryviews (necessário antes de fechar o mmap)"""
+        for coluna in (self.dt, self.lat_e6, self.lon_e6, self.velocidade, self.rumo):
+            coluna.release()
+
+    def pontos(self):
+        """
+        Yields:
+            tuple: (ts, latitude, longitude, velocidade_kmh ou None, rumo ou None)
+        """
+        ts = self.ts_base
+        for dt, lat, lon, velocidade, rumo in zip(self.dt, self.lat_e6, self.lon_e6, self.velocidade, self.rumo):
+            ts += dt
+            yield (ts, lat / ESCALA_GRAUS, lon / ESCALA_GRAUS,
+                   None if velocidade == SEM_VALOR else velocidade / ESCALA_VELOCIDADE,
+                   None if rumo == SEM_VALOR else rumo / ESCALA_RUMO)
+
+
+class TrilhaBinaria:
+    def __init__(self, caminho):
+        """
+        Leitura de um arquivo de trilha por mmap
+
+        Abrir só lê o cabeçalho e o índice; os blocos são memoryviews sobre
+        o mmap, e o sistema traz as páginas do disco conforme são tocadas.
+
+        Args:
+            caminho: Arquivo .trk
+        """
+        self.caminho = caminho
+        self._arquivo = open(caminho, 'rb')
+        self._mmap = mmap.mmap(self._arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        self._dados = memoryview(self._mmap)
+
+        (magico, versao, _, self.sessao_id, self.inicio_ms, self.total_pontos, num_blocos,
+         self.tamanho_bloco, offset_indice) = _CABECALHO.unpack_from(self._dados)
+        if magico != MAGICO:
+            self.fechar()
+            raise ValueError(f"{caminho} não é um arquivo de trilha")
+        if versao > VERSAO:
+            self.fechar()
+            raise ValueError(f"Versão {versao} do arquivo de trilha não suportada")
+
+        # (offset, n, ts_inicio, ts_fim, lat_min, lat_max, lon_min, lon_max) por bloco
+        self.indice = [(offset, n, *resto) for offset, n, _, *resto in _ENTRADA_INDICE.iter_unpack(
+            self._dados[offset_indice:offset_indice + num_blocos * _ENTRADA_INDICE.size])]
+        # Só os blocos ainda vivos: os descartados pelo chamador soltam as suas views sozinhos
+        self._blocos_abertos = weakref.WeakSet()
+
+    def __len__(self):
+        return self.total_pontos
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.fechar()
+
+    def bloco(self, i):
+        offset, n = self.indice[i][:2]
+        bloco = BlocoTrilha(self._dados[offset:offset + _CABECALHO_BLOCO.size + 16 * n])
+        self._blocos_abertos.add(bloco)
+        return bloco
+
+    def blocos(self, ts_inicio=None, ts_fim=None, area=None):
+        """
+        Blocos que podem ter pontos no intervalo de tempo e no retângulo
+
+        Args:
+            ts_inicio, ts_fim: Intervalo em epoch-ms (None = aberto)
+            area: (lat_min, lat_max, lon_min, lon_max) em graus, ou None
+
+        Yields:
+            BlocoTrilha
+        """
+        if area is not None:
+            area = [round(v * ESCALA_GRAUS) for v in area]
+        for i, (_, _, inicio, fim, lat_min, lat_max, lon_min, lon_max) in enumerate(self.indice):
+            if ts_inicio is not None and fim < ts_inicio:
+                continue
+            if ts_fim is not None and inicio > ts_fim:
+                continue
+            if area is not None and (lat_max < area[0] or lat_min > area[1]
+                                     or lon_max < area[2] or lon_min > area[3]):
+                continue
+            yield self.bloco(i)
+
+    def pontos(self, ts_inicio=None, ts_fim=None):
+        """
+        Yields:
+            tuple: (ts, latitude, longitude, velocidade_kmh, rumo) no intervalo de tempo
+        """
+        for bloco in self.blocos(ts_inicio, ts_fim):
+            for ponto in bloco.pontos():
+                if (ts_inicio is None or ponto[0] >= ts_inicio) and (ts_fim is None or ponto[0] <= ts_fim):
+                    yield ponto
+
+    def colunas(self):
+        """
+        Trilha inteira em arrays contíguos (uma cópia por coluna, sem objetos por ponto)
+
+        Returns:
+            dict: 'ts' (array 'q', epoch-ms), 'lat_e6', 'lon_e6' (array 'i'),
+                  'velocidade', 'rumo' (array 'H', com SEM_VALOR)
+        """
+        resultado = {'ts': array('q'), 'lat_e6': array('i'), 'lon_e6': array('i'),
+                     'velocidade': array('H'), 'rumo': array('H')}
+        for bloco in self.blocos():
+            resultado['ts'].extend(bloco.timestamps())
+            for nome in ('lat_e6', 'lon_e6', 'velocidade', 'rumo'):
+                resultado[nome].frombytes(getattr(bloco, nome).tobytes())
+            bloco.liberar()
+        return resultado
+
+    def fechar(self):
+        if self._mmap is None:
+            return
+        for bloco in self._blocos_abertos:
+            bloco.liberar()
+        self._blocos_abertos.clear()
+        self._dados.release()
+        self._mmap.close()
+        self._arquivo.close()
+        self._mmap = None
+
+
+class GravadorTrilha:
+    def __init__(self, caminho, sessao_id=0, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+        """
+        Escrita de um arquivo de trilha; acrescenta se o arquivo já existir
+
+        Args:
+            caminho: Arquivo .trk
+            sessao_id: Sessão gravada no cabeçalho (ignorado ao acrescentar)
+            tamanho_bloco: Pontos por bloco
+        """
+        self.caminho = caminho
+        if os.path.exists(caminho):
+            with TrilhaBinaria(caminho) as trilha:
+                self.sessao_id = trilha.sessao_id
+                self.inicio_ms = trilha.inicio_ms
+                self.total_pontos = trilha.total_pontos
+                self.tamanho_bloco = trilha.tamanho_bloco
+                self._indice = list(trilha.indice)
+            self._arquivo = open(caminho, 'r+b')
+            self._arquivo.seek(0, os.SEEK_END)
+        else:
+            self.sessao_id = sessao_id
+            self.inicio_ms = 0
+            self.total_pontos = 0
+            self.tamanho_bloco = tamanho_bloco
+            self._indice = []
+            self._arquivo = open(caminho, 'w+b')
+            self._arquivo.write(bytes(TAMANHO_CABECALHO))
+            self._gravar_indice()
+        self._limpar_buffer()
+
+    def _limpar_buffer(self):
+        self._ts_base = None
+        self._ts_anterior = None
+        self._dt = array('i')
+        self._lat = array('i')
+        self._lon = array('i')
+        self._velocidade = array('H')
+        self._rumo = array('H')
+
+    def adicionar(self, ts, latitude, longitude, velocidade=None, rumo=None):
+        """
+        Acrescenta um ponto (em ordem de tempo)
+
+        Args:
+            ts: Epoch-ms
+            latitude, longitude: Graus decimais
+            velocidade: km/h ou None
+            rumo: Graus ou None
+        """
+        if self._ts_base is None:
+            self._ts_base = self._ts_anterior = ts
+        self._dt.append(ts - self._ts_anterior)
+        self._ts_anterior = ts
+        self._lat.append(round(latitude * ESCALA_GRAUS))
+        self._lon.append(round(longitude * ESCALA_GRAUS))
+        self._velocidade.append(SEM_VALOR if velocidade is None
+                                else min(SEM_VALOR - 1, max(0, round(velocidade * ESCALA_VELOCIDADE))))
+        self._rumo.append(SEM_VALOR if rumo is None else round((rumo % 360) * ESCALA_RUMO) % 36000)
+        if len(self._dt) >= self.tamanho_bloco:
+            self.descarregar()
+
+    def descarregar(self):
+        """Grava o bloco em andamento e o índice novo, e atualiza o cabeçalho"""
+        n = len(self._dt)
+        if not n:
+            return
+        if not self.total_pontos:
+            self.inicio_ms = self._ts_base
+        offset = self._arquivo.seek(0, os.SEEK_END)
+        self._indice.append((offset, n, self._ts_base, self._ts_anterior, min(self._lat), max(self._lat),
+                             min(self._lon), max(self._lon)))
+        self._arquivo.write(_CABECALHO_BLOCO.pack(n, 0, self._ts_base))
+        for coluna in (self._dt, self._lat, self._lon, self._velocidade, self._rumo):
+            if not _NATIVO:
+                coluna.byteswap()
+            self._arquivo.write(coluna.tobytes())
+        self.total_pontos += n
+        self._limpar_buffer()
+        self._gravar_indice()
+
+    def _gravar_indice(self):
+        offset_indice = self._arquivo.seek(0, os.SEEK_END)
+        for offset, n, *resto in self._indice:
+            self._arquivo.write(_ENTRADA_INDICE.pack(offset, n, 0, *resto))
+        # Blocos e índice no disco antes do cabeçalho que aponta para eles
+        self._arquivo.flush()
+        os.fsync(self._arquivo.fileno())
+        self._arquivo.seek(0)
+        self._arquivo.write(_CABECALHO.pack(MAGICO, VERSAO, 0, self.sessao_id, self.inicio_ms, self.total_pontos,
+                                            len(self._indice), self.tamanho_bloco, offset_indice))
+        self._arquivo.flush()
+
+    def fechar(self):
+        if self._arquivo is None:
+            return
+        self.descarregar()
+        os.fsync(self._arquivo.fileno())
+        self._arquivo.close()
+        self._arquivo = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.fechar()
+
+
+def converter_sessao(sessao_id, destino, caminho_banco=None, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """
+    Converte os pontos de uma sessão do banco em um arquivo de trilha
+
+    O arquivo é montado ao lado e renomeado no fim (destino nunca fica pela metade).
+
+    Returns:
+        int: Pontos convertidos
+    """
+    db.sincronizar()  # Linhas do commit em grupo ainda pendentes
+    conn = sqlite3.connect(caminho_banco or db.obter_conexao().caminho)
+    temporario = destino + '.tmp'
+    if os.path.exists(temporario):
+        os.remove(temporario)
+    try:
+        with GravadorTrilha(temporario, sessao_id, tamanho_bloco) as gravador:
+            for ponto in db.iterar_pontos(('ts', 'latitude', 'longitude', 'velocidade', 'rumo'), sessao_id,
+                                          conexao=conn):
+                gravador.adicionar(*ponto)
+    finally:
+        conn.close()
+    os.replace(temporario, destino)
+    return gravador.total_pontos
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Converte sessões do banco em arquivos de trilha (.trk)")
+    parser.add_argument('destino', help="Pasta dos arquivos")
+    parser.add_argument('--banco', default=db.CAMINHO_BANCO)
+    parser.add_argument('--sessao', type=int, action='append', help="Sessão a converter (default: todas)")
+    args = parser.parse_args()
+
+    db.configurar_banco(args.banco)
+    os.makedirs(args.destino, exist_ok=True)
+    for sessao in args.sessao or [s['id'] for s in db.obter_sessoes()]:
+        caminho = os.path.join(args.destino, f'sessao_{sessao}.trk')
+        inicio = time.perf_counter()
+        total = converter_sessao(sessao, caminho, args.banco)
+        print(f"Sessão {sessao}: {total} pontos em {time.perf_counter() - inicio:.2f} s "
+              f"-> {caminho} ({os.path.getsize(caminho) / 1e6:.1f} MB)")
@@ -0,0 +1,324 @@
+import math
+import struct
+
+# Protocolo binário UBX (u-blox)
+#
+# Frame: 0xB5 0x62 | classe | id | comprimento (U2 LE) | payload | CK_A CK_B
+# O checksum Fletcher-8 cobre classe, id, comprimento e payload.
+
+SYNC_UBX = b'\xb5\x62'
+TAMANHO_CABECALHO = 6
+TAMANHO_MAX_PAYLOAD = 1024
+
+CLASSE_NAV = 0x01
+CLASSE_CFG = 0x06
+
+ID_NAV_STATUS = 0x03
+ID_NAV_DOP = 0x04
+ID_NAV_PVT = 0x07
+ID_CFG_VALSET = 0x8A
+
+# Chaves de configuração do M10 (CFG-VALSET)
+CFG_RATE_MEAS = 0x30210001
+CFG_MSGOUT_UBX_NAV_PVT_UART1 = 0x20910007
+CFG_MSGOUT_UBX_NAV_DOP_UART1 = 0x20910039
+CFG_MSGOUT_UBX_NAV_STATUS_UART1 = 0x2091001B
+CFG_UART1OUTPROT_NMEA = 0x10740002
+
+_NAV_PVT = struct.Struct('<IHBBBBBBIiBBBBiiiiIIiiiiiIIHH4xihH')
+_NAV_DOP = struct.Struct('<I7H')
+_NAV_STATUS = struct.Struct('<IBBBBII')
+_CABECALHO = struct.Struct('<BBH')
+
+
+class UBXNavPVT:
+    __slots__ = ('itow', 'ano', 'mes', 'dia', 'hora', 'minuto', 'segundo', 'nano',
+                 'valido', 'tipo_fix', 'fix_ok', 'satelites', 'latitude', 'longitude',
+                 'altitude', 'precisao_h', 'precisao_v', 'vel_norte', 'vel_leste',
+                 'vel_baixo', 'velocidade', 'rumo', 'precisao_vel', 'precisao_rumo', 'pdop')
+
+    @property
+    def velocidade_kmh(self):
+        return self.velocidade * 3.6
+
+    @property
+    def segundos_do_dia(self):
+        """Hora UTC em segundos desde a meia-noite"""
+        return self.hora * 3600 + self.minuto * 60 + self.segundo + self.nano * 1e-9
+
+
+class UBXNavDOP:
+    __slots__ = ('itow', 'gdop', 'pdop', 'tdop', 'vdop', 'hdop', 'ndop', 'edop')
+
+
+class UBXNavStatus:
+    __slots__ = ('itow', 'tipo_fix', 'fix_ok', 'ttff', 'msss')
+
+
+def checksum_fletcher(dados, inicio=0, fim=None):
+    """
+    Calcula o checksum Fletcher-8 usado pelo UBX
+
+    Args:
+        dados: Buffer com o frame
+        inicio: Primeiro byte coberto (classe)
+        fim: Posição após o último byte do payload
+
+    Returns:
+        tuple: (ck_a, ck_b)
+    """
+    if fim is None:
+        fim = len(dados)
+    ck_a = 0
+    ck_b = 0
+    for i in range(inicio, fim):
+        ck_a = (ck_a + dados[i]) & 0xFF
+        ck_b = (ck_b + ck_a) & 0xFF
+    return ck_a, ck_b
+
+
+def frame_valido(dados, inicio=0):
+    """
+    Verifica sincronismo, comprimento e checksum de um frame UBX
+
+    Args:
+        dados: Buffer contendo o frame
+        inicio: Posição do primeiro byte de sincronismo
+
+    Returns:
+        bool: True se o frame está completo e íntegro
+    """
+    if len(dados) - inicio < TAMANHO_CABECALHO + 2:
+        return False
+    if dados[inicio] != 0xB5 or dados[inicio + 1] != 0x62:
+        return False
+    comprimento = dados[inicio + 4] | (dados[inicio + 5] << 8)
+    fim = inicio + TAMANHO_CABECALHO + comprimento
+    if len(dados) < fim + 2:
+        return False
+    ck_a, ck_b = checksum_fletcher(dados, inicio + 2, fim)
+    return dados[fim] == ck_a and dados[fim + 1] == ck_b
+
+
+def montar_frame(classe, id_msg, payload=b''):
+    """
+    Monta um frame UBX completo com checksum
+
+    Args:
+        classe: Classe da mensagem
+        id_msg: ID da mensagem
+        payload: Conteúdo da mensagem
+
+    Returns:
+        bytes: Frame pronto para envio
+    """
+    corpo = _CABECALHO.pack(classe, id_msg, len(payload)) + bytes(payload)
+    ck_a, ck_b = checksum_fletcher(corpo)
+    return SYNC_UBX + corpo + bytes((ck_a, ck_b))
+
+
+def montar_cfg_valset(valores, camadas=0x01):
+    """
+    Monta mensagem CFG-VALSET (configuração do M10)
+
+    Args:
+        valores: Lista de tuplas (chave, valor)
+        camadas: Camadas de destino (0x01 = RAM, 0x02 = BBR, 0x04 = Flash)
+
+    Returns:
+        bytes: Frame UBX
+    """
+    payload = bytearray(struct.pack('<BBBB', 0, camadas, 0, 0))
+    for chave, valor in valores:
+        tamanho = (chave >> 28) & 0x07  # 1 = bit, 2 = U1, 3 = U2, 4 = U4, 5 = U8
+        formato = {1: '<B', 2: '<B', 3: '<H', 4: '<I', 5: '<Q'}[tamanho]
+        payload += struct.pack('<I', chave) + struct.pack(formato, valor)
+    return montar_frame(CLASSE_CFG, ID_CFG_VALSET, payload)
+
+
+def montar_configuracao_navegacao(taxa_hz=10, dop=True, status=True, nmea=True):
+    """
+    Monta a configuração para saída NAV-PVT na UART1 na taxa desejada
+
+    Args:
+        taxa_hz: Taxa de navegação em Hz (o M10 suporta até 25 Hz)
+        dop: Também habilitar NAV-DOP
+        status: Também habilitar NAV-STATUS
+        nmea: Manter a saída NMEA na UART1 (a mesma época chega nos dois formatos)
+
+    Returns:
+        bytes: Frame CFG-VALSET
+    """
+    valores = [
+        (CFG_RATE_MEAS, int(round(1000 / taxa_hz))),
+        (CFG_MSGOUT_UBX_NAV_PVT_UART1, 1),
+        (CFG_MSGOUT_UBX_NAV_DOP_UART1, 1 if dop else 0),
+        (CFG_MSGOUT_UBX_NAV_STATUS_UART1, 1 if status else 0),
+        (CFG_UART1OUTPROT_NMEA, 1 if nmea else 0),
+    ]
+    return montar_cfg_valset(valores)
+
+
+def montar_nav_pvt(itow, data_hora, latitude, longitude, altitude, velocidade, rumo,
+                   tipo_fix=3, satelites=12, precisao_h=1.0, precisao_v=1.5, pdop=1.4,
+                   vel_baixo=0.0):
+    """
+    Monta um frame NAV-PVT (usado pelo simulador e em testes de carga)
+
+    Args:
+        itow: Tempo da semana GPS em ms
+        data_hora: datetime UTC da época
+        latitude: Latitude em graus decimais
+        longitude: Longitude em graus decimais
+        altitude: Altitude sobre o nível do mar (m)
+        velocidade: Velocidade horizontal (m/s)
+        rumo: Rumo do movimento em graus
+        tipo_fix: 0 = sem fix, 2 = 2D, 3 = 3D
+        satelites: Satélites usados
+        precisao_h: Precisão horizontal estimada (m)
+        precisao_v: Precisão vertical estimada (m)
+        pdop: PDOP
+        vel_baixo: Velocidade vertical para baixo (m/s)
+
+    Returns:
+        bytes: Frame UBX de 100 bytes
+    """
+    fix_ok = tipo_fix >= 2
+    vel_n = velocidade * math.cos(math.radians(rumo))
+    vel_e = velocidade * math.sin(math.radians(rumo))
+    payload = _NAV_PVT.pack(
+        itow, data_hora.year, data_hora.month, data_hora.day,
+        data_hora.hour, data_hora.minute, data_hora.second, 0x07,
+        50, data_hora.microsecond * 1000, tipo_fix, 0x01 if fix_ok else 0x00, 0, satelites,
+        int(round(longitude * 1e7)), int(round(latitude * 1e7)),
+        int(round(altitude * 1000)), int(round(altitude * 1000)),
+        int(precisao_h * 1000), int(precisao_v * 1000),
+        int(round(vel_n * 1000)), int(round(vel_e * 1000)), int(round(vel_baixo * 1000)),
+        int(round(velocidade * 1000)), int(round((rumo % 360.0) * 1e5)),
+        100, 50000, int(round(pdop * 100)), 0, 0, 0, 0)
+    return montar_frame(CLASSE_NAV, ID_NAV_PVT, payload)
+
+
+def montar_nav_dop(itow, pdop=1.4, hdop=0.8, vdop=1.1):
+    """Monta um frame NAV-DOP"""
+    gdop = (pdop ** 2 + 1.0) ** 0.5
+    payload = _NAV_DOP.pack(itow, int(gdop * 100), int(pdop * 100), 100, int(vdop * 100),
+                            int(hdop * 100), int(hdop * 70), int(hdop * 70))
+    return montar_frame(CLASSE_NAV, ID_NAV_DOP, payload)
+
+
+class DecodificadorUBX:
+    def __init__(self):
+        """Decodifica frames NAV-PVT, NAV-DOP e NAV-STATUS"""
+        self._decodificadores = {
+            (CLASSE_NAV, ID_NAV_PVT): (_NAV_PVT.size, self._decodificar_pvt),
+            (CLASSE_NAV, ID_NAV_DOP): (_NAV_DOP.size, self._decodificar_dop),
+            (CLASSE_NAV, ID_NAV_STATUS): (_NAV_STATUS.size, self._decodificar_status),
+        }
+
+        # Estatísticas
+        self.frames_decodificados = 0
+        self.erros_checksum = 0
+        self.erros_formato = 0
+        self.frames_ignorados = 0
+
+    def decodificar(self, dados, inicio=0, verificar=True):
+        """
+        Decodifica um frame UBX sem copiar o payload
+
+        Args:
+            dados: Buffer (bytes, bytearray ou memoryview) com o frame
+            inicio: Posição do primeiro byte de sincronismo
+            verificar: Verificar o checksum (desnecessário se o leitor já verificou)
+
+        Returns:
+            UBXNavPVT, UBXNavDOP, UBXNavStatus ou None
+        """
+        if verificar and not frame_valido(dados, inicio):
+            self.erros_checksum += 1
+            return None
+
+        classe, id_msg, comprimento = _CABECALHO.unpack_from(dados, inicio + 2)
+        entrada = self._decodificadores.get((classe, id_msg))
+        if entrada is None:
+            self.frames_ignorados += 1
+            return None
+
+        tamanho, funcao = entrada
+        if comprimento < tamanho:
+            self.erros_formato += 1
+            return None
+
+        self.frames_decodificados += 1
+        return funcao(dados, inicio + TAMANHO_CABECALHO)
+
+    def _decodificar_pvt(self, dados, offset):
+        (itow, ano, mes, dia, hora, minuto, segundo, valido, _t_acc, nano,
+         tipo_fix, flags, _flags2, satelites, lon, lat, _altura, h_msl, h_acc, v_acc,
+         vel_n, vel_e, vel_d, g_speed, head_mot, s_acc, head_acc, p_dop,
+         _flags3, _head_veh, _mag_dec, _mag_acc) = _NAV_PVT.unpack_from(dados, offset)
+
+        msg = UBXNavPVT()
+        msg.itow = itow
+        msg.ano = ano
+        msg.mes = mes
+        msg.dia = dia
+        msg.hora = hora
+        msg.minuto = minuto
+        msg.segundo = segundo
+        msg.nano = nano
+        msg.valido = valido
+        msg.tipo_fix = tipo_fix
+        msg.fix_ok = bool(flags & 0x01)
+        msg.satelites = satelites
+        msg.latitude = lat * 1e-7
+        msg.longitude = lon * 1e-7
+        msg.altitude = h_msl * 1e-3
+        msg.precisao_h = h_acc * 1e-3
+        msg.precisao_v = v_acc * 1e-3
+        msg.vel_norte = vel_n * 1e-3
+        msg.vel_leste = vel_e * 1e-3
+        msg.vel_baixo = vel_d * 1e-3
+        msg.velocidade = g_speed * 1e-3
+        msg.rumo = head_mot * 1e-5
+        msg.precisao_vel = s_acc * 1e-3
+        msg.precisao_rumo = head_acc * 1e-5
+        msg.pdop = p_dop * 0.01
+        return msg
+
+    def _decodificar_dop(self, dados, offset):
+        itow, g, p, t, v, h, n, e = _NAV_DOP.unpack_from(dados, offset)
+        msg = UBXNavDOP()
+        msg.itow = itow
+        msg.gdop = g * 0.01
+        msg.pdop = p * 0.01
+        msg.tdop = t * 0.01
+        msg.vdop = v * 0.01
+        msg.hdop = h * 0.01
+        msg.ndop = n * 0.01
+        msg.edop = e * 0.01
+        return msg
+
+    def _decodificar_status(self, dados, offset):
+        itow, tipo_fix, flags, _fix_stat, _flags2, ttff, msss = _NAV_STATUS.unpack_from(dados, offset)
+        msg = UBXNavStatus()
+        msg.itow = itow
+        msg.tipo_fix = tipo_fix
+        msg.fix_ok = bool(flags & 0x01)
+        msg.ttff = ttff
+        msg.msss = msss
+        return msg
+
+    def obter_estatisticas(self):
+        """
+        Retorna contadores do decodificador
+
+        Returns:
+            dict: Estatísticas de decodificação
+        """
+        return {
+            'frames_decodificados': self.frames_decodificados,
+            'erros_checksum': self.erros_checksum,
+            'erros_formato': self.erros_formato,
+            'frames_ignorados': self.frames_ignorados
+        }
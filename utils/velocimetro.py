@@ -1,6 +1,7 @@
 import time
 from collections import deque
 from utils.haversine import haversine
+from utils import geodesia
 
 class Velocimetro:
     def __init__(self, janela_tempo=5):
@@ -76,13 +77,9 @@ class Velocimetro:
             return
             
         # Calcular distância total e tempo total
-        distancia_total = 0
         tempo_total = pontos_validos[-1]['timestamp'] - pontos_validos[0]['timestamp']
-        
-        for i in range(1, len(pontos_validos)):
-            p1 = pontos_validos[i-1]
-            p2 = pontos_validos[i]
-            distancia_total += haversine(p1['lat'], p1['lon'], p2['lat'], p2['lon'])
+        distancia_total = geodesia.somar(geodesia.distancias([p['lat'] for p in pontos_validos],
+                                                             [p['lon'] for p in pontos_validos]))
             
         if tempo_total > 0:
             velocidade_ms = distancia_total / tempo_total